@@ -19,6 +19,7 @@ from projects.models import Project
 from projects.services import get_site_main_project
 from questions.models import Question
 from posts.models import Post
+from scoring.utils import update_post_leaderboard_questions
 
 logger = logging.getLogger(__name__)
 
@@ -148,6 +149,7 @@ def submit_questions(
                 scheduled_resolve_time=question.scheduled_resolve_time,
             )
             post.save()
+            update_post_leaderboard_questions(post)
             log_info(f"   - added question [{question.title}] to {tournament.name}")
         if dry_run:
             transaction.set_rollback(True)
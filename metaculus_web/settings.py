@@ -134,6 +134,15 @@ if ENV != "testing":
 # TODO: probably we should switch to the explicit transactions
 DATABASES["default"]["ATOMIC_REQUESTS"] = True
 
+# Embedding indexes searches, see utils.models.embedding_hnsw_index.
+# Filters apply to the HNSW candidates, so iterative scans (pgvector >= 0.8)
+# keep fetching candidates until filtered searches return enough rows
+_db_options = DATABASES["default"].setdefault("OPTIONS", {})
+_db_options["options"] = (
+    _db_options.get("options", "")
+    + " -c hnsw.ef_search=100 -c hnsw.iterative_scan=strict_order"
+).strip()
+
 # REST Framework
 # https://www.django-rest-framework.org/
 
@@ -271,6 +280,11 @@ if ENV == "testing":
     )
 DRAMATIQ_AUTODISCOVER_MODULES = ["tasks", "jobs"]
 
+# Compact storage of continuous forecast CDFs as packed bytea blobs
+# One of float64, float32, uint16 (quantized). Unset keeps Postgres float arrays.
+# Run `manage.py pack_forecast_values` after changing it
+FORECAST_VALUES_PACKING = os.environ.get("FORECAST_VALUES_PACKING") or None
+
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
@@ -280,6 +294,9 @@ CACHES = {
         },
     }
 }
+# Unit tests shouldn't share cached payloads through Redis
+if ENV == "testing":
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
 
 # Django-storages
 # https://github.com/jschneier/django-storages
@@ -25,6 +25,7 @@ from posts.services.common import compute_hotness
 from projects.models import Project
 from projects.permissions import ObjectPermission
 from scoring.models import populate_medal_exclusion_records
+from scoring.reputation import rebuild_reputation_ledger
 
 
 class Command(BaseCommand):
@@ -86,6 +87,10 @@ class Command(BaseCommand):
         # scoring
         score_questions()
         print("Scored questions")
+        # Posts and projects are bulk written above, bypassing the services
+        # keeping the reputation ledger in sync with their visibility
+        rebuild_reputation_ledger()
+        print("Rebuilt reputation ledger")
         populate_medal_exclusion_records()
         print("Populated medal exclusion records")
         create_global_leaderboards()
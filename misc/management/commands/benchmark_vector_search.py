@@ -0,0 +1,120 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import QuerySet
+
+from misc.models import ITNArticle
+from posts.models import Post
+from utils.models import embedding_distance
+
+
+def _search(qs: QuerySet, vector, k: int, settings: dict[str, str]):
+    """
+    Returns the ids of the k nearest neighbours of the vector within the
+    queryset and the query time, with the given planner settings
+    """
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for name, value in settings.items():
+                cursor.execute(f"SET LOCAL {name} = {value}")
+
+        tm = time.perf_counter()
+        ids = list(
+            qs.filter(embedding_vector__isnull=False)
+            .annotate(distance=embedding_distance("embedding_vector", vector))
+            .order_by("distance")
+            .values_list("id", flat=True)[:k]
+        )
+        return ids, time.perf_counter() - tm
+
+
+class Command(BaseCommand):
+    help = """
+    Measures the recall and latency of the embedding indexes
+    against exact nearest neighbours searches, over the filtered querysets
+    of the similar posts and similar articles lookups
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--samples",
+            type=int,
+            default=50,
+            help="Number of query vectors sampled from each table (default: 50)",
+        )
+        parser.add_argument(
+            "-k",
+            type=int,
+            default=10,
+            help="Number of neighbours to retrieve (default: 10)",
+        )
+        parser.add_argument(
+            "--ef_search",
+            type=int,
+            default=None,
+            help="Overrides the size of the HNSW candidates list",
+        )
+        parser.add_argument(
+            "--iterative_scan",
+            choices=["off", "relaxed_order", "strict_order"],
+            default=None,
+            help="Overrides the HNSW iterative scan mode",
+        )
+
+    def handle(self, *args, **options):
+        k = options["k"]
+        index_settings = {
+            name: options[option]
+            for name, option in [
+                ("hnsw.ef_search", "ef_search"),
+                ("hnsw.iterative_scan", "iterative_scan"),
+            ]
+            if options[option] is not None
+        }
+
+        searches = [
+            ("Post", Post.objects.all()),
+            ("Post (similar posts)", Post.objects.filter_permission().filter_active()),
+            ("ITNArticle", ITNArticle.objects.filter(is_removed=False)),
+        ]
+        for label, qs in searches:
+            vectors = (
+                qs.model.objects.filter(embedding_vector__isnull=False)
+                .order_by("?")
+                .values_list("embedding_vector", flat=True)[: options["samples"]]
+            )
+            recalls = []
+            # Searches returning fewer rows than the exact one
+            short_count = 0
+            exact_times = []
+            index_times = []
+
+            for vector in vectors:
+                exact_ids, exact_time = _search(
+                    qs, vector, k, {"enable_indexscan": "off"}
+                )
+                index_ids, index_time = _search(qs, vector, k, index_settings)
+                if exact_ids:
+                    recalls.append(
+                        len(set(exact_ids) & set(index_ids)) / len(exact_ids)
+                    )
+                    short_count += len(index_ids) < len(exact_ids)
+                exact_times.append(exact_time)
+                index_times.append(index_time)
+
+            if not recalls:
+                self.stdout.write(f"{label}: no embedding vectors")
+                continue
+
+            self.stdout.write(
+                f"{label}: recall@{k} {np.mean(recalls):.3f} "
+                f"over {len(recalls)} queries, {short_count} returned fewer rows"
+            )
+            for name, times in [("exact", exact_times), ("index", index_times)]:
+                self.stdout.write(
+                    f"  {name} search: mean {np.mean(times) * 1000:.1f}ms, "
+                    f"p95 {np.percentile(times, 95) * 1000:.1f}ms"
+                )
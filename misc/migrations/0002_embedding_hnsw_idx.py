@@ -0,0 +1,32 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:25
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+import pgvector.django.halfvec
+import pgvector.django.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("misc", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="itnarticle",
+            index=pgvector.django.indexes.HnswIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.comparison.Cast(
+                        "embedding_vector",
+                        pgvector.django.halfvec.HalfVectorField(dimensions=3072),
+                    ),
+                    name="halfvec_cosine_ops",
+                ),
+                ef_construction=64,
+                m=16,
+                name="itnarticle_embedding_hnsw_idx",
+            ),
+        ),
+    ]
@@ -2,7 +2,7 @@ from django.db import models
 from pgvector.django import VectorField
 
 from posts.models import Post
-from utils.models import TimeStampedModel
+from utils.models import TimeStampedModel, embedding_hnsw_index
 
 
 class ITNArticle(TimeStampedModel):
@@ -22,6 +22,11 @@ class ITNArticle(TimeStampedModel):
     )
     is_removed = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            embedding_hnsw_index("embedding_vector", "itnarticle_embedding_hnsw_idx")
+        ]
+
 
 # TODO: index new posts
 # TODO: ensure we sync PostITNArticle new articles only
@@ -19,10 +19,14 @@ from misc.models import ITNArticle
 from posts.models import Post
 from utils.cache import cache_get_or_set
 from utils.db import paginate_cursor
+from utils.models import embedding_distance
 from utils.openai import chunked_tokens, generate_text_embed_vector
 
 logger = logging.getLogger(__name__)
 
+# Nearest articles re-ranked by freshness for the similar articles of a post
+SIMILAR_ARTICLES_CANDIDATES = 100
+
 BLOCKED_MEDIAS = [
     # Purpose: russian foreign intelligence agency
     # https://en.wikipedia.org/wiki/New_Eastern_Outlook
@@ -125,8 +129,23 @@ def update_article_embedding_vector(obj: ITNArticle):
 
 
 def get_post_get_similar_articles_qs(post: Post):
+    if post.embedding_vector is None:
+        return ITNArticle.objects.none()
+
+    # Nearest articles from the embedding index,
+    # then re-ranked with the freshness penalty
+    candidate_ids = (
+        ITNArticle.objects.filter(is_removed=False, embedding_vector__isnull=False)
+        .annotate(
+            distance=embedding_distance("embedding_vector", post.embedding_vector)
+        )
+        .order_by("distance")
+        .values("id")[:SIMILAR_ARTICLES_CANDIDATES]
+    )
+
     return (
-        ITNArticle.objects.annotate(
+        ITNArticle.objects.filter(id__in=candidate_ids)
+        .annotate(
             nr_days_old=ExpressionWrapper(
                 Func(
                     Now() - F("created_at"),
@@ -138,9 +157,6 @@ def get_post_get_similar_articles_qs(post: Post):
             distance=CosineDistance("embedding_vector", post.embedding_vector),
         )
         .annotate(rank=(1 - F("distance") - (F("nr_days_old") / 600)))
-        # Exclude removed posts
-        .filter(is_removed=False)
-        .filter(rank__isnull=False)
         .order_by("-rank")
     )
 
@@ -1,43 +1,183 @@
 import logging
-from collections import defaultdict
+import math
+import time
+from datetime import timedelta
+from itertools import groupby
 
 import dramatiq
+from django.db import connection, transaction
+from django.db.models import Count, Q, QuerySet
+from django.utils import timezone
 
 from notifications.models import Notification
 from notifications.services import get_notification_handler_by_type
 
 logger = logging.getLogger(__name__)
 
+# Number of dispatchers draining the backlog in parallel
+NOTIFICATION_DISPATCHERS = 4
+# Recipients claimed at once by a dispatcher
+NOTIFICATION_RECIPIENTS_BATCH_SIZE = 50
+# Claims of dispatchers killed while sending are released after this delay
+NOTIFICATION_CLAIM_TIMEOUT = timedelta(minutes=30)
+# Dispatchers are killed past this limit (seconds)
+NOTIFICATION_DISPATCH_TIME_LIMIT = 60 * 10
+# Dispatchers stop claiming past this budget (seconds), leaving time to send
+# the last batch. The rest of the backlog is left to the next run
+NOTIFICATION_DISPATCH_TIME_BUDGET = 60 * 5
+# Namespace of the advisory locks on the recipients being claimed
+NOTIFICATION_CLAIM_LOCK_NAMESPACE = 1002
 
-@dramatiq.actor
-def job_send_notification_groups():
+
+def get_unsent_notifications() -> QuerySet[Notification]:
+    return Notification.objects.filter(email_sent=False, read_at__isnull=True)
+
+
+def get_unclaimed_notifications() -> QuerySet[Notification]:
+    return get_unsent_notifications().filter(
+        Q(email_claimed_at__isnull=True)
+        | Q(email_claimed_at__lt=timezone.now() - NOTIFICATION_CLAIM_TIMEOUT)
+    )
+
+
+def claim_notifications(
+    exclude_recipient_ids: set[int],
+    batch_size: int = NOTIFICATION_RECIPIENTS_BATCH_SIZE,
+) -> tuple[list[int], list[int]]:
     """
-    Aggregates and sends grouped notifications to the recipients
+    Claims the unsent notifications of a batch of recipients, skipping the
+    recipients being claimed by other dispatchers, so the notifications of a
+    recipient are never split between them. The claim is committed right away,
+    so no lock is held while sending the emails.
+    Returns the ids of the recipients and of the claimed notifications
     """
 
-    # { user_id: { NotificationType: list[Notification] } }
-    grouped_notifications = defaultdict(lambda: defaultdict(list))
+    candidates = (
+        get_unclaimed_notifications()
+        .exclude(recipient_id__in=exclude_recipient_ids)
+        .order_by("recipient_id")
+        .values_list("recipient_id", flat=True)
+        .distinct()
+    )
+    sql, params = candidates.query.sql_with_params()
 
-    # Grouping notifications
-    for notifications in Notification.objects.filter(
-        email_sent=False, read_at__isnull=True
-    ):
-        grouped_notifications[notifications.recipient][notifications.type].append(
-            notifications
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT recipient_id FROM ({sql}) AS recipients "
+                "WHERE pg_try_advisory_xact_lock(%s, recipient_id) LIMIT %s",
+                [*params, NOTIFICATION_CLAIM_LOCK_NAMESPACE, batch_size],
+            )
+            recipient_ids = [recipient_id for (recipient_id,) in cursor.fetchall()]
+
+        # Read once locked, skipping the claims committed meanwhile
+        notification_ids = list(
+            get_unclaimed_notifications()
+            .filter(recipient_id__in=recipient_ids)
+            .values_list("id", flat=True)
+        )
+        Notification.objects.filter(id__in=notification_ids).update(
+            email_claimed_at=timezone.now()
         )
 
-    # Running notifications scheduling
-    for recipient, groups in grouped_notifications.items():
-        for notification_type, notifications in groups.items():
+    return recipient_ids, notification_ids
+
+
+def send_notification_groups(
+    notification_ids: list[int],
+) -> tuple[list[int], set[int]]:
+    """
+    Sends the given notifications grouped per recipient, one email per
+    notification type, marking each group sent right away.
+    Returns the ids of the notifications sent
+    and the ids of the recipients whose sending failed
+    """
+
+    sent_ids = []
+    failed_recipient_ids = set()
+
+    notifications = (
+        Notification.objects.filter(id__in=notification_ids)
+        .select_related("recipient")
+        .order_by("recipient_id", "type", "id")
+        .iterator()
+    )
+    for (recipient_id, notification_type), group in groupby(
+        notifications, key=lambda n: (n.recipient_id, n.type)
+    ):
+        group = list(group)
+
+        # Send group of notifications
+        try:
             handler_cls = get_notification_handler_by_type(notification_type)
+            handler_cls.send_email_group(group)
+        except Exception:
+            logger.exception("Error while processing notification")
+            failed_recipient_ids.add(recipient_id)
+            continue
+
+        group_ids = [notification.id for notification in group]
+        Notification.objects.filter(id__in=group_ids).update(email_sent=True)
+        sent_ids += group_ids
+
+    return sent_ids, failed_recipient_ids
+
+
+@dramatiq.actor
+def job_send_notification_groups():
+    """
+    Reports the backlog of unsent notifications
+    and fans it out to parallel dispatchers
+    """
+
+    backlog = get_unsent_notifications().aggregate(
+        notifications=Count("id"), recipients=Count("recipient_id", distinct=True)
+    )
+    logger.info(
+        f"Notifications backlog: {backlog['notifications']} notifications "
+        f"for {backlog['recipients']} recipients"
+    )
+
+    dispatchers = min(
+        NOTIFICATION_DISPATCHERS,
+        math.ceil(backlog["recipients"] / NOTIFICATION_RECIPIENTS_BATCH_SIZE),
+    )
+    for _ in range(dispatchers):
+        job_dispatch_notification_groups.send()
+
+
+@dramatiq.actor(time_limit=NOTIFICATION_DISPATCH_TIME_LIMIT * 1000)
+def job_dispatch_notification_groups():
+    """
+    Claims batches of recipients and sends their grouped notifications
+    until no unclaimed recipient is left or the time budget is spent
+    """
+
+    started_at = time.monotonic()
+    sent_count = 0
+    recipients_count = 0
+    # Recipients left for the next run
+    failed_recipient_ids = set()
+
+    while time.monotonic() - started_at < NOTIFICATION_DISPATCH_TIME_BUDGET:
+        recipient_ids, claimed_ids = claim_notifications(failed_recipient_ids)
+        if not recipient_ids:
+            break
+
+        sent_ids, failed_ids = send_notification_groups(claimed_ids)
+
+        # Release the failed ones for the next run
+        Notification.objects.filter(id__in=set(claimed_ids) - set(sent_ids)).update(
+            email_claimed_at=None
+        )
 
-            # Send group of notifications
-            try:
-                handler_cls.send_email_group(notifications)
+        sent_count += len(sent_ids)
+        recipients_count += len(recipient_ids)
+        failed_recipient_ids |= failed_ids
 
-                # Mark as sent
-                for notification in notifications:
-                    notification.mark_as_sent()
-                    notification.save()
-            except Exception:
-                logger.exception("Error while processing notification")
+    elapsed = time.monotonic() - started_at
+    logger.info(
+        f"Sent {sent_count} notifications to {recipients_count} recipients "
+        f"in {elapsed:.1f}s ({sent_count / max(elapsed, 1e-3):.1f}/s), "
+        f"{len(failed_recipient_ids)} recipients failed"
+    )
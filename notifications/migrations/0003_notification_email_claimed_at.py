@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0002_notification_email_sent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="email_claimed_at",
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -20,6 +20,8 @@ class Notification(TimeStampedModel):
     read_at = models.DateTimeField(null=True, db_index=True)
 
     email_sent = models.BooleanField(default=False, db_index=True)
+    # Set while a dispatcher is sending the email, see notifications.jobs
+    email_claimed_at = models.DateTimeField(null=True)
 
     def mark_as_sent(self):
         self.email_sent = True
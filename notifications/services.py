@@ -1,4 +1,5 @@
 from dataclasses import dataclass, asdict
+from typing import Iterable
 
 from dateutil.parser import parse as date_parse
 from django.utils.translation import gettext_lazy as _
@@ -17,6 +18,9 @@ from utils.dtypes import dataclass_from_dict
 from utils.email import send_email_with_template
 from utils.frontend import build_post_comment_url
 
+# Notifications written at once by NotificationTypeBase.send_many
+NOTIFICATIONS_BATCH_SIZE = 1000
+
 
 @dataclass
 class NotificationPostParams:
@@ -131,6 +135,48 @@ class NotificationTypeBase:
 
         return notification
 
+    @classmethod
+    def send_many(
+        cls,
+        recipients: Iterable[User],
+        params_by_recipient: dict[int, ParamsType],
+        mailing_tag: MailingTags = None,
+    ) -> list[Notification]:
+        """
+        Sends the notification to many recipients at once
+
+        params_by_recipient: the params of each recipient, by recipient id
+        """
+
+        recipient_ids = [recipient.id for recipient in recipients]
+
+        # Skip the recipients who ignored this notification
+        if mailing_tag and recipient_ids:
+            recipient_ids = (
+                User.objects.filter(id__in=recipient_ids)
+                .exclude(unsubscribed_mailing_tags__contains=[mailing_tag])
+                .values_list("id", flat=True)
+            )
+
+        # Recipients often share the same params object
+        serialized_params = {}
+        notifications = []
+        for recipient_id in recipient_ids:
+            params = params_by_recipient[recipient_id]
+            if id(params) not in serialized_params:
+                serialized_params[id(params)] = asdict(params)
+            notifications.append(
+                Notification(
+                    type=cls.type,
+                    recipient_id=recipient_id,
+                    params=serialized_params[id(params)],
+                )
+            )
+
+        return Notification.objects.bulk_create(
+            notifications, batch_size=NOTIFICATIONS_BATCH_SIZE
+        )
+
     @classmethod
     def generate_subject_group(cls, recipient: User):
         """
@@ -44,9 +44,9 @@ def job_check_post_open_event():
 
 @dramatiq.actor
 def job_compute_movement():
-    from posts.services.common import compute_movement
+    from posts.services.common import compute_posts_movement
 
-    qs = (
+    posts = list(
         Post.objects.filter_active()
         .filter(
             Q(question__isnull=False)
@@ -55,24 +55,12 @@ def job_compute_movement():
         )
         .prefetch_questions()
     )
-    total = qs.count()
+    movements = compute_posts_movement(posts)
 
-    posts = []
+    # Posts failing to compute keep their previous movement
+    posts = [post for post in posts if post.id in movements]
+    for post in posts:
+        post.movement = movements[post.id]
 
-    for idx, post in enumerate(qs.iterator(100)):
-        try:
-            post.movement = compute_movement(post)
-        except:
-            logger.exception(f"Error during compute_movement for post_id {post.id}")
-            continue
-
-        posts.append(post)
-
-        if len(posts) >= 100:
-            Post.objects.bulk_update(posts, fields=["movement"])
-            posts = []
-
-        if not idx % 100:
-            logger.info(f"Processed {idx + 1}/{total}. ")
-
-    Post.objects.bulk_update(posts, fields=["movement"])
+    Post.objects.bulk_update(posts, fields=["movement"], batch_size=500)
+    logger.info(f"Computed the movement of {len(posts)} posts")
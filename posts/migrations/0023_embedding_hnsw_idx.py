@@ -0,0 +1,35 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:25
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+import pgvector.django.halfvec
+import pgvector.django.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "posts",
+            "0022_remove_postsubscription_postsubscription_unique_type_user_post_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="post",
+            index=pgvector.django.indexes.HnswIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.comparison.Cast(
+                        "embedding_vector",
+                        pgvector.django.halfvec.HalfVectorField(dimensions=3072),
+                    ),
+                    name="halfvec_cosine_ops",
+                ),
+                ef_construction=64,
+                m=16,
+                name="post_embedding_hnsw_idx",
+            ),
+        ),
+    ]
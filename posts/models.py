@@ -24,7 +24,7 @@ from projects.permissions import ObjectPermission
 from questions.models import Question, Conditional, GroupOfQuestions, Forecast
 from scoring.models import Score
 from users.models import User
-from utils.models import TimeStampedModel
+from utils.models import TimeStampedModel, embedding_hnsw_index
 
 
 class PostQuerySet(models.QuerySet):
@@ -476,6 +476,9 @@ class Post(TimeStampedModel):
 
     objects = PostManager()
 
+    class Meta:
+        indexes = [embedding_hnsw_index("embedding_vector", "post_embedding_hnsw_idx")]
+
     def __str__(self):
         return self.title
 
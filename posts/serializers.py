@@ -21,6 +21,7 @@ from questions.serializers import (
     serialize_group,
     ConditionalWriteSerializer,
     GroupOfQuestionsWriteSerializer,
+    prefetch_questions_aggregations,
 )
 from users.models import User
 from .models import Notebook, Post, PostSubscription
@@ -307,6 +308,11 @@ def serialize_post_many(
     objects = list(qs.all())
     objects.sort(key=lambda obj: ids.index(obj.id))
 
+    if with_cp:
+        prefetch_questions_aggregations(
+            question for post in objects for question in post.get_questions()
+        )
+
     return [
         serialize_post(
             post,
@@ -1,7 +1,7 @@
 import logging
 from datetime import timedelta
 
-from django.db.models import Q, Count, Sum, Value, Case, When, F
+from django.db.models import Q, Count, Sum, Value, Case, When, F, QuerySet
 from django.db.models.functions import Coalesce
 from django.utils import timezone
 from rest_framework.exceptions import ValidationError
@@ -14,15 +14,29 @@ from projects.services import (
     get_site_main_project,
     notify_project_subscriptions_post_open,
 )
+from questions.models import Forecast, Question
 from questions.services import (
     create_question,
     create_conditional,
     create_group_of_questions,
+    get_aggregate_forecasts_at_time,
 )
+from scoring.reputation import (
+    follow_reputation_ledger_visibility,
+    get_public_question_ids,
+    update_reputation_ledger_visibility,
+)
+from scoring.utils import update_post_leaderboard_questions
 from users.models import User
 from utils.dtypes import flatten
-from utils.the_math.community_prediction import get_aggregation_at_time
-from utils.the_math.measures import prediction_difference_for_sorting
+from utils.the_math.community_prediction import (
+    get_active_forecasts,
+    get_aggregation_at_time,
+)
+from utils.the_math.measures import (
+    prediction_difference_for_sorting,
+    prediction_differences_for_sorting,
+)
 from .subscriptions import notify_post_status_change
 from ..tasks import run_notify_post_status_change
 
@@ -40,6 +54,7 @@ def add_categories(categories: list[int], post: Post):
             raise ValidationError(f"Category with id {category_id} does not exist")
         post.projects.add(Project.objects.get(pk=category_id))
     post.save()
+    update_post_leaderboard_questions(post)
 
 
 def create_post(
@@ -99,6 +114,7 @@ def create_post(
 
     # Adding projects
     obj.projects.add(*(meta_projects + main_projects))
+    update_post_leaderboard_questions(obj)
 
     # Run async tasks
     from ..tasks import run_post_indexing
@@ -121,24 +137,92 @@ def get_post_permission_for_user(post: Post, user: User = None) -> ObjectPermiss
     return perm
 
 
-def compute_movement(post: Post) -> float | None:
-    questions = post.get_questions()
-    movement = None
-    for question in questions:
-        cp_now = get_aggregation_at_time(question, timezone.now())
-        cp_previous = get_aggregation_at_time(
-            question, timezone.now() - timezone.timedelta(days=7)
+def get_post_questions_qs(post: Post) -> QuerySet[Question]:
+    return Question.objects.filter(Q(post=post) | Q(group__post=post))
+
+
+def update_post_default_project(post: Post, default_project_id: int):
+    """
+    The default project decides whether the questions of the post are public,
+    and so whether their scores count for reputation
+    """
+    with follow_reputation_ledger_visibility(get_post_questions_qs(post)):
+        post.default_project_id = default_project_id
+        post.save(update_fields=["default_project"])
+
+
+def delete_post(post: Post):
+    # Questions left without post aren't public anymore
+    with follow_reputation_ledger_visibility(get_post_questions_qs(post)):
+        post.delete()
+
+
+def delete_question(question: Question):
+    # Its scores are deleted along with it
+    update_reputation_ledger_visibility(
+        get_public_question_ids(Question.objects.filter(pk=question.pk)), set()
+    )
+    question.delete()
+
+
+def compute_posts_movement(posts: list[Post]) -> dict[int, float | None]:
+    """
+    Computes the weekly CP movement of the given posts from the stored
+    aggregation history. The stored history is minimized, so the CP of a week
+    ago is the stored entry that started last before it, as the history shows it.
+    Posts failing to compute are logged and left out
+    """
+    now = timezone.now()
+    week_ago = now - timedelta(days=7)
+    questions_by_post = {post.id: post.get_questions() for post in posts}
+    question_ids = {
+        question.id
+        for questions in questions_by_post.values()
+        for question in questions
+    }
+    cps_now = get_aggregate_forecasts_at_time(question_ids, now)
+    cps_previous = get_aggregate_forecasts_at_time(question_ids, week_ago)
+
+    # The stored history has no entries while all the forecasts are withdrawn,
+    # so the entry that started last before a week ago may not be active then
+    forecasted_question_ids = set(
+        Forecast.objects.filter(
+            Q(end_time__isnull=True) | Q(end_time__gt=week_ago),
+            question_id__in=list(cps_previous),
+            start_time__lte=week_ago,
         )
-        if cp_now is None or cp_previous is None:
+        .values_list("question_id", flat=True)
+        .distinct()
+    )
+
+    movements = {}
+    for post_id, questions in questions_by_post.items():
+        movement = None
+        try:
+            for question in questions:
+                cp_now = cps_now.get(question.id)
+                # The CP is gone once all the forecasts were withdrawn
+                if cp_now is None or (cp_now.end_time and cp_now.end_time <= now):
+                    continue
+                cp_previous = cps_previous.get(question.id)
+                if cp_previous is None or question.id not in forecasted_question_ids:
+                    continue
+                difference = prediction_difference_for_sorting(
+                    cp_now.get_prediction_values(),
+                    cp_previous.get_prediction_values(),
+                    question,
+                )
+                if (movement is None) or (abs(difference) > abs(movement)):
+                    movement = difference
+        except Exception:
+            logger.exception(f"Error during compute_movement for post_id {post_id}")
             continue
-        difference = prediction_difference_for_sorting(
-            cp_now.get_prediction_values(),
-            cp_previous.get_prediction_values(),
-            question,
-        )
-        if (movement is None) or (abs(difference) > abs(movement)):
-            movement = difference
-    return movement
+        movements[post_id] = movement
+    return movements
+
+
+def compute_movement(post: Post) -> float | None:
+    return compute_posts_movement([post]).get(post.id)
 
 
 # Computes the jeffry divergence
@@ -147,20 +231,17 @@ def compute_sorting_divergence(post: Post) -> dict[int, float]:
     questions = post.get_questions()
     now = timezone.now()
     for question in questions:
-        cp = get_aggregation_at_time(question, now)
+        active_forecasts = list(get_active_forecasts(question, now))
+        cp = get_aggregation_at_time(question, now, forecasts=active_forecasts)
         if cp is None:
             continue
 
-        active_forecasts = question.user_forecasts.filter(
-            Q(end_time__isnull=True) | Q(end_time__gt=now),
-            start_time__lte=now,
+        differences = prediction_differences_for_sorting(
+            [forecast.get_prediction_values() for forecast in active_forecasts],
+            cp.get_prediction_values(),
+            question,
         )
-        for forecast in active_forecasts:
-            difference = prediction_difference_for_sorting(
-                forecast.get_prediction_values(),
-                cp.get_prediction_values(),
-                question,
-            )
+        for forecast, difference in zip(active_forecasts, differences.tolist()):
             if (forecast.author_id not in user_divergences) or (
                 abs(user_divergences[forecast.author_id]) < abs(difference)
             ):
@@ -172,20 +253,17 @@ def compute_sorting_divergence(post: Post) -> dict[int, float]:
 def compute_post_sorting_divergence_and_update_snapshots(post: Post):
     divergence = compute_sorting_divergence(post)
 
-    snapshots = PostUserSnapshot.objects.filter(
-        post=post, user_id__in=divergence.keys()
+    snapshots = list(
+        PostUserSnapshot.objects.filter(post=post, user_id__in=divergence.keys()).only(
+            "id", "user_id"
+        )
     )
-
-    bulk_update = []
-
     for user_snapshot in snapshots:
-        div = divergence.get(user_snapshot.user_id)
+        user_snapshot.divergence = divergence[user_snapshot.user_id]
 
-        if div is not None:
-            user_snapshot.divergence = div
-            bulk_update.append(user_snapshot)
-
-    PostUserSnapshot.objects.bulk_update(bulk_update, fields=["divergence"])
+    PostUserSnapshot.objects.bulk_update(
+        snapshots, fields=["divergence"], batch_size=500
+    )
 
 
 def compute_hotness():
@@ -146,7 +146,8 @@ def get_posts_feed(
             raise ValidationError("similar_to_post does not exist")
 
         qs = qs_filter_similar_posts(qs, similar_to_post)
-        order_by = "-rank"
+        # Ascending distance is served by the embedding index
+        order_by = "distance"
 
     # Search
     if search:
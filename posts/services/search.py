@@ -2,7 +2,7 @@ import asyncio
 import logging
 
 import numpy as np
-from django.db.models import Value, Case, When, FloatField, QuerySet
+from django.db.models import Value, Case, When, F, FloatField, QuerySet
 from pgvector.django import CosineDistance
 
 from posts.models import Post
@@ -11,6 +11,7 @@ from utils.openai import (
     chunked_tokens,
     generate_text_embed_vector,
 )
+from utils.models import embedding_distance
 from utils.serper_google import get_google_search_results
 
 logger = logging.getLogger(__name__)
@@ -110,9 +111,19 @@ async def perform_google_search(
 
 
 def _qs_filter_similar_posts(qs: QuerySet[Post], embedding_vector):
-    return qs.annotate(
-        rank=1 - CosineDistance("embedding_vector", embedding_vector)
-    ).filter(rank__isnull=False)
+    """
+    Order by "distance" and slice the queryset
+    to look the posts up through the embedding index
+    """
+
+    if embedding_vector is None:
+        return qs.none()
+
+    return (
+        qs.filter(embedding_vector__isnull=False)
+        .annotate(distance=embedding_distance("embedding_vector", embedding_vector))
+        .annotate(rank=1 - F("distance"))
+    )
 
 
 def qs_filter_similar_posts(qs: QuerySet[Post], post: Post):
@@ -135,5 +146,5 @@ def get_similar_posts_for_multiple_posts(posts: list[Post]):
             Post.objects.filter_permission().filter_active(), vector
         )
         .exclude(pk__in=[p.pk for p in posts])
-        .order_by("-rank")
+        .order_by("distance")
     )
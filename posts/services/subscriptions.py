@@ -1,3 +1,5 @@
+import bisect
+from collections import defaultdict
 from datetime import datetime, timedelta
 
 from django.contrib.postgres.aggregates import ArrayAgg
@@ -141,7 +143,7 @@ def _get_question_data_for_cp_change_notification(
         user_q1, user_median, user_q3 = None, None, None
         if user_forecast:
             user_q1, user_median, user_q3 = get_scaled_quartiles_from_cdf(
-                user_forecast.continuous_cdf, question
+                user_forecast.get_cdf(), question
             )
         data.user_q1 = user_q1
         data.user_median = user_median
@@ -150,42 +152,77 @@ def _get_question_data_for_cp_change_notification(
     return question_data
 
 
+def _get_cp_change_entry_index(
+    history: list[AggregateForecast], start_times: list[datetime], time: datetime
+) -> int:
+    """
+    Index of the entry of the history active at time,
+    falling back to the latest entry when none is
+    """
+    index = bisect.bisect_right(start_times, time) - 1 if time else -1
+    if index >= 0 and (
+        history[index].end_time is None or history[index].end_time > time
+    ):
+        return index
+    return len(history) - 1
+
+
 def notify_post_cp_change(post: Post):
     """
-    TODO: write description and check over
+    Notifies the CP_CHANGE subscribers of the post whose threshold was reached
+    since their last notification
+
+    Subscriptions are grouped by the aggregation entries their last_sent_at
+    falls into, so the CP change is evaluated once per group
     """
 
-    subscriptions = post.subscriptions.filter(
-        type=PostSubscription.SubscriptionType.CP_CHANGE
-    ).select_related("user")
-    questions = Question.objects.filter(
-        Q(post=post) | Q(group__post=post)
-    ).prefetch_related("user_forecasts")
-    forecast_history = {
-        question: AggregateForecast.objects.filter(
-            question=question,
-            method=AggregationMethod.RECENCY_WEIGHTED,
-        )
+    subscriptions = list(
+        post.subscriptions.filter(
+            type=PostSubscription.SubscriptionType.CP_CHANGE
+        ).select_related("user")
+    )
+    if not subscriptions:
+        return
+
+    questions = list(Question.objects.filter(Q(post=post) | Q(group__post=post)))
+    forecast_history: dict[int, list[AggregateForecast]] = defaultdict(list)
+    for entry in AggregateForecast.objects.filter(
+        question__in=questions,
+        method=AggregationMethod.RECENCY_WEIGHTED,
+    ).order_by("start_time"):
+        forecast_history[entry.question_id].append(entry)
+    questions = [question for question in questions if forecast_history[question.id]]
+    start_times = {
+        question.id: [entry.start_time for entry in forecast_history[question.id]]
         for question in questions
     }
 
+    subscriptions_by_entries: dict[tuple[int, ...], list[PostSubscription]] = (
+        defaultdict(list)
+    )
     for subscription in subscriptions:
-        last_sent = subscription.last_sent_at
+        entry_indexes = tuple(
+            _get_cp_change_entry_index(
+                forecast_history[question.id],
+                start_times[question.id],
+                subscription.last_sent_at,
+            )
+            for question in questions
+        )
+        subscriptions_by_entries[entry_indexes].append(subscription)
+
+    # (subscription, [(question, previous entry, display diff)]) to notify
+    to_notify = []
+    for entry_indexes, bucket in subscriptions_by_entries.items():
         max_sorting_diff = None
         display_diff = None
-        question_data: list[CPChangeData] = []
-        for question, forecast_summary in forecast_history.items():
-            entry: AggregateForecast | None = None
-            for entry in forecast_summary:
-                if entry.start_time <= last_sent and (
-                    entry.end_time is None or entry.end_time > last_sent
-                ):
-                    break
-            if entry is None:
-                continue
-            old_forecast_values = entry.forecast_values
-            current_entry = forecast_summary[-1]
-            current_forecast_values = current_entry.forecast_values
+        questions_entries = []
+        for question, index in zip(questions, entry_indexes):
+            entry = forecast_history[question.id][index]
+            old_forecast_values = entry.get_prediction_values()
+            current_forecast_values = forecast_history[question.id][
+                -1
+            ].get_prediction_values()
             difference = prediction_difference_for_sorting(
                 old_forecast_values,
                 current_forecast_values,
@@ -198,37 +235,72 @@ def notify_post_cp_change(post: Post):
                     current_forecast_values,
                     question=question,
                 )
-            user_pred: Forecast = (
-                question.user_forecasts.filter(author=subscription.user)
-                .order_by("-start_time")
-                .first()
-            )
+            questions_entries.append((question, entry, display_diff))
+
+        for subscription in bucket:
+            if (
+                max_sorting_diff
+                and max_sorting_diff >= subscription.cp_change_threshold
+            ):
+                to_notify.append((subscription, questions_entries))
+
+    if not to_notify:
+        return
+
+    user_forecasts: dict[tuple[int, int], Forecast] = {
+        (forecast.question_id, forecast.author_id): forecast
+        for forecast in Forecast.objects.filter(
+            question__in=questions,
+            author_id__in={subscription.user_id for subscription, _ in to_notify},
+        )
+        .order_by("question_id", "author_id", "-start_time")
+        .distinct("question_id", "author_id")
+    }
+
+    post_params = NotificationPostParams.from_post(post)
+    # A user may have both a post and a global subscription, notified separately
+    params_by_recipient: dict[bool, dict[int, NotificationPostCPChange.ParamsType]] = (
+        defaultdict(dict)
+    )
+    for subscription, questions_entries in to_notify:
+        question_data: list[CPChangeData] = []
+        for question, entry, display_diff in questions_entries:
             question_data += _get_question_data_for_cp_change_notification(
                 question,
-                current_entry,
+                forecast_history[question.id][-1],
                 entry,
                 display_diff,
-                user_pred,
+                user_forecasts.get((question.id, subscription.user_id)),
             )
-
-        if max_sorting_diff and max_sorting_diff >= subscription.cp_change_threshold:
-            NotificationPostCPChange.send(
-                subscription.user,
-                NotificationPostCPChange.ParamsType(
-                    post=NotificationPostParams.from_post(post),
-                    question_data=question_data,
-                ),
-                # Send notifications to the users that subscribed to the post CP changes
-                # Or we automatically subscribed them for "Forecasted Questions CP change"
-                mailing_tag=(
-                    None
-                    if not subscription.is_global
-                    else MailingTags.FORECASTED_CP_CHANGE
-                ),
+        params_by_recipient[subscription.is_global][subscription.user_id] = (
+            NotificationPostCPChange.ParamsType(
+                post=post_params,
+                question_data=question_data,
             )
+        )
+        subscription.update_last_sent_at()
 
-            subscription.update_last_sent_at()
-            subscription.save()
+    # Send notifications to the users that subscribed to the post CP changes
+    # Or we automatically subscribed them for "Forecasted Questions CP change"
+    for is_global, mailing_tag in [
+        (False, None),
+        (True, MailingTags.FORECASTED_CP_CHANGE),
+    ]:
+        NotificationPostCPChange.send_many(
+            [
+                subscription.user
+                for subscription, _ in to_notify
+                if subscription.is_global == is_global
+            ],
+            params_by_recipient[is_global],
+            mailing_tag=mailing_tag,
+        )
+
+    PostSubscription.objects.bulk_update(
+        [subscription for subscription, _ in to_notify],
+        ["last_sent_at"],
+        batch_size=500,
+    )
 
 
 def notify_new_comments(post: Post):
@@ -351,16 +423,20 @@ def notify_post_status_change(post: Post, event: PostSubscription.PostStatusChan
         type=PostSubscription.SubscriptionType.STATUS_CHANGE
     ).select_related("user")
 
-    for subscription in subscriptions:
-        NotificationPostStatusChange.send(
-            subscription.user,
-            NotificationPostStatusChange.ParamsType(
-                post=NotificationPostParams.from_post(post), event=event
-            ),
-        )
+    subscriptions = list(subscriptions)
+    params = NotificationPostStatusChange.ParamsType(
+        post=NotificationPostParams.from_post(post), event=event
+    )
+    NotificationPostStatusChange.send_many(
+        [subscription.user for subscription in subscriptions],
+        {subscription.user_id: params for subscription in subscriptions},
+    )
 
+    for subscription in subscriptions:
         subscription.update_last_sent_at()
-        subscription.save()
+    PostSubscription.objects.bulk_update(
+        subscriptions, ["last_sent_at"], batch_size=500
+    )
 
 
 def notify_date():
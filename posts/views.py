@@ -29,8 +29,11 @@ from posts.serializers import (
 )
 from posts.services.common import (
     create_post,
+    delete_post,
+    delete_question,
     get_post_permission_for_user,
     add_categories,
+    update_post_default_project,
 )
 from posts.services.feed import get_posts_feed
 from posts.services.subscriptions import create_subscription
@@ -43,6 +46,7 @@ from questions.serializers import (
     QuestionWriteSerializer,
 )
 from questions.services import clone_question, create_question
+from scoring.utils import update_post_leaderboard_questions
 from utils.files import UserUploadedImage, generate_filename
 
 
@@ -186,6 +190,7 @@ def post_create_api_view(request):
         print(news_project, request.data["news_type"])
         post.projects.add(news_project)
         post.save()
+        update_post_leaderboard_questions(post)
 
     return Response(
         serialize_post(post, with_cp=False, current_user=request.user),
@@ -203,6 +208,7 @@ def remove_from_project(request, pk):
     print(len(post.projects.all()))
     post.projects.set([x for x in post.projects.all() if x.id != project_id])
     post.save()
+    update_post_leaderboard_questions(post)
     print(len(post.projects.all()))
     return Response({}, status=status.HTTP_200_OK)
 
@@ -264,7 +270,7 @@ def post_update_api_view(request, pk):
                 question = Question.objects.get(
                     pk=question_id, group_id=post.group_of_questions.id
                 )
-                question.delete()
+                delete_question(question)
         if sub_questions:
             for sub_question_data in sub_questions:
                 if sub_question_data.get("id", None):
@@ -300,8 +306,10 @@ def post_update_api_view(request, pk):
     if "categories" in request.data:
         add_categories(request.data["categories"], post)
     if "default_project_id" in request.data:
-        post.default_project_id = request.data["default_project_id"]
+        update_post_default_project(post, request.data["default_project_id"])
     serializer.save()
+    # Publication time and projects decide the leaderboards of its questions
+    update_post_leaderboard_questions(post)
     return Response(serializer.data)
 
 
@@ -313,7 +321,7 @@ def post_delete_api_view(request, pk):
     permission = get_post_permission_for_user(post, user=request.user)
     ObjectPermission.can_delete(permission, raise_exception=True)
 
-    post.delete()
+    delete_post(post)
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -1,9 +1,13 @@
 from django.contrib import admin
 
 from projects.models import Project
+from projects.services import save_project
 
 
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
     search_fields = ["type", "name"]
     autocomplete_fields = ["created_by"]
+
+    def save_model(self, request, obj, form, change):
+        save_project(obj)
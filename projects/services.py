@@ -9,6 +9,8 @@ from notifications.services import (
 from posts.models import Post, PostSubscription
 from projects.models import Project, ProjectUserPermission, ProjectSubscription
 from projects.permissions import ObjectPermission
+from questions.models import Question
+from scoring.reputation import follow_reputation_ledger_visibility
 from users.models import User
 
 
@@ -44,6 +46,31 @@ def create_private_user_project(user: User):
     return obj
 
 
+def save_project(project: Project):
+    """
+    Saves the project. Its default permission decides whether the questions
+    it is the default project of are public, and so count for reputation
+    """
+    previous_permission = (
+        Project.objects.filter(pk=project.pk)
+        .values_list("default_permission", flat=True)
+        .first()
+        if project.pk
+        else None
+    )
+    if not project.pk or (previous_permission is None) == (
+        project.default_permission is None
+    ):
+        project.save()
+        return
+
+    questions = Question.objects.filter(
+        Q(post__default_project=project) | Q(group__post__default_project=project)
+    )
+    with follow_reputation_ledger_visibility(questions):
+        project.save()
+
+
 def get_project_permission_for_user(
     project: Project, user: User = None
 ) -> ObjectPermission:
@@ -108,12 +135,16 @@ def notify_project_subscriptions_post_open(post: Post):
     )
 
     # Ensure post is available for users
-    for subscription in subscriptions:
-        NotificationPostStatusChange.send(
-            subscription.user,
-            NotificationPostStatusChange.ParamsType(
-                post=NotificationPostParams.from_post(post),
+    subscriptions = list(subscriptions)
+    post_params = NotificationPostParams.from_post(post)
+    NotificationPostStatusChange.send_many(
+        [subscription.user for subscription in subscriptions],
+        {
+            subscription.user_id: NotificationPostStatusChange.ParamsType(
+                post=post_params,
                 event=PostSubscription.PostStatusChange.OPEN,
                 project=NotificationProjectParams.from_project(subscription.project),
-            ),
-        )
+            )
+            for subscription in subscriptions
+        },
+    )
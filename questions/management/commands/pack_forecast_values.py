@@ -0,0 +1,63 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from questions.models import AggregateForecast, Forecast
+from questions.serializers import invalidate_question_aggregations
+
+
+def convert_values_storage(qs, fields: list[str], batch_size: int) -> int:
+    converted = 0
+    batch = []
+    for obj in qs.only("id", *fields).iterator(chunk_size=batch_size):
+        if obj.apply_values_storage():
+            batch.append(obj)
+        if len(batch) >= batch_size:
+            qs.model.objects.bulk_update(batch, fields)
+            converted += len(batch)
+            batch = []
+    qs.model.objects.bulk_update(batch, fields)
+    return converted + len(batch)
+
+
+class Command(BaseCommand):
+    help = """
+    Moves stored continuous CDFs to the storage mode configured by
+    FORECAST_VALUES_PACKING: packed bytea blobs when set, float arrays otherwise.
+    Safe to rerun, only rows stored in the other mode are rewritten.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch_size", type=int, default=1000)
+
+    def handle(self, *args, batch_size: int, **options):
+        tm = time.time()
+        packing = settings.FORECAST_VALUES_PACKING
+        self.stdout.write(f"Converting forecast values to {packing or 'float arrays'}")
+
+        forecasts = Forecast.objects.filter(
+            Q(continuous_cdf__isnull=False)
+            if packing
+            else Q(continuous_cdf_packed__isnull=False)
+        )
+        converted = convert_values_storage(
+            forecasts, ["continuous_cdf", "continuous_cdf_packed"], batch_size
+        )
+        self.stdout.write(f"Converted {converted} forecasts")
+
+        aggregate_forecasts = AggregateForecast.objects.filter(
+            Q(forecast_values__len__gt=2)
+            if packing
+            else Q(forecast_values_packed__isnull=False)
+        )
+        converted = convert_values_storage(
+            aggregate_forecasts,
+            ["forecast_values", "forecast_values_packed"],
+            batch_size,
+        )
+        self.stdout.write(f"Converted {converted} aggregate forecasts")
+        # Packing may round the values
+        invalidate_question_aggregations()
+        self.stdout.write(self.style.SUCCESS(f"Done in {round(time.time() - tm)}s"))
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.14 on 2026-10-18 18:56
+
+import django.contrib.postgres.fields
+import utils.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questions", "0016_alter_forecast_question"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="aggregateforecast",
+            name="forecast_values_packed",
+            field=utils.models.PackedFloatArrayField(null=True),
+        ),
+        migrations.AddField(
+            model_name="forecast",
+            name="continuous_cdf_packed",
+            field=utils.models.PackedFloatArrayField(null=True),
+        ),
+        migrations.AlterField(
+            model_name="aggregateforecast",
+            name="forecast_values",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.FloatField(), max_length=201, null=True, size=None
+            ),
+        ),
+    ]
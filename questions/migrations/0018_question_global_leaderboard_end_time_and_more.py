@@ -0,0 +1,30 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questions", "0017_packed_forecast_values"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="question",
+            name="global_leaderboard_end_time",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="question",
+            name="global_leaderboard_start_time",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                fields=["global_leaderboard_start_time", "global_leaderboard_end_time"],
+                name="question_global_lb_window_idx",
+            ),
+        ),
+    ]
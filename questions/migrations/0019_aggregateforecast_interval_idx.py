@@ -0,0 +1,20 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questions", "0018_question_global_leaderboard_end_time_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="aggregateforecast",
+            index=models.Index(
+                fields=["question", "method", "start_time", "end_time"],
+                name="aggregate_interval_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questions", "0019_aggregateforecast_interval_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="aggregateforecast",
+            name="computed_at",
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from datetime import datetime, timedelta
 from typing import TYPE_CHECKING
 
+from django.conf import settings
 from django.contrib.postgres.fields import ArrayField
 from django.db import models
 from django.db.models import Count, Q
@@ -9,7 +10,8 @@ from sql_util.aggregates import SubqueryAggregate
 
 from questions.types import AggregationMethod
 from users.models import User
-from utils.models import TimeStampedModel
+from utils.models import PackedFloatArrayField, TimeStampedModel
+from utils.typing import ForecastValues
 
 if TYPE_CHECKING:
     from posts.models import Post
@@ -122,6 +124,30 @@ class Question(TimeStampedModel):
             self.actual_close_time, self.actual_resolve_time
         )
 
+    # Denormalized get_global_leaderboard_dates, set once the question resolves
+    global_leaderboard_start_time = models.DateTimeField(
+        null=True, blank=True, editable=False
+    )
+    global_leaderboard_end_time = models.DateTimeField(
+        null=True, blank=True, editable=False
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["global_leaderboard_start_time", "global_leaderboard_end_time"],
+                name="question_global_lb_window_idx",
+            ),
+        ]
+
+    def set_global_leaderboard_dates(self):
+        window = None
+        if self.open_time and self.actual_close_time and self.resolution_set_time:
+            window = self.get_global_leaderboard_dates()
+        self.global_leaderboard_start_time, self.global_leaderboard_end_time = (
+            window or (None, None)
+        )
+
     def get_post(self) -> "Post | None":
         # Back-rel of One2One relations does not populate None values,
         # So we always need to check whether attr exists
@@ -215,6 +241,8 @@ class Forecast(models.Model):
         null=True,
         size=CDF_SIZE,
     )
+    # continuous_cdf when settings.FORECAST_VALUES_PACKING is set
+    continuous_cdf_packed = PackedFloatArrayField(null=True)
 
     probability_yes = models.FloatField(null=True)
     probability_yes_per_category = ArrayField(models.FloatField(), null=True)
@@ -242,28 +270,51 @@ class Forecast(models.Model):
 
     slider_values = models.JSONField(null=True)
 
-    def get_prediction_values(self) -> list[float]:
+    def get_cdf(self) -> ForecastValues | None:
+        if self.continuous_cdf_packed is not None:
+            return self.continuous_cdf_packed
+        return self.continuous_cdf
+
+    def get_prediction_values(self) -> ForecastValues:
         if self.probability_yes:
             return [1 - self.probability_yes, self.probability_yes]
         if self.probability_yes_per_category:
             return self.probability_yes_per_category
-        return self.continuous_cdf
+        return self.get_cdf()
 
     def get_pmf(self) -> list[float]:
         if self.probability_yes:
             return [1 - self.probability_yes, self.probability_yes]
         if self.probability_yes_per_category:
             return self.probability_yes_per_category
-        cdf = self.continuous_cdf
+        cdf = self.get_cdf()
         pmf = [cdf[0]]
         for i in range(1, len(cdf)):
             pmf.append(cdf[i] - cdf[i - 1])
         pmf.append(1 - cdf[-1])
         return pmf
 
+    def apply_values_storage(self) -> bool:
+        """
+        Moves the cdf to the column of the configured storage mode.
+        Returns whether anything was moved
+        """
+        if settings.FORECAST_VALUES_PACKING:
+            if self.continuous_cdf is None:
+                return False
+            self.continuous_cdf_packed = self.continuous_cdf
+            self.continuous_cdf = None
+        else:
+            if self.continuous_cdf_packed is None:
+                return False
+            self.continuous_cdf = self.continuous_cdf_packed.tolist()
+            self.continuous_cdf_packed = None
+        return True
+
     def save(self, **kwargs):
         if not self.post:
             self.post = self.question.get_post()
+        self.apply_values_storage()
 
         return super().save(**kwargs)
 
@@ -278,27 +329,66 @@ class AggregateForecast(models.Model):
     method = models.CharField(max_length=200, choices=AggregationMethod.choices)
     start_time = models.DateTimeField(db_index=True)
     end_time = models.DateTimeField(null=True, db_index=True)
-    forecast_values = ArrayField(models.FloatField(), max_length=CDF_SIZE)
+    forecast_values = ArrayField(models.FloatField(), max_length=CDF_SIZE, null=True)
+    # continuous forecast_values when settings.FORECAST_VALUES_PACKING is set
+    forecast_values_packed = PackedFloatArrayField(null=True)
     forecaster_count = models.IntegerField(null=True)
     interval_lower_bounds = ArrayField(models.FloatField(), null=True)
     centers = ArrayField(models.FloatField(), null=True)
     interval_upper_bounds = ArrayField(models.FloatField(), null=True)
     means = ArrayField(models.FloatField(), null=True)
     histogram = ArrayField(models.FloatField(), null=True, size=100)
-
-    def get_cdf(self) -> list[float] | None:
-        if len(self.forecast_values) == CDF_SIZE:
-            return self.forecast_values
+    # Start of the build that aggregated the entry, see get_cp_history_incremental
+    computed_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            # Point-in-time lookups of the stored aggregation history
+            models.Index(
+                fields=["question", "method", "start_time", "end_time"],
+                name="aggregate_interval_idx",
+            ),
+        ]
+
+    def get_cdf(self) -> ForecastValues | None:
+        values = self.get_prediction_values()
+        if len(values) == CDF_SIZE:
+            return values
 
     def get_pmf(self) -> list[float]:
-        if len(self.forecast_values) == CDF_SIZE:
-            cdf = self.forecast_values
+        values = self.get_prediction_values()
+        if len(values) == CDF_SIZE:
+            cdf = values
             pmf = [cdf[0]]
             for i in range(1, len(cdf)):
                 pmf.append(cdf[i] - cdf[i - 1])
             pmf.append(1 - cdf[-1])
             return pmf
-        return self.forecast_values
+        return values
 
-    def get_prediction_values(self) -> list[float]:
+    def get_prediction_values(self) -> ForecastValues:
+        if self.forecast_values_packed is not None:
+            return self.forecast_values_packed
         return self.forecast_values
+
+    def apply_values_storage(self) -> bool:
+        """
+        Moves continuous forecast values to the column of the configured
+        storage mode. Returns whether anything was moved
+        """
+        if settings.FORECAST_VALUES_PACKING:
+            if self.forecast_values is None or len(self.forecast_values) != CDF_SIZE:
+                return False
+            self.forecast_values_packed = self.forecast_values
+            self.forecast_values = None
+        else:
+            if self.forecast_values_packed is None:
+                return False
+            self.forecast_values = self.forecast_values_packed.tolist()
+            self.forecast_values_packed = None
+        return True
+
+    def save(self, **kwargs):
+        self.apply_values_storage()
+
+        return super().save(**kwargs)
@@ -1,7 +1,11 @@
 from datetime import datetime, timezone as dt_timezone
 
 from collections import defaultdict
+from typing import Iterable
 
+import numpy as np
+from django.core.cache import cache
+from django.db import models
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
@@ -10,11 +14,12 @@ from questions.models import Forecast
 from users.models import User
 from utils.the_math.formulas import get_scaled_quartiles_from_cdf
 from utils.the_math.measures import (
-    percent_point_function,
+    percent_point_functions,
     prediction_difference_for_display,
 )
 from .constants import ResolutionType
 from .models import Question, Conditional, GroupOfQuestions, AggregateForecast
+from .types import AggregationMethod
 from .services import (
     build_question_forecasts_for_user,
     get_forecast_initial_dict,
@@ -150,7 +155,15 @@ class GroupOfQuestionsWriteSerializer(serializers.ModelSerializer):
         )
 
 
+def serialize_forecast_values(values) -> list[float] | None:
+    # Packed forecast values are loaded as numpy arrays
+    if isinstance(values, np.ndarray):
+        return values.tolist()
+    return values
+
+
 class ForecastSerializer(serializers.ModelSerializer):
+    continuous_cdf = serializers.SerializerMethodField()
     quartiles = serializers.SerializerMethodField()
     range_min = serializers.FloatField(source="question.range_min")
     range_max = serializers.FloatField(source="question.range_max")
@@ -175,10 +188,38 @@ class ForecastSerializer(serializers.ModelSerializer):
             "question_type",
         )
 
+    def get_continuous_cdf(self, forecast: Forecast) -> list[float] | None:
+        return serialize_forecast_values(forecast.get_cdf())
+
     def get_quartiles(self, forecast: Forecast):
         question = forecast.question
         if question.type in [Question.QuestionType.DATE, Question.QuestionType.NUMERIC]:
-            return get_scaled_quartiles_from_cdf(forecast.continuous_cdf, question)
+            return get_scaled_quartiles_from_cdf(forecast.get_cdf(), question)
+
+
+def get_forecasts_quartiles(forecasts: list[Forecast]) -> dict[int, list[float]]:
+    """Quartiles of the cdfs of the continuous forecasts, by forecast id"""
+    cdfs_by_id = {
+        forecast.id: cdf
+        for forecast in forecasts
+        if (cdf := forecast.get_cdf()) is not None
+    }
+    if not cdfs_by_id:
+        return {}
+    return dict(
+        zip(
+            cdfs_by_id.keys(),
+            percent_point_functions(list(cdfs_by_id.values()), [25, 50, 75]).tolist(),
+        )
+    )
+
+
+class MyForecastListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        forecasts = list(data.all() if isinstance(data, models.Manager) else data)
+        # Inverts the cdfs of all the forecasts at once
+        self.child.quartiles.update(get_forecasts_quartiles(forecasts))
+        return super().to_representation(forecasts)
 
 
 class MyForecastSerializer(serializers.ModelSerializer):
@@ -202,6 +243,12 @@ class MyForecastSerializer(serializers.ModelSerializer):
             "interval_upper_bounds",
             "slider_values",
         )
+        list_serializer_class = MyForecastListSerializer
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # cdf quartiles by forecast id
+        self.quartiles: dict[int, list[float]] = {}
 
     def get_start_time(self, forecast: Forecast):
         return forecast.start_time.timestamp()
@@ -210,19 +257,22 @@ class MyForecastSerializer(serializers.ModelSerializer):
         return forecast.end_time.timestamp() if forecast.end_time else None
 
     def get_forecast_values(self, forecast: Forecast) -> list[float] | None:
-        return forecast.get_prediction_values()
+        return serialize_forecast_values(forecast.get_prediction_values())
+
+    def get_quartile(self, forecast: Forecast, index: int) -> list[float] | None:
+        if forecast.id not in self.quartiles:
+            self.quartiles.update(get_forecasts_quartiles([forecast]))
+        if forecast.id in self.quartiles:
+            return [self.quartiles[forecast.id][index]]
 
     def get_interval_lower_bounds(self, forecast: Forecast) -> list[float] | None:
-        if forecast.continuous_cdf is not None:
-            return percent_point_function(forecast.continuous_cdf, [25])
+        return self.get_quartile(forecast, 0)
 
     def get_centers(self, forecast: Forecast) -> list[float] | None:
-        if forecast.continuous_cdf is not None:
-            return percent_point_function(forecast.continuous_cdf, [50])
+        return self.get_quartile(forecast, 1)
 
     def get_interval_upper_bounds(self, forecast: Forecast) -> list[float] | None:
-        if forecast.continuous_cdf is not None:
-            return percent_point_function(forecast.continuous_cdf, [75])
+        return self.get_quartile(forecast, 2)
 
 
 class AggregateForecastSerializer(serializers.ModelSerializer):
@@ -236,7 +286,20 @@ class AggregateForecastSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = AggregateForecast
-        fields = "__all__"
+        fields = (
+            "id",
+            "question",
+            "method",
+            "start_time",
+            "end_time",
+            "forecast_values",
+            "forecaster_count",
+            "interval_lower_bounds",
+            "centers",
+            "interval_upper_bounds",
+            "means",
+            "histogram",
+        )
 
     def get_start_time(self, aggregate_forecast: AggregateForecast):
         return aggregate_forecast.start_time.timestamp()
@@ -250,29 +313,29 @@ class AggregateForecastSerializer(serializers.ModelSerializer):
 
     def get_forecast_values(self, aggregate_forecast: AggregateForecast):
         if self.context.get("include_forecast_values", True):
-            return aggregate_forecast.forecast_values
+            return serialize_forecast_values(aggregate_forecast.get_prediction_values())
 
     def get_interval_lower_bounds(
         self, aggregate_forecast: AggregateForecast
     ) -> list[float] | None:
-        if len(aggregate_forecast.forecast_values) == 2:
+        if len(aggregate_forecast.get_prediction_values()) == 2:
             return aggregate_forecast.interval_lower_bounds[1:]
         return aggregate_forecast.interval_lower_bounds
 
     def get_centers(self, aggregate_forecast: AggregateForecast) -> list[float] | None:
-        if len(aggregate_forecast.forecast_values) == 2:
+        if len(aggregate_forecast.get_prediction_values()) == 2:
             return aggregate_forecast.centers[1:]
         return aggregate_forecast.centers
 
     def get_interval_upper_bounds(
         self, aggregate_forecast: AggregateForecast
     ) -> list[float] | None:
-        if len(aggregate_forecast.forecast_values) == 2:
+        if len(aggregate_forecast.get_prediction_values()) == 2:
             return aggregate_forecast.interval_upper_bounds[1:]
         return aggregate_forecast.interval_upper_bounds
 
     def get_means(self, aggregate_forecast: AggregateForecast) -> list[float] | None:
-        if len(aggregate_forecast.forecast_values) == 2:
+        if len(aggregate_forecast.get_prediction_values()) == 2:
             return aggregate_forecast.means[1:]
         return aggregate_forecast.means
 
@@ -304,6 +367,163 @@ class ForecastWriteSerializer(serializers.ModelSerializer):
         return Question.objects.get(pk=value)
 
 
+# Aggregations are refreshed by build_question_forecasts, other writers of
+# AggregateForecast call invalidate_question_aggregations
+AGGREGATIONS_CACHE_TIMEOUT = 3600 * 24 * 7
+AGGREGATIONS_CACHE_VERSION_KEY = "question_aggregations:version"
+
+
+def get_question_aggregations_cache_key(question_id: int, method: str) -> str:
+    return f"question_aggregations:v2:{question_id}:{method}"
+
+
+def get_question_aggregations_cache_version() -> int:
+    """
+    Cache version of the aggregations, bumped to drop all of them at once
+    """
+    return cache.get_or_set(AGGREGATIONS_CACHE_VERSION_KEY, 1, timeout=None)
+
+
+def invalidate_question_aggregations(question_ids: Iterable[int] | None = None):
+    """
+    Drops the cached aggregations of the given questions, or of all of them
+    """
+    version = get_question_aggregations_cache_version()
+    if question_ids is None:
+        cache.set(AGGREGATIONS_CACHE_VERSION_KEY, version + 1, timeout=None)
+        return
+    cache.delete_many(
+        [
+            get_question_aggregations_cache_key(question_id, method)
+            for question_id in question_ids
+            for method in AggregationMethod.values
+        ],
+        version=version,
+    )
+
+
+def serialize_aggregation_history(forecasts: list[AggregateForecast]) -> dict:
+    return {
+        "history": list(
+            AggregateForecastSerializer(
+                forecasts,
+                many=True,
+                context={"include_forecast_values": False},
+            ).data
+        ),
+        "latest": (
+            dict(
+                AggregateForecastSerializer(
+                    forecasts[-1],
+                    context={"include_forecast_values": True},
+                ).data
+            )
+            if forecasts
+            else None
+        ),
+    }
+
+
+def cache_question_aggregations(
+    question: Question,
+    methods: list[str] | None = None,
+    version: int | None = None,
+    overwrite: bool = True,
+) -> dict[str, dict]:
+    """
+    Serializes the stored aggregation history of the question
+    and caches it per aggregation method
+
+    Readers filling a cache miss pass the cache version they looked up and
+    overwrite=False, so a payload cached by a concurrent rebuild or after an
+    invalidation is never replaced by the one they serialized
+    """
+    methods = methods or AggregationMethod.values
+    if version is None:
+        version = get_question_aggregations_cache_version()
+    aggregate_forecasts = question.aggregate_forecasts.filter(
+        method__in=methods
+    ).order_by("start_time")
+    aggregate_forecasts_by_method = defaultdict(list)
+    for aggregate in aggregate_forecasts:
+        aggregate_forecasts_by_method[aggregate.method].append(aggregate)
+
+    aggregations = {
+        method: serialize_aggregation_history(aggregate_forecasts_by_method[method])
+        for method in methods
+    }
+    values = {
+        get_question_aggregations_cache_key(question.id, method): aggregation
+        for method, aggregation in aggregations.items()
+    }
+    if overwrite:
+        cache.set_many(values, timeout=AGGREGATIONS_CACHE_TIMEOUT, version=version)
+    else:
+        for key, aggregation in values.items():
+            cache.add(
+                key, aggregation, timeout=AGGREGATIONS_CACHE_TIMEOUT, version=version
+            )
+    return aggregations
+
+
+def get_questions_aggregations(
+    questions: Iterable[Question],
+) -> dict[int, dict[str, dict]]:
+    """
+    Returns the serialized aggregation history of each question per method,
+    with a single cache lookup. Only the methods missing from the cache
+    get serialized
+    """
+    questions = list(questions)
+    keys = {
+        (question.id, method): get_question_aggregations_cache_key(question.id, method)
+        for question in questions
+        for method in AggregationMethod.values
+    }
+    version = get_question_aggregations_cache_version()
+    cached = cache.get_many(list(keys.values()), version=version)
+    aggregations = defaultdict(dict)
+    for (question_id, method), key in keys.items():
+        if key in cached:
+            aggregations[question_id][method] = cached[key]
+
+    for question in questions:
+        missing = [
+            method
+            for method in AggregationMethod.values
+            if method not in aggregations[question.id]
+        ]
+        if missing:
+            aggregations[question.id].update(
+                cache_question_aggregations(
+                    question, missing, version=version, overwrite=False
+                )
+            )
+    return aggregations
+
+
+def prefetch_questions_aggregations(questions: Iterable[Question]):
+    """
+    Fetches the aggregations of the questions at once for get_question_aggregations
+    """
+    questions = list(questions)
+    aggregations = get_questions_aggregations(questions)
+    for question in questions:
+        question.prefetched_aggregations = aggregations[question.id]
+
+
+def get_question_aggregations(question: Question) -> dict[str, dict]:
+    """
+    Returns the serialized aggregation history of the question per method,
+    from prefetch_questions_aggregations when called
+    """
+    aggregations = getattr(question, "prefetched_aggregations", None)
+    if aggregations is None:
+        aggregations = get_questions_aggregations([question])[question.id]
+    # Callers add their own keys (e.g. scores), keep the cached payload intact
+    return {method: dict(aggregations[method]) for method in AggregationMethod.values}
+
+
 def serialize_question(
     question: Question,
     with_cp: bool = False,
@@ -318,36 +538,16 @@ def serialize_question(
     serialized_data["post_id"] = post.id
 
     if with_cp:
-        aggregate_forecasts = question.aggregate_forecasts.order_by("start_time")
-        aggregate_forecasts_by_method = defaultdict(list)
-        for aggregate in aggregate_forecasts:
-            aggregate_forecasts_by_method[aggregate.method].append(aggregate)
-        serialized_data["aggregations"] = {
-            "recency_weighted": {"history": [], "latest": None},
-            "unweighted": {"history": [], "latest": None},
-            "single_aggregation": {"history": [], "latest": None},
-        }
-        for method, forecasts in aggregate_forecasts_by_method.items():
-            scores = question.scores.filter(aggregation_method=method)
-            serialized_data["aggregations"][method]["history"] = (
-                AggregateForecastSerializer(
-                    forecasts,
-                    many=True,
-                    context={"include_forecast_values": False},
-                ).data
-            )
-            serialized_data["aggregations"][method]["latest"] = (
-                (
-                    AggregateForecastSerializer(
-                        forecasts[-1],
-                        context={"include_forecast_values": True},
-                    ).data
-                )
-                if forecasts
-                else None
-            )
+        serialized_data["aggregations"] = get_question_aggregations(question)
+        methods_with_history = [
+            method
+            for method, aggregation in serialized_data["aggregations"].items()
+            if aggregation["history"]
+        ]
+        if methods_with_history:
+            scores = question.scores.filter(aggregation_method__in=methods_with_history)
             for score in scores:
-                serialized_data["aggregations"][method][
+                serialized_data["aggregations"][score.aggregation_method][
                     score.score_type + "_score"
                 ] = score.score
 
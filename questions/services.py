@@ -1,6 +1,7 @@
 import logging
 from datetime import datetime
-from typing import cast
+from functools import partial
+from typing import Iterable, cast
 
 from django.db import transaction
 from django.utils import timezone
@@ -20,9 +21,12 @@ from questions.models import (
 )
 from questions.types import AggregationMethod
 from users.models import User
-from utils.the_math.community_prediction import get_cp_history
+from utils.the_math.community_prediction import (
+    get_cp_history,
+    get_cp_history_incremental,
+)
 from utils.the_math.single_aggregation import get_single_aggregation_history
-from utils.the_math.measures import percent_point_function
+from utils.the_math.measures import percent_point_functions
 
 logger = logging.getLogger(__name__)
 
@@ -56,17 +60,38 @@ def get_forecast_initial_dict(question: Question) -> dict:
 def build_question_forecasts(
     question: Question,
     aggregation_method: str = AggregationMethod.RECENCY_WEIGHTED,
+    incremental: bool = True,
 ) -> dict:
     """
     Builds the AggregateForecasts for a question
     Stores them in the database
+
+    If incremental, the already stored history is reused and only missing
+    entries are aggregated. Use incremental=False when forecasts were rewritten
+    in the past (e.g. data migrations).
     """
+    # Taken before reading the forecasts, so later commits aren't covered
+    computed_at = timezone.now()
+    previous_history = list(
+        question.aggregate_forecasts.filter(method=aggregation_method).order_by(
+            "start_time"
+        )
+    )
+
     if aggregation_method == AggregationMethod.SINGLE_AGGREGATION:
         aggregation_history = get_single_aggregation_history(
             question,
             minimize=True,
             include_stats=True,
         )
+    elif incremental and previous_history:
+        aggregation_history = get_cp_history_incremental(
+            question,
+            previous_history,
+            aggregation_method=aggregation_method,
+            minimize=True,
+            include_stats=True,
+        )
     else:
         aggregation_history = get_cp_history(
             question,
@@ -75,28 +100,48 @@ def build_question_forecasts(
             include_stats=True,
         )
 
-    # overwrite old history with new history, minimizing the amount deleted and created
-    previous_history = question.aggregate_forecasts.filter(method=aggregation_method)
+    fields = [
+        field.name
+        for field in AggregateForecast._meta.get_fields()
+        if not field.primary_key
+    ]
+    previous_by_id = {old.id: old for old in previous_history}
+    reused = [new for new in aggregation_history if new.id in previous_by_id]
+    # Reused entries only need their end_time and histogram refreshed
+    reused_unchanged = [new for new in reused if new is previous_by_id[new.id]]
+    recomputed = [new for new in reused if new is not previous_by_id[new.id]]
+
+    # overwrite the remaining old history with new entries,
+    # minimizing the amount deleted and created
+    reused_ids = {new.id for new in reused}
+    to_overwrite = [old for old in previous_history if old.id not in reused_ids]
+    new_entries = [new for new in aggregation_history if new.id not in previous_by_id]
     to_overwrite, to_delete = (
-        previous_history[: len(aggregation_history)],
-        previous_history[len(aggregation_history) :],
+        to_overwrite[: len(new_entries)],
+        to_overwrite[len(new_entries) :],
     )
     overwriters, to_create = (
-        aggregation_history[: len(to_overwrite)],
-        aggregation_history[len(to_overwrite) :],
+        new_entries[: len(to_overwrite)],
+        new_entries[len(to_overwrite) :],
     )
     for new, old in zip(overwriters, to_overwrite):
         new.id = old.id
-    fields = [
-        field.name
-        for field in AggregateForecast._meta.get_fields()
-        if not field.primary_key
-    ]
+    for new in recomputed + new_entries:
+        new.computed_at = computed_at
+        new.apply_values_storage()
     with transaction.atomic():
-        AggregateForecast.objects.bulk_update(overwriters, fields)
+        AggregateForecast.objects.bulk_update(
+            reused_unchanged, ["end_time", "histogram"]
+        )
+        AggregateForecast.objects.bulk_update(recomputed + overwriters, fields)
         AggregateForecast.objects.filter(id__in=[old.id for old in to_delete]).delete()
         AggregateForecast.objects.bulk_create(to_create)
 
+    from questions.serializers import cache_question_aggregations
+
+    # Refresh the payload spliced into the feed
+    cache_question_aggregations(question, [aggregation_method])
+
 
 def build_question_forecasts_for_user(
     question: Question, user_forecasts: list[Forecast]
@@ -120,14 +165,37 @@ def build_question_forecasts_for_user(
             forecasts_data["medians"].append(0)
         elif question.type == "binary":
             forecasts_data["medians"].append(forecast.probability_yes)
-        elif question.type in ["numeric", "date"]:
-            forecasts_data["medians"].append(
-                percent_point_function(forecast.continuous_cdf, 50)
-            )
+    if question.type in ["numeric", "date"] and user_forecasts:
+        forecasts_data["medians"] = percent_point_functions(
+            [forecast.get_cdf() for forecast in user_forecasts], [50]
+        )[:, 0].tolist()
 
     return forecasts_data
 
 
+def get_aggregate_forecasts_at_time(
+    question_ids: Iterable[int],
+    time: datetime,
+    aggregation_method: str = AggregationMethod.RECENCY_WEIGHTED,
+) -> dict[int, AggregateForecast]:
+    """
+    Returns the stored aggregation entry of each question that started last
+    before the given time
+
+    The stored history is minimized, so that entry may have ended before `time`
+    """
+    return {
+        entry.question_id: entry
+        for entry in AggregateForecast.objects.filter(
+            question_id__in=question_ids,
+            method=aggregation_method,
+            start_time__lte=time,
+        )
+        .order_by("question_id", "-start_time")
+        .distinct("question_id")
+    }
+
+
 def create_question(*, title: str = None, **kwargs) -> Question:
     obj = Question(title=title, **kwargs)
     obj.full_clean()
@@ -211,8 +279,15 @@ def resolve_question(question: Question, resolution, actual_resolve_time: dateti
     if not question.actual_close_time:
         question.actual_close_time = timezone.now()
     question.set_forecast_scoring_ends()
+    question.set_global_leaderboard_dates()
     question.save()
 
+    from scoring.utils import update_post_leaderboard_questions
+
+    post = question.get_post()
+    if post:
+        update_post_leaderboard_questions(post)
+
     # Check if the question is part of any/all conditionals
     for conditional in [
         *question.conditional_conditions.all(),
@@ -363,10 +438,10 @@ def create_forecast(
             user=user, post=post, cp_change_threshold=0.1, is_global=True
         )
 
-    # Run async tasks
-    from questions.tasks import run_build_question_forecasts
+    # Run async tasks once the forecast is visible to them
+    from questions.tasks import schedule_build_question_forecasts
 
-    run_build_question_forecasts.send(question.id)
+    transaction.on_commit(lambda: schedule_build_question_forecasts(question.id))
 
     return forecast
 
@@ -393,4 +468,4 @@ def create_forecast_bulk(*, user: User = None, forecasts: list[dict] = None):
 
     # Running forecast post triggers
     for post in posts:
-        run_on_post_forecast.send(post.id)
+        transaction.on_commit(partial(run_on_post_forecast.send, post.id))
@@ -1,4 +1,7 @@
+import logging
+
 import dramatiq
+from django.core.cache import cache
 from django.db.models import Q, OuterRef, Count
 from sql_util.aggregates import SubqueryAggregate
 
@@ -14,16 +17,119 @@ from scoring.models import Score
 from scoring.utils import score_question
 from users.models import User
 
+logger = logging.getLogger(__name__)
+
+# Rebuild requests of a question within this window are folded into one rebuild
+BUILD_FORECASTS_COALESCE_WINDOW_MS = 5_000
+# Rebuilds are killed past this limit (seconds), so the running marker of a
+# killed worker expires along with it
+BUILD_FORECASTS_TIME_LIMIT = 60 * 5
+# Deferred rebuilds back off exponentially from the coalesce window,
+# over more than the time limit
+BUILD_FORECASTS_MAX_DEFERRALS = 6
+# Upper bound of the deferrals and the rebuild; markers are released
+# as soon as it finishes
+BUILD_FORECASTS_LOCK_TIMEOUT = 2 * BUILD_FORECASTS_TIME_LIMIT
+BUILD_FORECASTS_METRICS = ("requested", "coalesced", "deferred", "executed")
+
+
+def get_build_forecasts_key(name: str, question_id: int | None = None) -> str:
+    return f"build_question_forecasts:v1:{name}:{question_id or ''}"
+
+
+def _incr_build_forecasts_metric(name: str):
+    key = get_build_forecasts_key(f"metrics:{name}")
+    cache.add(key, 0, timeout=None)
+    cache.incr(key)
+
+
+def get_build_forecasts_metrics() -> dict[str, int]:
+    """
+    Counters of CP rebuild requests:
+        requested: rebuilds asked for
+        coalesced: requests folded into an already queued rebuild
+        deferred: rebuilds postponed because another was in flight
+        executed: rebuilds that ran
+    """
+    keys = {
+        name: get_build_forecasts_key(f"metrics:{name}")
+        for name in BUILD_FORECASTS_METRICS
+    }
+    values = cache.get_many(list(keys.values()))
+    return {name: values.get(key, 0) for name, key in keys.items()}
+
 
 @dramatiq.actor
-def run_build_question_forecasts(question_id: int):
+def run_build_question_forecasts(question_id: int, incremental: bool = True):
     """
-    TODO: ensure tasks of this group are executed consequent and keep the FIFO order
-        and implement a cancellation of previous task with the same type
+    Rebuilds the CP of the question right away.
+    Use schedule_build_question_forecasts on forecast writes
     """
 
     question = Question.objects.get(id=question_id)
-    build_question_forecasts(question)
+    build_question_forecasts(question, incremental=incremental)
+
+
+def schedule_build_question_forecasts(question_id: int):
+    """
+    Requests a CP rebuild of the question.
+
+    Only one rebuild per question is queued at a time: requests made while one
+    is queued are coalesced into it. The queued rebuild starts after a short
+    window, so bursts of forecasts trigger a single rebuild.
+    """
+
+    _incr_build_forecasts_metric("requested")
+    if cache.add(
+        get_build_forecasts_key("scheduled", question_id),
+        1,
+        timeout=BUILD_FORECASTS_LOCK_TIMEOUT,
+    ):
+        run_coalesced_build_question_forecasts.send_with_options(
+            args=(question_id,), delay=BUILD_FORECASTS_COALESCE_WINDOW_MS
+        )
+    else:
+        _incr_build_forecasts_metric("coalesced")
+
+
+@dramatiq.actor(time_limit=BUILD_FORECASTS_TIME_LIMIT * 1000)
+def run_coalesced_build_question_forecasts(question_id: int, deferrals: int = 0):
+    """
+    Runs a rebuild queued by schedule_build_question_forecasts,
+    keeping at most one rebuild in flight per question
+    """
+
+    running_key = get_build_forecasts_key("running", question_id)
+    if not cache.add(running_key, 1, timeout=BUILD_FORECASTS_TIME_LIMIT):
+        if deferrals >= BUILD_FORECASTS_MAX_DEFERRALS:
+            # Next forecasts schedule a new rebuild
+            logger.warning(
+                "Dropped the CP rebuild of question %s deferred %s times",
+                question_id,
+                deferrals,
+            )
+            cache.delete(get_build_forecasts_key("scheduled", question_id))
+            return
+
+        # Retry after the running rebuild. The request stays scheduled meanwhile,
+        # so new forecasts keep being coalesced into it
+        _incr_build_forecasts_metric("deferred")
+        run_coalesced_build_question_forecasts.send_with_options(
+            args=(question_id, deferrals + 1),
+            delay=BUILD_FORECASTS_COALESCE_WINDOW_MS * 2**deferrals,
+        )
+        return
+
+    try:
+        # Forecasts arriving from now on are not covered by this rebuild,
+        # so they have to schedule the next one
+        cache.delete(get_build_forecasts_key("scheduled", question_id))
+        run_build_question_forecasts(question_id)
+        _incr_build_forecasts_metric("executed")
+    finally:
+        cache.delete(running_key)
+
+    logger.info("CP rebuild metrics: %s", get_build_forecasts_metrics())
 
 
 @dramatiq.actor
@@ -36,6 +142,7 @@ def resolve_question_and_send_notifications(question_id: int):
         question,
         question.resolution,
         score_types=[Score.ScoreTypes.PEER, Score.ScoreTypes.BASELINE],
+        update_leaderboards=True,
     )
     scores = (
         question.scores.filter(user__isnull=False)
@@ -77,5 +184,7 @@ def resolve_question_and_send_notifications(question_id: int):
             notification_params.baseline_score = score.score
 
     # Sending notifications
-    for user, params in user_notification_params.items():
-        NotificationPredictedQuestionResolved.send(user, params)
+    NotificationPredictedQuestionResolved.send_many(
+        user_notification_params.keys(),
+        {user.id: params for user, params in user_notification_params.items()},
+    )
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from scoring.models import UserWeight, LeaderboardEntry, Score
+from scoring.models import UserWeight, LeaderboardEntry, Score, ReputationLedgerEntry
 
 
 @admin.register(UserWeight)
@@ -18,3 +18,9 @@ class LeaderboardEntryAdmin(admin.ModelAdmin):
 class ScoreAdmin(admin.ModelAdmin):
     search_fields = ["user", "for_question"]
     autocomplete_fields = ["user", "question"]
+
+
+@admin.register(ReputationLedgerEntry)
+class ReputationLedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ["user", "time", "score", "coverage"]
+    autocomplete_fields = ["user"]
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from scoring.utils import rebuild_leaderboard_questions
+
+
+class Command(BaseCommand):
+    help = """
+    Rebuilds the question membership of every leaderboard, along with the
+    global leaderboard window stored on resolved questions.
+    Needed once after deploying the membership table, and whenever the
+    global leaderboard dates change.
+    """
+
+    def handle(self, *args, **options):
+        tm = time.time()
+        count = rebuild_leaderboard_questions()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Stored {count} leaderboard questions in {round(time.time() - tm)}s"
+            )
+        )
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from scoring.reputation import rebuild_reputation_ledger
+
+
+class Command(BaseCommand):
+    help = """
+    Rebuilds the reputation ledger from the stored PEER scores.
+    Needed once after deploying the ledger, and whenever questions
+    change their visibility.
+    """
+
+    def handle(self, *args, **options):
+        tm = time.time()
+        created = rebuild_reputation_ledger()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {created} ledger entries in {round(time.time() - tm)}s"
+            )
+        )
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from scoring.track_record import build_track_record
+
+
+class Command(BaseCommand):
+    help = """
+    Rebuilds the community track record served by the track record endpoint
+    from all the resolved questions.
+    """
+
+    def handle(self, *args, **options):
+        tm = time.time()
+        track_record = build_track_record()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt the track record of {track_record.questions_predicted} "
+                f"questions in {round(time.time() - tm)}s"
+            )
+        )
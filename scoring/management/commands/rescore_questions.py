@@ -0,0 +1,153 @@
+import logging
+import os
+import random
+import time
+from functools import partial
+from itertools import batched
+
+from django import db
+from django.core.management.base import BaseCommand
+
+from questions.models import Question
+from scoring.models import Score, TrackRecord, UserStats
+from scoring.reputation import rebuild_reputation_ledger
+from scoring.track_record import build_track_record
+from scoring.user_stats import refresh_users_stats
+from scoring.utils import score_question
+from utils.management import parallel_command_executor
+
+logger = logging.getLogger(__name__)
+
+
+def read_checkpoint(path: str | None) -> set[int]:
+    if not path or not os.path.exists(path):
+        return set()
+
+    with open(path) as f:
+        return {int(line) for line in f if line.strip()}
+
+
+def rebuild_scoring_stats(score_types: list[str]):
+    """
+    Rebuilds the stats maintained by score_question, which the workers skip
+    """
+    if Score.ScoreTypes.PEER in score_types:
+        created = rebuild_reputation_ledger()
+        print(f"Rebuilt the reputation ledger: {created} entries")
+    if Score.ScoreTypes.BASELINE in score_types:
+        # Users without stats yet get them computed on their first read
+        user_ids = list(UserStats.objects.values_list("user_id", flat=True))
+        for batch in batched(user_ids, 1000):
+            refresh_users_stats(batch)
+        print(f"Refreshed the stats of {len(user_ids)} users")
+        for aggregation_method in TrackRecord.objects.values_list(
+            "aggregation_method", flat=True
+        ):
+            build_track_record(aggregation_method)
+            print(f"Rebuilt the {aggregation_method} track record")
+
+
+def rescore_questions__worker(
+    question_ids, worker_idx, checkpoint: str | None = None, score_types=None
+):
+    tm = time.time()
+    checkpoint_file = open(checkpoint, "a") if checkpoint else None
+
+    for idx, question in enumerate(
+        Question.objects.filter(id__in=question_ids).iterator(chunk_size=100), 1
+    ):
+        try:
+            # Concurrent workers would race on the incrementally maintained stats
+            score_question(
+                question,
+                question.resolution,
+                score_types=score_types,
+                update_stats=False,
+            )
+        except Exception:
+            logger.exception(f"Error during scoring of question {question.id}")
+            continue
+
+        if checkpoint_file:
+            checkpoint_file.write(f"{question.id}\n")
+            checkpoint_file.flush()
+
+        if idx % 50 == 0 or idx == len(question_ids):
+            duration = time.time() - tm
+            print(
+                f"[W{worker_idx}] Scored {idx} of {len(question_ids)} questions"
+                f" in {round(duration)}s ({idx / max(duration, 1e-6):.1f} questions/s)"
+            )
+
+    if checkpoint_file:
+        checkpoint_file.close()
+
+
+class Command(BaseCommand):
+    help = """
+    Rescores all resolved questions in parallel
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--num_processes",
+            type=int,
+            default=1,
+            help="Number of processes to use for processing (default: 1)",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            type=str,
+            default=None,
+            help="File tracking the scored question ids. "
+            "Questions listed there are skipped, so an interrupted run can be resumed",
+        )
+        parser.add_argument(
+            "--score_types",
+            nargs="+",
+            default=[Score.ScoreTypes.PEER, Score.ScoreTypes.BASELINE],
+            choices=[Score.ScoreTypes.PEER, Score.ScoreTypes.BASELINE],
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = options["checkpoint"]
+        done_ids = read_checkpoint(checkpoint)
+
+        question_ids = [
+            question_id
+            for question_id in Question.objects.filter(
+                resolution__isnull=False,
+                forecast_scoring_ends__isnull=False,
+            )
+            .exclude(resolution__in=["ambiguous", "annulled"])
+            .values_list("id", flat=True)
+            if question_id not in done_ids
+        ]
+        # Spread the heavy questions between the workers
+        random.Random(0).shuffle(question_ids)
+
+        print(
+            f"Rescoring {len(question_ids)} questions"
+            f" ({len(done_ids)} already scored according to the checkpoint)"
+        )
+        tm = time.time()
+
+        # Forked workers must not share the parent's connection
+        db.connections.close_all()
+        parallel_command_executor(
+            question_ids,
+            partial(
+                rescore_questions__worker,
+                checkpoint=checkpoint,
+                score_types=options["score_types"],
+            ),
+            num_processes=options["num_processes"],
+        )
+
+        rebuild_scoring_stats(options["score_types"])
+
+        duration = time.time() - tm
+        print(
+            f"\nCompleted rescoring {len(question_ids)} questions in {round(duration)}s"
+            f" ({len(question_ids) / max(duration, 1e-6):.1f} questions/s)"
+        )
@@ -0,0 +1,99 @@
+# Generated by Django 5.0.14 on 2026-10-18 18:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def backfill_reputation_ledger(apps, schema_editor):
+    # Same as scoring.reputation.rebuild_reputation_ledger
+    Question = apps.get_model("questions", "Question")
+    Score = apps.get_model("scoring", "Score")
+    ReputationLedgerEntry = apps.get_model("scoring", "ReputationLedgerEntry")
+
+    public_questions = Question.objects.filter(
+        Q(post__default_project__default_permission__isnull=False)
+        | Q(group__post__default_project__default_permission__isnull=False)
+    )
+    scores = (
+        Score.objects.filter(
+            user__isnull=False,
+            score_type="peer",
+            question__in=public_questions,
+            edited_at__isnull=False,
+        )
+        .order_by("user_id", "edited_at")
+        .values_list("user_id", "edited_at", "score", "coverage")
+    )
+
+    entries = []
+    last = None
+    for user_id, edited_at, score, coverage in scores.iterator(chunk_size=10_000):
+        if last and last.user_id == user_id and last.time == edited_at:
+            last.score += score
+            last.coverage += coverage
+            continue
+        same_user = last and last.user_id == user_id
+        last = ReputationLedgerEntry(
+            user_id=user_id,
+            time=edited_at,
+            score=score + (last.score if same_user else 0),
+            coverage=coverage + (last.coverage if same_user else 0),
+        )
+        entries.append(last)
+        # Keep the last entry in memory as it may still accumulate scores
+        if len(entries) > 10_000:
+            ReputationLedgerEntry.objects.bulk_create(entries[:-1])
+            entries = entries[-1:]
+    ReputationLedgerEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "posts",
+            "0022_remove_postsubscription_postsubscription_unique_type_user_post_and_more",
+        ),
+        ("scoring", "0010_leaderboardentry_aggregation_method_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReputationLedgerEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("time", models.DateTimeField()),
+                ("score", models.FloatField(default=0)),
+                ("coverage", models.FloatField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reputation_ledger",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="reputationledgerentry",
+            constraint=models.UniqueConstraint(
+                fields=("user_id", "time"),
+                name="reputationledgerentry_unique_user_time",
+            ),
+        ),
+        migrations.RunPython(
+            backfill_reputation_ledger, reverse_code=migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,131 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:08
+
+from datetime import datetime, timedelta, timezone
+
+from django.db import migrations, models
+from django.db.models import Q
+
+# Frozen copy of scoring.models.global_leaderboard_dates as of this migration
+UTC = timezone.utc
+GLOBAL_LEADERBOARD_DATES = [
+    # one year intervals
+    (datetime(2016, 1, 1, tzinfo=UTC), datetime(2017, 1, 1, tzinfo=UTC)),
+    (datetime(2017, 1, 1, tzinfo=UTC), datetime(2018, 1, 1, tzinfo=UTC)),
+    (datetime(2018, 1, 1, tzinfo=UTC), datetime(2019, 1, 1, tzinfo=UTC)),
+    (datetime(2019, 1, 1, tzinfo=UTC), datetime(2020, 1, 1, tzinfo=UTC)),
+    (datetime(2020, 1, 1, tzinfo=UTC), datetime(2021, 1, 1, tzinfo=UTC)),
+    (datetime(2021, 1, 1, tzinfo=UTC), datetime(2022, 1, 1, tzinfo=UTC)),
+    (datetime(2022, 1, 1, tzinfo=UTC), datetime(2023, 1, 1, tzinfo=UTC)),
+    (datetime(2023, 1, 1, tzinfo=UTC), datetime(2024, 1, 1, tzinfo=UTC)),
+    (datetime(2024, 1, 1, tzinfo=UTC), datetime(2025, 1, 1, tzinfo=UTC)),
+    (datetime(2025, 1, 1, tzinfo=UTC), datetime(2026, 1, 1, tzinfo=UTC)),
+    # two year intervals
+    (datetime(2016, 1, 1, tzinfo=UTC), datetime(2018, 1, 1, tzinfo=UTC)),
+    (datetime(2018, 1, 1, tzinfo=UTC), datetime(2020, 1, 1, tzinfo=UTC)),
+    (datetime(2020, 1, 1, tzinfo=UTC), datetime(2022, 1, 1, tzinfo=UTC)),
+    (datetime(2022, 1, 1, tzinfo=UTC), datetime(2024, 1, 1, tzinfo=UTC)),
+    (datetime(2024, 1, 1, tzinfo=UTC), datetime(2026, 1, 1, tzinfo=UTC)),
+    # five year intervals
+    (datetime(2016, 1, 1, tzinfo=UTC), datetime(2021, 1, 1, tzinfo=UTC)),
+    (datetime(2021, 1, 1, tzinfo=UTC), datetime(2026, 1, 1, tzinfo=UTC)),
+    # ten year intervals
+    (datetime(2016, 1, 1, tzinfo=UTC), datetime(2026, 1, 1, tzinfo=UTC)),
+]
+
+
+def get_global_leaderboard_window(question):
+    # Frozen copy of Question.get_global_leaderboard_dates
+    shortest_window = None
+    for gl_start, gl_end in GLOBAL_LEADERBOARD_DATES[::-1]:
+        if question.open_time < gl_start or gl_end < question.open_time:
+            continue
+        if question.actual_close_time > gl_end + timedelta(days=3):
+            continue
+        if question.resolution_set_time > gl_end + timedelta(days=100):
+            continue
+        if shortest_window is None or (
+            gl_end - gl_start < shortest_window[1] - shortest_window[0]
+        ):
+            shortest_window = (gl_start, gl_end)
+    return shortest_window
+
+
+def backfill_leaderboard_questions(apps, schema_editor):
+    Question = apps.get_model("questions", "Question")
+    Leaderboard = apps.get_model("scoring", "Leaderboard")
+
+    to_update = []
+    for question in Question.objects.filter(
+        open_time__isnull=False,
+        actual_close_time__isnull=False,
+        resolution_set_time__isnull=False,
+    ).iterator(chunk_size=1000):
+        window = get_global_leaderboard_window(question)
+        if window:
+            (
+                question.global_leaderboard_start_time,
+                question.global_leaderboard_end_time,
+            ) = window
+            to_update.append(question)
+    Question.objects.bulk_update(
+        to_update,
+        ["global_leaderboard_start_time", "global_leaderboard_end_time"],
+        batch_size=1000,
+    )
+
+    # Frozen copy of Leaderboard.filter_questions
+    for leaderboard in Leaderboard.objects.all():
+        questions = Question.objects.all()
+        if leaderboard.project_id:
+            questions = questions.filter(
+                Q(post__projects=leaderboard.project_id)
+                | Q(group__post__projects=leaderboard.project_id)
+                | Q(post__default_project=leaderboard.project_id)
+                | Q(group__post__default_project=leaderboard.project_id)
+            )
+        if leaderboard.score_type == "comment_insight":
+            questions = questions.filter(
+                Q(post__published_at__lt=leaderboard.end_time)
+                | Q(group__post__published_at__lt=leaderboard.end_time)
+            )
+        elif leaderboard.score_type == "question_writing":
+            questions = questions.filter(
+                Q(post__published_at__lt=leaderboard.end_time)
+                | Q(group__post__published_at__lt=leaderboard.end_time),
+                Q(actual_resolve_time__gte=leaderboard.start_time)
+                | Q(actual_resolve_time__isnull=True),
+            )
+        elif leaderboard.start_time and leaderboard.end_time:
+            questions = questions.filter(
+                global_leaderboard_start_time=leaderboard.start_time,
+                global_leaderboard_end_time=leaderboard.end_time,
+            )
+        leaderboard.questions.set(questions.distinct())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "posts",
+            "0022_remove_postsubscription_postsubscription_unique_type_user_post_and_more",
+        ),
+        ("questions", "0018_question_global_leaderboard_end_time_and_more"),
+        ("scoring", "0011_reputationledgerentry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="leaderboard",
+            name="questions",
+            field=models.ManyToManyField(
+                blank=True,
+                editable=False,
+                related_name="leaderboards",
+                to="questions.question",
+            ),
+        ),
+        migrations.RunPython(
+            backfill_leaderboard_questions, reverse_code=migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:14
+
+import django.contrib.postgres.fields
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scoring", "0013_userstats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrackRecord",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, editable=False
+                    ),
+                ),
+                (
+                    "edited_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, editable=False, null=True
+                    ),
+                ),
+                ("questions_predicted", models.IntegerField(default=0)),
+                ("questions_predicted_scored", models.IntegerField(default=0)),
+                ("score_sum", models.FloatField(default=0)),
+                (
+                    "calibration_counts",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.IntegerField(), default=list, size=None
+                    ),
+                ),
+                (
+                    "calibration_weights",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.FloatField(), default=list, size=None
+                    ),
+                ),
+                (
+                    "calibration_resolved_weights",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.FloatField(), default=list, size=None
+                    ),
+                ),
+                (
+                    "score_histogram",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.IntegerField(), default=list, size=None
+                    ),
+                ),
+                (
+                    "aggregation_method",
+                    models.CharField(
+                        choices=[
+                            ("recency_weighted", "Recency Weighted"),
+                            ("unweighted", "Unweighted"),
+                            ("single_aggregation", "Single Aggregation"),
+                        ],
+                        max_length=200,
+                        unique=True,
+                    ),
+                ),
+                ("score_scatter_plot", models.JSONField(default=list)),
+                ("is_stale", models.BooleanField(default=False)),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+    ]
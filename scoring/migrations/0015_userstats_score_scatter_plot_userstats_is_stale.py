@@ -0,0 +1,30 @@
+# Generated by Django 5.0.14 on 2026-10-18 21:02
+
+from django.db import migrations, models
+
+
+def delete_user_stats(apps, schema_editor):
+    # Stored without their scatter plot, they're computed again on first read
+    UserStats = apps.get_model("scoring", "UserStats")
+    UserStats.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scoring", "0014_trackrecord"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userstats",
+            name="score_scatter_plot",
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name="userstats",
+            name="is_stale",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(delete_user_stats, reverse_code=migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from datetime import datetime, timezone
 
+from django.contrib.postgres.fields import ArrayField
 from django.db import models
 from django.db.models.query import QuerySet, Q
 
@@ -46,6 +47,92 @@ class Score(TimeStampedModel):
     score_type = models.CharField(max_length=200, choices=ScoreTypes.choices)
 
 
+class ReputationLedgerEntry(models.Model):
+    """
+    Running totals of the PEER scores of a user on public questions,
+    counting the scores with edited_at <= time.
+    Maintained by score_question, see scoring.reputation
+    """
+
+    # typing
+    objects: models.Manager["ReputationLedgerEntry"]
+    user_id: int
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="reputation_ledger"
+    )
+    time = models.DateTimeField()
+    score = models.FloatField(default=0)
+    coverage = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                name="reputationledgerentry_unique_user_time",
+                fields=["user_id", "time"],
+            )
+        ]
+
+
+class ForecastingStats(TimeStampedModel):
+    """
+    Calibration and scores computed over the forecasts on binary questions
+    resolved yes or no, see scoring.user_stats
+    """
+
+    questions_predicted = models.IntegerField(default=0)
+    questions_predicted_scored = models.IntegerField(default=0)
+    # Sum of the BASELINE scores of the scored questions
+    score_sum = models.FloatField(default=0)
+    # Forecast counts, weights and weights of the forecasts resolving yes,
+    # per calibration bin
+    calibration_counts = ArrayField(models.IntegerField(), default=list)
+    calibration_weights = ArrayField(models.FloatField(), default=list)
+    calibration_resolved_weights = ArrayField(models.FloatField(), default=list)
+    # BASELINE score counts per histogram bin
+    score_histogram = ArrayField(models.IntegerField(), default=list)
+
+    class Meta:
+        abstract = True
+
+
+class UserStats(ForecastingStats):
+    """
+    Forecasting stats shown on the profile of a user.
+    Maintained by score_question, see scoring.user_stats
+    """
+
+    # typing
+    objects: models.Manager["UserStats"]
+    user_id: int
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, related_name="forecasting_stats"
+    )
+    # [score, timestamp] of every BASELINE score of the user
+    score_scatter_plot = models.JSONField(default=list)
+    # Set when a rescoring invalidates the stats, until they get refreshed
+    is_stale = models.BooleanField(default=False)
+
+
+class TrackRecord(ForecastingStats):
+    """
+    Forecasting stats of an aggregation method over all questions.
+    Maintained by score_question, see scoring.track_record
+    """
+
+    # typing
+    objects: models.Manager["TrackRecord"]
+
+    aggregation_method = models.CharField(
+        max_length=200, choices=AggregationMethod.choices, unique=True
+    )
+    # [score, timestamp] of every BASELINE score of the aggregation method
+    score_scatter_plot = models.JSONField(default=list)
+    # Set when a rescoring invalidates the stats, until they get rebuilt
+    is_stale = models.BooleanField(default=False)
+
+
 class Leaderboard(TimeStampedModel):
     # typing
     id: int
@@ -97,45 +184,61 @@ class Leaderboard(TimeStampedModel):
     end_time = models.DateTimeField(null=True)
     finalize_time = models.DateTimeField(null=True)
 
-    def get_questions(self) -> list[Question]:
+    # Questions counting for the leaderboard, see update_questions
+    questions = models.ManyToManyField(
+        Question, related_name="leaderboards", blank=True, editable=False
+    )
+
+    def filter_questions(self, questions: QuerySet[Question]) -> QuerySet[Question]:
+        """Narrows down `questions` to the ones counting for this leaderboard"""
         if self.project:
-            questions = Question.objects.filter(
+            questions = questions.filter(
                 models.Q(post__projects=self.project)
                 | models.Q(group__post__projects=self.project)
                 | models.Q(post__default_project=self.project)
                 | models.Q(group__post__default_project=self.project)
-            ).distinct()
-        else:
-            questions = Question.objects.all()
+            )
 
         if self.score_type == self.ScoreTypes.COMMENT_INSIGHT:
             # post must be published
-            return list(
-                questions.filter(
-                    Q(post__published_at__lt=self.end_time)
-                    | Q(group__post__published_at__lt=self.end_time)
-                ).distinct()
+            questions = questions.filter(
+                Q(post__published_at__lt=self.end_time)
+                | Q(group__post__published_at__lt=self.end_time)
             )
         elif self.score_type == self.ScoreTypes.QUESTION_WRITING:
             # post must be published, and can't be resolved before the start_time
             # of the leaderboard
-            return list(
-                questions.filter(
-                    Q(post__published_at__lt=self.end_time)
-                    | Q(group__post__published_at__lt=self.end_time),
-                    Q(actual_resolve_time__gte=self.start_time)
-                    | Q(actual_resolve_time__isnull=True),
-                ).distinct()
+            questions = questions.filter(
+                Q(post__published_at__lt=self.end_time)
+                | Q(group__post__published_at__lt=self.end_time),
+                Q(actual_resolve_time__gte=self.start_time)
+                | Q(actual_resolve_time__isnull=True),
             )
-
-        if self.start_time and self.end_time:
+        elif self.start_time and self.end_time:
             # global leaderboard
-            window = (self.start_time, self.end_time)
-            questions = [
-                q for q in questions if q.get_global_leaderboard_dates() == window
-            ]
+            questions = questions.filter(
+                global_leaderboard_start_time=self.start_time,
+                global_leaderboard_end_time=self.end_time,
+            )
+
+        return questions.distinct()
+
+    def update_questions(self, questions: QuerySet[Question] | None = None):
+        """
+        Refreshes the stored membership of `questions`, or of all questions
+        when omitted
+        """
+        if questions is None:
+            self.questions.set(self.filter_questions(Question.objects.all()))
+            return
+
+        question_ids = set(questions.values_list("id", flat=True))
+        member_ids = set(self.filter_questions(questions).values_list("id", flat=True))
+        self.questions.remove(*(question_ids - member_ids))
+        self.questions.add(*member_ids)
 
-        return list(questions)
+    def get_questions(self) -> QuerySet[Question]:
+        return self.questions.all()
 
 
 class LeaderboardEntry(TimeStampedModel):
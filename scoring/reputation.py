@@ -1,14 +1,20 @@
+from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import datetime
 from collections import defaultdict
-from typing import Sequence
+from typing import Iterable, Iterator, Sequence
 
+from django.db import connection, transaction
+from django.db.models import Case, F, FloatField, QuerySet, Value, When
 from django.utils import timezone
 
 from questions.models import Question
-from scoring.models import Score
+from scoring.models import ReputationLedgerEntry, Score
 from users.models import User
 
+# Advisory lock namespace serializing the ledger updates of each user
+LEDGER_LOCK_NAMESPACE = 1001
+
 
 @dataclass
 class Reputation:
@@ -17,28 +23,38 @@ class Reputation:
     time: datetime
 
 
+def reputation_value_from_totals(score: float, coverage: float) -> float:
+    return max(score / (30 + coverage), 1e-6)
+
+
 def reputation_value(scores: Sequence[Score]) -> float:
-    return max(
-        sum([score.score for score in scores])
-        / (30 + sum([score.coverage for score in scores])),
-        1e-6,
+    return reputation_value_from_totals(
+        sum([score.score for score in scores]),
+        sum([score.coverage for score in scores]),
+    )
+
+
+def get_latest_ledger_entries(
+    user_ids: Iterable[int], time: datetime, strict: bool = False
+) -> dict[int, ReputationLedgerEntry]:
+    """
+    Returns the latest ledger entry of each user at or before the given time
+    (strictly before if `strict`). Users without peer scores by then are missing.
+    """
+    time_filter = {"time__lt": time} if strict else {"time__lte": time}
+    entries = (
+        ReputationLedgerEntry.objects.filter(user_id__in=user_ids, **time_filter)
+        .order_by("user_id", "-time")
+        .distinct("user_id")
     )
+    return {entry.user_id: entry for entry in entries}
 
 
 def get_reputation_at_time(user: User, time: datetime | None = None) -> Reputation:
     """
     Returns the reputation of a user at a given time.
     """
-    if time is None:
-        time = timezone.now()
-    peer_scores = Score.objects.filter(
-        user=user,
-        score_type=Score.ScoreTypes.PEER,
-        question__in=Question.objects.filter_public(),
-        edited_at__lte=time,
-    ).distinct()
-    value = reputation_value(peer_scores)
-    return Reputation(user, value, time)
+    return get_reputations_at_time([user], time)[0]
 
 
 def get_reputations_at_time(
@@ -49,18 +65,15 @@ def get_reputations_at_time(
     """
     if time is None:
         time = timezone.now()
-    peer_scores = Score.objects.filter(
-        user__in=users,
-        score_type=Score.ScoreTypes.PEER,
-        question__in=Question.objects.filter_public(),
-        edited_at__lte=time,
-    ).distinct()
-    user_scores: dict[User, list[Score]] = defaultdict(list)
-    for score in peer_scores:
-        user_scores[score.user].append(score)
+    entries = get_latest_ledger_entries([user.id for user in users], time)
     reputations = []
     for user in users:
-        value = reputation_value(peer_scores)
+        entry = entries.get(user.id)
+        value = (
+            reputation_value_from_totals(entry.score, entry.coverage)
+            if entry
+            else reputation_value_from_totals(0, 0)
+        )
         reputations.append(Reputation(user, value, time))
     return reputations
 
@@ -73,31 +86,197 @@ def get_reputations_during_interval(
     The reputation can change during the interval."""
     if end is None:
         end = timezone.now()
-    all_peer_scores = (
+    users_by_id = {user.id: user for user in users}
+    reputations: dict[User, list[Reputation]] = defaultdict(list)
+    for user, reputation in zip(users, get_reputations_at_time(users, start)):
+        reputations[user].append(reputation)
+    entries = ReputationLedgerEntry.objects.filter(
+        user_id__in=users_by_id, time__gt=start, time__lte=end
+    ).order_by("time")
+    for entry in entries:
+        user = users_by_id[entry.user_id]
+        value = reputation_value_from_totals(entry.score, entry.coverage)
+        reputations[user].append(Reputation(user, value, entry.time))
+    return reputations
+
+
+def _lock_ledger_users(user_ids: Iterable[int]):
+    """
+    Serializes the ledger updates of the given users until the end of the
+    current transaction. Locks are taken in order so concurrent updates
+    can't deadlock, and they don't block other writes to the users
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(%s, user_id) FROM "
+            "(SELECT unnest(%s::integer[]) AS user_id ORDER BY user_id) AS users",
+            [LEDGER_LOCK_NAMESPACE, sorted(user_ids)],
+        )
+
+
+def _apply_ledger_deltas(time: datetime, deltas: dict[int, tuple[float, float]]):
+    """
+    Adds (score, coverage) deltas to the totals of each user from `time` onwards.
+    The users must be locked with _lock_ledger_users
+    """
+    user_ids = list(deltas)
+    previous_entries = get_latest_ledger_entries(user_ids, time, strict=True)
+    existing_user_ids = set(
+        ReputationLedgerEntry.objects.filter(
+            user_id__in=user_ids, time=time
+        ).values_list("user_id", flat=True)
+    )
+
+    # Shift the totals at and after `time`
+    ReputationLedgerEntry.objects.filter(user_id__in=user_ids, time__gte=time).update(
+        score=F("score")
+        + Case(
+            *[When(user_id=u, then=Value(d[0])) for u, d in deltas.items()],
+            output_field=FloatField(),
+        ),
+        coverage=F("coverage")
+        + Case(
+            *[When(user_id=u, then=Value(d[1])) for u, d in deltas.items()],
+            output_field=FloatField(),
+        ),
+    )
+
+    # Then open entries at `time` for the users that don't have one yet
+    new_entries = []
+    for user_id, (score, coverage) in deltas.items():
+        if user_id in existing_user_ids:
+            continue
+        previous = previous_entries.get(user_id)
+        new_entries.append(
+            ReputationLedgerEntry(
+                user_id=user_id,
+                time=time,
+                score=score + (previous.score if previous else 0),
+                coverage=coverage + (previous.coverage if previous else 0),
+            )
+        )
+    ReputationLedgerEntry.objects.bulk_create(new_entries)
+
+
+def update_reputation_ledger(
+    old_scores: Iterable[Score], new_scores: Iterable[Score]
+) -> None:
+    """
+    Replaces the contribution of `old_scores` to the reputation ledger
+    with the one of `new_scores`.
+    Both should be user PEER scores of public questions.
+    """
+    deltas: dict[datetime, dict[int, list[float]]] = defaultdict(
+        lambda: defaultdict(lambda: [0.0, 0.0])
+    )
+    for sign, scores in ((-1, old_scores), (1, new_scores)):
+        for score in scores:
+            if not score.user_id or not score.edited_at:
+                continue
+            delta = deltas[score.edited_at][score.user_id]
+            delta[0] += sign * score.score
+            delta[1] += sign * score.coverage
+
+    # Unchanged scores cancel out exactly
+    changes = {
+        time: {
+            user_id: (score, coverage)
+            for user_id, (score, coverage) in user_deltas.items()
+            if score or coverage
+        }
+        for time, user_deltas in deltas.items()
+    }
+
+    with transaction.atomic():
+        # Entries are read then shifted, so concurrent updates of a user
+        # must not interleave
+        _lock_ledger_users(
+            {user_id for changed in changes.values() for user_id in changed}
+        )
+        for time in sorted(changes):
+            if changes[time]:
+                _apply_ledger_deltas(time, changes[time])
+
+
+def get_public_question_ids(questions: QuerySet[Question]) -> set[int]:
+    return set(questions.filter_public().values_list("id", flat=True))
+
+
+def update_reputation_ledger_visibility(were_public: set[int], are_public: set[int]):
+    """
+    Adds to the reputation ledger the PEER scores of the questions turning
+    public, and removes the ones of the questions that aren't public anymore
+    (moved to a private project, left without post, or about to be deleted).
+    Both are question ids, see get_public_question_ids
+    """
+    removed_ids = were_public - are_public
+    added_ids = are_public - were_public
+    if not removed_ids and not added_ids:
+        return
+
+    scores = list(
         Score.objects.filter(
-            user__in=users,
+            question_id__in=removed_ids | added_ids,
+            user__isnull=False,
             score_type=Score.ScoreTypes.PEER,
-            question__in=Question.objects.filter_public(),
-            edited_at__lte=end,
         )
-        .prefetch_related("user", "question")
-        .distinct()
     )
-    old_peer_scores = list(
-        all_peer_scores.filter(edited_at__lte=start).order_by("edited_at")
+    update_reputation_ledger(
+        [score for score in scores if score.question_id in removed_ids],
+        [score for score in scores if score.question_id in added_ids],
     )
-    new_peer_scores = list(
-        all_peer_scores.filter(edited_at__gt=start).order_by("edited_at")
+
+
+@contextmanager
+def follow_reputation_ledger_visibility(questions: QuerySet[Question]) -> Iterator:
+    """
+    Keeps the reputation ledger in sync with the visibility changes of
+    `questions` made inside the block, which must keep their scores
+    """
+    were_public = get_public_question_ids(questions)
+    yield
+    update_reputation_ledger_visibility(were_public, get_public_question_ids(questions))
+
+
+def rebuild_reputation_ledger(batch_size: int = 10_000) -> int:
+    """
+    Rebuilds the whole ledger from the stored PEER scores.
+    Returns the number of entries created.
+    """
+    scores = (
+        Score.objects.filter(
+            user__isnull=False,
+            score_type=Score.ScoreTypes.PEER,
+            question__in=Question.objects.filter_public(),
+            edited_at__isnull=False,
+        )
+        .order_by("user_id", "edited_at")
+        .values_list("user_id", "edited_at", "score", "coverage")
     )
-    scores_by_user: dict[User, dict[Question, Score]] = defaultdict(dict)
-    for score in old_peer_scores:
-        scores_by_user[score.user][score.question] = score
-    reputations: dict[User, list[Reputation]] = defaultdict(list)
-    for user in users:
-        value = reputation_value(scores_by_user[user].values())
-        reputations[user].append(Reputation(user, value, start))
-    for score in new_peer_scores:
-        scores_by_user[score.user][score.question] = score
-        value = reputation_value(scores_by_user[user].values())
-        reputations[user].append(Reputation(score.user, value, score.edited_at))
-    return reputations
+
+    created = 0
+    entries: list[ReputationLedgerEntry] = []
+    with transaction.atomic():
+        ReputationLedgerEntry.objects.all().delete()
+        last: ReputationLedgerEntry | None = None
+        for user_id, edited_at, score, coverage in scores.iterator():
+            if last and last.user_id == user_id and last.time == edited_at:
+                last.score += score
+                last.coverage += coverage
+                continue
+            same_user = last and last.user_id == user_id
+            last = ReputationLedgerEntry(
+                user_id=user_id,
+                time=edited_at,
+                score=score + (last.score if same_user else 0),
+                coverage=coverage + (last.coverage if same_user else 0),
+            )
+            entries.append(last)
+            # Keep the last entry in memory as it may still accumulate scores
+            if len(entries) > batch_size:
+                ReputationLedgerEntry.objects.bulk_create(entries[:-1])
+                created += len(entries) - 1
+                entries = entries[-1:]
+        ReputationLedgerEntry.objects.bulk_create(entries)
+        created += len(entries)
+    return created
@@ -1,13 +1,12 @@
 from dataclasses import dataclass
-from datetime import datetime
 
-from scipy.stats.mstats import gmean
 import numpy as np
 
-from utils.the_math.community_prediction import get_cp_history
-from questions.models import AggregateForecast, Forecast, Question
+from utils.the_math.community_prediction import get_cp_history, ForecastsSweep
+from questions.models import AggregateForecast, Forecast, Question, CDF_SIZE
 from questions.types import AggregationMethod
 from scoring.models import Score
+from users.models import User
 
 
 @dataclass
@@ -17,29 +16,72 @@ class AggregationEntry:
     timestamp: float
 
 
+def get_pmfs(forecasts: list[Forecast | AggregateForecast]) -> np.ndarray:
+    """stacked pmfs of the forecasts, one row per forecast"""
+    values = np.array(
+        [forecast.get_prediction_values() for forecast in forecasts], dtype=float
+    )
+    if values.shape[1] == CDF_SIZE:
+        return np.diff(values, axis=1, prepend=0.0, append=1.0)
+    return values
+
+
+def get_forecast_times(
+    forecasts: list[Forecast | AggregateForecast],
+) -> tuple[np.ndarray, np.ndarray]:
+    """start and end timestamps of the forecasts, end is inf if not ended"""
+    start_times = np.array([forecast.start_time.timestamp() for forecast in forecasts])
+    end_times = np.array(
+        [
+            forecast.end_time.timestamp() if forecast.end_time else np.inf
+            for forecast in forecasts
+        ]
+    )
+    return start_times, end_times
+
+
 def get_geometric_means(
     forecasts: list[Forecast | AggregateForecast],
 ) -> list[AggregationEntry]:
+    """
+    Sweeps over the forecasts' start/end events keeping a running sum of the
+    active log-pmfs, so each geometric mean costs O(len(pmf)) instead of a
+    rescan of all the forecasts.
+    """
+    if not forecasts:
+        return []
+    pmfs = get_pmfs(forecasts)
+    # log(0) and log(<0) can't be added and removed from a running sum,
+    # so they are counted separately (they make the geometric mean 0 or nan)
+    zeros = (pmfs == 0).astype(int)
+    negatives = (pmfs < 0).astype(int)
+    log_pmfs = np.log(np.where(pmfs > 0, pmfs, 1.0))
+    sweep = ForecastsSweep.from_forecasts(forecasts, values=log_pmfs)
+
     geometric_means = []
-    timesteps: set[datetime] = set()
-    for forecast in forecasts:
-        timesteps.add(forecast.start_time.timestamp())
-        if forecast.end_time:
-            timesteps.add(forecast.end_time.timestamp())
-    for timestep in sorted(timesteps):
-        prediction_values = [
-            f.get_pmf()
-            for f in forecasts
-            if f.start_time.timestamp() <= timestep
-            and (f.end_time is None or f.end_time.timestamp() > timestep)
-        ]
-        if not prediction_values:
-            continue  # TODO: doesn't account for going from 1 active forecast to 0
-        geometric_mean = gmean(prediction_values, axis=0)
-        predictors = len(prediction_values)
+    predictors = 0
+    log_sum = np.zeros(pmfs.shape[1])
+    zero_count = np.zeros(pmfs.shape[1], dtype=int)
+    negative_count = np.zeros(pmfs.shape[1], dtype=int)
+    for i, started, ended in sweep.iter_events():
+        predictors += len(started) - len(ended)
+        if not predictors:
+            # TODO: doesn't account for going from 1 active forecast to 0
+            log_sum[:] = 0
+            zero_count[:] = 0
+            negative_count[:] = 0
+            continue
+        log_sum += log_pmfs[started].sum(axis=0) - log_pmfs[ended].sum(axis=0)
+        zero_count += zeros[started].sum(axis=0) - zeros[ended].sum(axis=0)
+        negative_count += negatives[started].sum(axis=0) - negatives[ended].sum(axis=0)
+        geometric_mean = np.exp(log_sum / predictors)
+        geometric_mean[zero_count > 0] = 0.0
+        geometric_mean[negative_count > 0] = np.nan
         geometric_means.append(
             AggregationEntry(
-                geometric_mean, predictors if predictors > 1 else 0, timestep
+                geometric_mean,
+                predictors if predictors > 1 else 0,
+                sweep.timesteps[i].timestamp(),
             )
         )
     return geometric_means
@@ -48,25 +90,22 @@ def get_geometric_means(
 def get_medians(
     forecasts: list[Forecast | AggregateForecast],
 ) -> list[AggregationEntry]:
+    if not forecasts:
+        return []
+    pmfs = get_pmfs(forecasts)
+    sweep = ForecastsSweep.from_forecasts(forecasts, values=pmfs)
+
     medians = []
-    timesteps: set[datetime] = set()
-    for forecast in forecasts:
-        timesteps.add(forecast.start_time.timestamp())
-        if forecast.end_time:
-            timesteps.add(forecast.end_time.timestamp())
-    for timestep in sorted(timesteps):
-        prediction_values = [
-            f.get_pmf()
-            for f in forecasts
-            if f.start_time.timestamp() <= timestep
-            and (f.end_time is None or f.end_time.timestamp() > timestep)
-        ]
-        if not prediction_values:
-            continue  # TODO: doesn't account for going from 1 active forecast to 0
-        median = np.median(prediction_values, axis=0)
-        predictors = len(prediction_values)
+    for i, rows in sweep.iter_active_rows():
+        # TODO: doesn't account for going from 1 active forecast to 0
+        median = np.median(pmfs[rows], axis=0)
+        predictors = len(rows)
         medians.append(
-            AggregationEntry(median, predictors if predictors > 1 else 0, timestep)
+            AggregationEntry(
+                median,
+                predictors if predictors > 1 else 0,
+                sweep.timesteps[i].timestamp(),
+            )
         )
     return medians
 
@@ -77,6 +116,25 @@ class ForecastScore:
     coverage: float = 0
 
 
+def baseline_scores(
+    pmfs: np.ndarray,
+    resolution_bucket: int,
+    question_type: str,
+    open_bounds_count: int,
+) -> np.ndarray:
+    """baseline score of each row of pmfs"""
+    probabilities = pmfs[:, resolution_bucket]
+    pmf_size = pmfs.shape[1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if question_type in ["binary", "multiple_choice"]:
+            return 100 * np.log(probabilities * pmf_size) / np.log(pmf_size)
+        if resolution_bucket in [0, pmf_size - 1]:
+            baseline = 0.05
+        else:
+            baseline = (1 - 0.05 * open_bounds_count) / (pmf_size - 2)
+        return 100 * np.log(probabilities / baseline) / 2
+
+
 def evaluate_forecasts_baseline_accuracy(
     forecasts: list[Forecast | AggregateForecast],
     resolution_bucket: int,
@@ -86,36 +144,24 @@ def evaluate_forecasts_baseline_accuracy(
     question_type: str,
     open_bounds_count: int,
 ) -> list[ForecastScore]:
+    if not forecasts:
+        return []
     total_duration = forecast_horizon_end - forecast_horizon_start
-    forecast_scores: list[tuple[float, float]] = []
-    for forecast in forecasts:
-        forecast_start = max(forecast.start_time.timestamp(), forecast_horizon_start)
-        forecast_end = (
-            actual_close_time
-            if forecast.end_time is None
-            else min(forecast.end_time.timestamp(), actual_close_time)
-        )
-        forecast_duration = forecast_end - forecast_start
-        if forecast_duration <= 0:
-            forecast_scores.append(ForecastScore(0))
-            continue
-        forecast_coverage = forecast_duration / total_duration
-        pmf = forecast.get_pmf()
-        if question_type in ["binary", "multiple_choice"]:
-            forecast_score = (
-                100 * np.log(pmf[resolution_bucket] * len(pmf)) / np.log(len(pmf))
-            )
-        else:
-            if resolution_bucket in [0, len(pmf) - 1]:
-                baseline = 0.05
-            else:
-                baseline = (1 - 0.05 * open_bounds_count) / (len(pmf) - 2)
-            forecast_score = 100 * np.log(pmf[resolution_bucket] / baseline) / 2
-        forecast_scores.append(
-            ForecastScore(forecast_score * forecast_coverage, forecast_coverage)
-        )
+    start_times, end_times = get_forecast_times(forecasts)
+    forecast_durations = np.minimum(end_times, actual_close_time) - np.maximum(
+        start_times, forecast_horizon_start
+    )
+    is_scored = forecast_durations > 0
+    forecast_coverages = np.where(is_scored, forecast_durations / total_duration, 0)
+    scores = baseline_scores(
+        get_pmfs(forecasts), resolution_bucket, question_type, open_bounds_count
+    )
+    forecast_scores = np.where(is_scored, scores * forecast_coverages, 0)
 
-    return forecast_scores
+    return [
+        ForecastScore(float(score), float(coverage))
+        for score, coverage in zip(forecast_scores, forecast_coverages)
+    ]
 
 
 def evaluate_forecasts_baseline_spot_forecast(
@@ -125,28 +171,16 @@ def evaluate_forecasts_baseline_spot_forecast(
     question_type: str,
     open_bounds_count: int,
 ) -> list[ForecastScore]:
-    forecast_scores: list[float] = []
-    for forecast in forecasts:
-        start = forecast.start_time.timestamp()
-        end = (
-            float("inf") if forecast.end_time is None else forecast.end_time.timestamp()
-        )
-        if start <= spot_forecast_timestamp < end:
-            pmf = forecast.get_pmf()
-            if question_type in ["binary", "multiple_choice"]:
-                forecast_score = (
-                    100 * np.log(pmf[resolution_bucket] * len(pmf)) / np.log(len(pmf))
-                )
-            else:
-                if resolution_bucket in [0, len(pmf) - 1]:
-                    baseline = 0.05
-                else:
-                    baseline = (1 - 0.05 * open_bounds_count) / (len(pmf) - 2)
-                forecast_score = 100 * np.log(pmf[resolution_bucket] / baseline) / 2
-            forecast_scores.append(ForecastScore(forecast_score))
-        else:
-            forecast_scores.append(ForecastScore(0))
-    return forecast_scores
+    if not forecasts:
+        return []
+    start_times, end_times = get_forecast_times(forecasts)
+    is_active = (start_times <= spot_forecast_timestamp) & (
+        spot_forecast_timestamp < end_times
+    )
+    scores = baseline_scores(
+        get_pmfs(forecasts), resolution_bucket, question_type, open_bounds_count
+    )
+    return [ForecastScore(float(score)) for score in np.where(is_active, scores, 0)]
 
 
 def evaluate_forecasts_peer_accuracy(
@@ -158,54 +192,62 @@ def evaluate_forecasts_peer_accuracy(
     forecast_horizon_end: float,
     question_type: str,
 ) -> list[ForecastScore]:
+    if not forecasts:
+        return []
     base_forecasts = base_forecasts or forecasts
     geometric_mean_forecasts = get_geometric_means(base_forecasts)
-    for gm in geometric_mean_forecasts:
-        gm.timestamp = max(gm.timestamp, forecast_horizon_start)
     total_duration = forecast_horizon_end - forecast_horizon_start
-    forecast_scores: list[float] = []
-    for forecast in forecasts:
-        forecast_start = max(forecast.start_time.timestamp(), forecast_horizon_start)
-        forecast_end = (
-            actual_close_time
-            if forecast.end_time is None
-            else min(forecast.end_time.timestamp(), actual_close_time)
+
+    # geometric mean segments: gm i is scored from its timestamp to the next one
+    # (or to actual_close_time)
+    gm_times = np.maximum(
+        np.array([gm.timestamp for gm in geometric_mean_forecasts]),
+        forecast_horizon_start,
+    )
+    gm_times = gm_times[gm_times < actual_close_time]
+    gm_durations = np.diff(gm_times, append=actual_close_time) / total_duration
+    gm_probabilities = np.array(
+        [gm.pmf[resolution_bucket] for gm in geometric_mean_forecasts[: len(gm_times)]]
+    )
+    gm_forecasters = np.array(
+        [gm.num_forecasters for gm in geometric_mean_forecasts[: len(gm_times)]]
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gm_factors = 100 * gm_forecasters / (gm_forecasters - 1)
+    if question_type in ["numeric", "date"]:
+        gm_factors /= 2
+
+    start_times, end_times = get_forecast_times(forecasts)
+    forecast_starts = np.maximum(start_times, forecast_horizon_start)
+    forecast_ends = np.minimum(end_times, actual_close_time)
+    probabilities = get_pmfs(forecasts)[:, resolution_bucket]
+
+    forecast_scores = np.zeros(len(forecasts))
+    forecast_coverages = np.zeros(len(forecasts))
+    # the (forecasts x gm segments) overlap matrix is built in chunks of rows
+    # to bound memory on questions with many forecasts
+    chunk_size = max(1, 2**22 // max(len(gm_times), 1))
+    for chunk_start in range(0, len(forecasts), chunk_size):
+        chunk = slice(chunk_start, chunk_start + chunk_size)
+        overlaps = (forecast_starts[chunk, None] <= gm_times) & (
+            gm_times < forecast_ends[chunk, None]
         )
-        if (forecast_end - forecast_start) <= 0:
-            forecast_scores.append(ForecastScore(0))
-            continue
+        with np.errstate(divide="ignore", invalid="ignore"):
+            interval_scores = gm_factors * np.log(
+                probabilities[chunk, None] / gm_probabilities
+            )
+        forecast_scores[chunk] = np.where(
+            overlaps, interval_scores * gm_durations, 0
+        ).sum(axis=1)
+        forecast_coverages[chunk] = np.where(overlaps, gm_durations, 0).sum(axis=1)
+    is_scored = forecast_ends - forecast_starts > 0
+    forecast_scores[~is_scored] = 0
+    forecast_coverages[~is_scored] = 0
 
-        pmf = forecast.get_pmf()
-        interval_scores: float | None = []
-        for gm in geometric_mean_forecasts:
-            if forecast_start <= gm.timestamp < forecast_end:
-                score = (
-                    100
-                    * (gm.num_forecasters / (gm.num_forecasters - 1))
-                    * np.log(pmf[resolution_bucket] / gm.pmf[resolution_bucket])
-                )
-                if question_type in ["numeric", "date"]:
-                    score /= 2
-                interval_scores.append(score)
-            else:
-                interval_scores.append(None)
-
-        forecast_score = 0
-        forecast_coverage = 0
-        times = [
-            gm.timestamp
-            for gm in geometric_mean_forecasts
-            if gm.timestamp < actual_close_time
-        ] + [actual_close_time]
-        for i in range(len(times) - 1):
-            if interval_scores[i] is None:
-                continue
-            interval_duration = times[i + 1] - times[i]
-            forecast_score += interval_scores[i] * interval_duration / total_duration
-            forecast_coverage += interval_duration / total_duration
-        forecast_scores.append(ForecastScore(forecast_score, forecast_coverage))
-
-    return forecast_scores
+    return [
+        ForecastScore(float(score), float(coverage))
+        for score, coverage in zip(forecast_scores, forecast_coverages)
+    ]
 
 
 def evaluate_forecasts_peer_spot_forecast(
@@ -215,35 +257,35 @@ def evaluate_forecasts_peer_spot_forecast(
     spot_forecast_timestamp: float,
     question_type: str,
 ) -> list[ForecastScore]:
+    if not forecasts:
+        return []
     base_forecasts = base_forecasts or forecasts
     geometric_mean_forecasts = get_geometric_means(base_forecasts)
-    g = None
-    for gm in geometric_mean_forecasts[::-1]:
-        if gm.timestamp < spot_forecast_timestamp:
-            g = gm.pmf
-            break
-    if g is None:
+    # the last geometric mean starting before the spot forecast time
+    gm_index = (
+        np.searchsorted(
+            [gm.timestamp for gm in geometric_mean_forecasts], spot_forecast_timestamp
+        )
+        - 1
+    )
+    if gm_index < 0:
         return [ForecastScore(0)] * len(forecasts)
+    gm = geometric_mean_forecasts[gm_index]
 
-    forecast_scores: list[float] = []
-    for forecast in forecasts:
-        start = forecast.start_time.timestamp()
-        end = (
-            float("inf") if forecast.end_time is None else forecast.end_time.timestamp()
+    start_times, end_times = get_forecast_times(forecasts)
+    is_active = (start_times <= spot_forecast_timestamp) & (
+        spot_forecast_timestamp < end_times
+    )
+    probabilities = get_pmfs(forecasts)[:, resolution_bucket]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = (
+            100
+            * (gm.num_forecasters / (gm.num_forecasters - 1))
+            * np.log(probabilities / gm.pmf[resolution_bucket])
         )
-        if start <= spot_forecast_timestamp < end:
-            pmf = forecast.get_pmf()
-            forecast_score = (
-                100
-                * (gm.num_forecasters / (gm.num_forecasters - 1))
-                * np.log(pmf[resolution_bucket] / gm.pmf[resolution_bucket])
-            )
-            if question_type in ["numeric", "date"]:
-                forecast_score /= 2
-            forecast_scores.append(ForecastScore(forecast_score))
-        else:
-            forecast_scores.append(ForecastScore(0))
-    return forecast_scores
+    if question_type in ["numeric", "date"]:
+        scores /= 2
+    return [ForecastScore(float(score)) for score in np.where(is_active, scores, 0)]
 
 
 def evaluate_forecasts_legacy_relative(
@@ -268,7 +310,7 @@ def evaluate_question(
     actual_close_time = question.forecast_scoring_ends.timestamp()
     forecast_horizon_end = question.actual_close_time.timestamp()
 
-    user_forecasts = question.user_forecasts.all()
+    user_forecasts = list(question.user_forecasts.select_related("author"))
     community_forecasts = get_cp_history(
         question,
         minimize=False,
@@ -375,20 +417,18 @@ def evaluate_question(
             raise NotImplementedError(f"Score type {other} not implemented")
 
     scores: list[Score] = []
-    users = {forecast.author for forecast in user_forecasts}
-    for user in users:
-        user_score = 0
-        user_coverage = 0
-        for forecast, score in zip(user_forecasts, user_scores):
-            if forecast.author == user:
-                user_score += score.score
-                user_coverage += score.coverage
-        if user_coverage > 0:
+    user_totals: dict[User, ForecastScore] = {}
+    for forecast, score in zip(user_forecasts, user_scores):
+        user_total = user_totals.setdefault(forecast.author, ForecastScore(0))
+        user_total.score += score.score
+        user_total.coverage += score.coverage
+    for user, user_total in user_totals.items():
+        if user_total.coverage > 0:
             scores.append(
                 Score(
                     user=user,
-                    score=user_score,
-                    coverage=user_coverage,
+                    score=user_total.score,
+                    coverage=user_total.coverage,
                     score_type=score_type,
                 )
             )
@@ -0,0 +1,17 @@
+import dramatiq
+
+from questions.types import AggregationMethod
+from scoring.track_record import build_track_record
+from scoring.user_stats import refresh_users_stats
+
+
+@dramatiq.actor
+def run_build_track_record(
+    aggregation_method: str = AggregationMethod.RECENCY_WEIGHTED,
+):
+    build_track_record(aggregation_method)
+
+
+@dramatiq.actor
+def run_refresh_users_stats(user_ids: list[int]):
+    refresh_users_stats(user_ids)
@@ -0,0 +1,247 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, QuerySet
+from django.utils import timezone
+
+from questions.models import AggregateForecast, Question
+from questions.types import AggregationMethod
+from scoring.models import Score, TrackRecord
+from scoring.user_stats import (
+    RESOLUTIONS,
+    add_forecasts_to_stats,
+    add_scores_to_stats,
+    iter_rows_chunks,
+    serialize_user_stats,
+)
+
+
+def _get_aggregate_rows(aggregate_forecasts) -> QuerySet:
+    return aggregate_forecasts.values_list(
+        "method",
+        "question_id",
+        # probability of yes of binary questions
+        "forecast_values__1",
+        "start_time",
+        "end_time",
+        "question__open_time",
+        "question__forecast_scoring_ends",
+        "question__actual_close_time",
+        "question__resolution",
+    )
+
+
+TRACK_RECORD_FIELDS = [
+    "questions_predicted",
+    "questions_predicted_scored",
+    "score_sum",
+    "calibration_counts",
+    "calibration_weights",
+    "calibration_resolved_weights",
+    "score_histogram",
+    "score_scatter_plot",
+    "is_stale",
+    "edited_at",
+]
+
+
+def _add_question_to_track_record(
+    track_record: TrackRecord, question: Question, score: float, created_at
+):
+    """
+    Adds a newly scored question to the track record.
+    Only binary questions resolved yes or no count for the calibration
+    """
+    if (
+        question.type == Question.QuestionType.BINARY
+        and question.resolution in RESOLUTIONS
+    ):
+        rows = list(
+            _get_aggregate_rows(
+                question.aggregate_forecasts.filter(
+                    method=track_record.aggregation_method
+                )
+            )
+        )
+        if rows:
+            track_record.questions_predicted += 1
+            add_forecasts_to_stats(track_record, rows)
+            add_scores_to_stats(track_record, [score])
+    track_record.score_scatter_plot.append([score, created_at.timestamp()])
+
+
+def build_track_record(
+    aggregation_method: str = AggregationMethod.RECENCY_WEIGHTED,
+) -> TrackRecord:
+    """
+    Computes and stores the track record of an aggregation method from scratch.
+    Questions resolved but not scored yet are left to update_track_record.
+    Slow, so it runs in run_build_track_record or the rebuild_track_record command
+    """
+    TrackRecord.objects.get_or_create(
+        aggregation_method=aggregation_method, defaults={"is_stale": True}
+    )
+    started_at = timezone.now()
+
+    # Computed without locking the stored track record, so scorings keep
+    # updating it meanwhile. Only the questions scored so far are counted
+    scores = {
+        question_id: (score, created_at)
+        for question_id, score, created_at in Score.objects.filter(
+            aggregation_method=aggregation_method,
+            score_type=Score.ScoreTypes.BASELINE,
+        ).values_list("question_id", "score", "created_at")
+    }
+    track_record = TrackRecord(aggregation_method=aggregation_method)
+    question_ids = set()
+    for rows in iter_rows_chunks(
+        _get_aggregate_rows(
+            AggregateForecast.objects.filter(
+                Exists(
+                    Score.objects.filter(
+                        question_id=OuterRef("question_id"),
+                        aggregation_method=aggregation_method,
+                        score_type=Score.ScoreTypes.BASELINE,
+                    )
+                ),
+                method=aggregation_method,
+                question__type=Question.QuestionType.BINARY,
+                question__resolution__in=RESOLUTIONS,
+            )
+        )
+    ):
+        rows = [row for row in rows if row[1] in scores]
+        question_ids.update(row[1] for row in rows)
+        add_forecasts_to_stats(track_record, rows)
+    track_record.questions_predicted = len(question_ids)
+
+    add_scores_to_stats(
+        track_record,
+        [
+            score
+            for question_id, (score, _) in scores.items()
+            if question_id in question_ids
+        ],
+    )
+    track_record.score_scatter_plot = [
+        [score, created_at.timestamp()] for score, created_at in scores.values()
+    ]
+
+    with transaction.atomic():
+        # Scorings update the stored track record under this lock, in the
+        # transaction storing their scores. Once it's held, the questions scored
+        # during the build are visible, and are folded in before the swap
+        stored = TrackRecord.objects.select_for_update().get(
+            aggregation_method=aggregation_method
+        )
+        new_scores = {
+            question_id: (score, created_at)
+            for question_id, score, created_at in Score.objects.filter(
+                aggregation_method=aggregation_method,
+                score_type=Score.ScoreTypes.BASELINE,
+            ).values_list("question_id", "score", "created_at")
+            if question_id not in scores
+        }
+        for question in Question.objects.filter(id__in=new_scores):
+            _add_question_to_track_record(
+                track_record, question, *new_scores[question.id]
+            )
+
+        # Rescorings during the build scheduled another one
+        track_record.is_stale = stored.is_stale and stored.edited_at > started_at
+        track_record.edited_at = timezone.now()
+        TrackRecord.objects.bulk_create(
+            [track_record],
+            update_conflicts=True,
+            unique_fields=["aggregation_method"],
+            update_fields=TRACK_RECORD_FIELDS,
+        )
+    return track_record
+
+
+def get_track_record(
+    aggregation_method: str = AggregationMethod.RECENCY_WEIGHTED,
+) -> TrackRecord:
+    """
+    Returns the stored track record of an aggregation method, even if stale.
+    The first read gets an empty one and schedules its build
+    """
+    from scoring.tasks import run_build_track_record
+
+    track_record, created = TrackRecord.objects.get_or_create(
+        aggregation_method=aggregation_method, defaults={"is_stale": True}
+    )
+    if created:
+        run_build_track_record.send(aggregation_method)
+    return track_record
+
+
+def update_track_record(
+    question: Question, old_scores: list[Score], new_scores: list[Score]
+):
+    """
+    Folds the BASELINE scoring of a question into the stored track records.
+    Must run in the transaction storing the new scores, see build_track_record
+    """
+    from scoring.tasks import run_build_track_record
+
+    with transaction.atomic():
+        for aggregation_method in TrackRecord.objects.values_list(
+            "aggregation_method", flat=True
+        ):
+            old_score = next(
+                (
+                    score
+                    for score in old_scores
+                    if not score.user_id
+                    and score.aggregation_method == aggregation_method
+                ),
+                None,
+            )
+            new_score = next(
+                (
+                    score
+                    for score in new_scores
+                    if not score.user_id
+                    and score.aggregation_method == aggregation_method
+                ),
+                None,
+            )
+
+            track_record = (
+                TrackRecord.objects.select_for_update()
+                .filter(aggregation_method=aggregation_method)
+                .first()
+            )
+            if track_record is None:
+                continue
+            if old_score:
+                # The contribution of the question is not known anymore,
+                # so the last track record is served until it gets rebuilt
+                track_record.is_stale = True
+                track_record.edited_at = timezone.now()
+                track_record.save(update_fields=["is_stale", "edited_at"])
+                transaction.on_commit(
+                    partial(run_build_track_record.send, aggregation_method)
+                )
+                continue
+            if not new_score:
+                # Not counted by build_track_record either
+                continue
+
+            _add_question_to_track_record(
+                track_record, question, new_score.score, new_score.created_at
+            )
+            track_record.save()
+
+
+def serialize_track_record(track_record: TrackRecord) -> dict:
+    stats = serialize_user_stats(track_record)
+    return {
+        "calibration_curve": stats["calibration_curve"],
+        "score_histogram": stats["score_histogram"],
+        "score_scatter_plot": [
+            {"score": score, "score_timestamp": timestamp}
+            for score, timestamp in track_record.score_scatter_plot
+        ],
+    }
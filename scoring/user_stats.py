@@ -0,0 +1,263 @@
+from collections import defaultdict
+from functools import partial
+from itertools import batched
+from typing import Iterable, Iterator
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Exists, OuterRef, QuerySet
+from django.utils import timezone
+
+from questions.models import Forecast, Question
+from scoring.models import ForecastingStats, Score, UserStats
+from utils.the_math.calibration import (
+    CalibrationBins,
+    ScoreHistogram,
+    get_forecast_weights,
+)
+
+CALIBRATION_BINS = 20
+SCORE_HISTOGRAM_START = -700
+SCORE_HISTOGRAM_BIN_WIDTH = 70
+SCORE_HISTOGRAM_BINS = 20
+
+RESOLUTIONS = ["no", "yes"]
+
+# Forecast rows are streamed from the database by chunks of this size
+CHUNK_SIZE = 10_000
+
+
+def _get_forecasts_rows(forecasts) -> QuerySet:
+    return forecasts.values_list(
+        "author_id",
+        "question_id",
+        "probability_yes",
+        "start_time",
+        "end_time",
+        "question__open_time",
+        "question__forecast_scoring_ends",
+        "question__actual_close_time",
+        "question__resolution",
+    )
+
+
+def iter_rows_chunks(rows: QuerySet) -> Iterator[tuple[tuple, ...]]:
+    return batched(rows.iterator(chunk_size=CHUNK_SIZE), CHUNK_SIZE)
+
+
+def get_calibration_bins(stats: ForecastingStats) -> CalibrationBins:
+    return CalibrationBins(
+        CALIBRATION_BINS,
+        counts=stats.calibration_counts,
+        weights=stats.calibration_weights,
+        resolved_weights=stats.calibration_resolved_weights,
+    )
+
+
+def get_score_histogram(stats: ForecastingStats) -> ScoreHistogram:
+    return ScoreHistogram(
+        SCORE_HISTOGRAM_START,
+        SCORE_HISTOGRAM_BIN_WIDTH,
+        SCORE_HISTOGRAM_BINS,
+        counts=stats.score_histogram,
+    )
+
+
+def add_forecasts_to_stats(stats: ForecastingStats, rows: Iterable[tuple]):
+    """
+    rows: (author, question_id, probability_yes, start_time, end_time,
+        question open_time, forecast_scoring_ends, actual_close_time, resolution)
+    """
+    rows = list(rows)
+
+    def timestamps(index):
+        return np.array(
+            [row[index].timestamp() if row[index] else np.nan for row in rows]
+        )
+
+    calibration = get_calibration_bins(stats)
+    calibration.add(
+        np.array([row[2] for row in rows], dtype=float),
+        get_forecast_weights(
+            timestamps(3), timestamps(4), timestamps(5), timestamps(6), timestamps(7)
+        ),
+        np.array([int(row[8] == "yes") for row in rows]),
+    )
+    stats.calibration_counts = calibration.counts.tolist()
+    stats.calibration_weights = calibration.weights.tolist()
+    stats.calibration_resolved_weights = calibration.resolved_weights.tolist()
+
+
+def add_scores_to_stats(stats: ForecastingStats, scores: list[float]):
+    stats.questions_predicted_scored += len(scores)
+    stats.score_sum += sum(scores)
+    histogram = get_score_histogram(stats)
+    histogram.add(scores)
+    stats.score_histogram = histogram.counts.tolist()
+
+
+def build_users_stats(user_ids: Iterable[int]) -> list[UserStats]:
+    """
+    Computes (does not save) the stats of the given users from scratch.
+    Questions resolved but not scored yet are left to update_user_stats
+    """
+    users_stats = {user_id: UserStats(user_id=user_id) for user_id in user_ids}
+    question_ids: dict[int, set[int]] = defaultdict(set)
+    for chunk in iter_rows_chunks(
+        _get_forecasts_rows(
+            Forecast.objects.filter(
+                Exists(
+                    Score.objects.filter(
+                        question_id=OuterRef("question_id"),
+                        score_type=Score.ScoreTypes.BASELINE,
+                    )
+                ),
+                author_id__in=users_stats.keys(),
+                question__type=Question.QuestionType.BINARY,
+                question__resolution__in=RESOLUTIONS,
+            )
+        )
+    ):
+        forecasts_by_user: dict[int, list[tuple]] = defaultdict(list)
+        for row in chunk:
+            forecasts_by_user[row[0]].append(row)
+            question_ids[row[0]].add(row[1])
+        for user_id, rows in forecasts_by_user.items():
+            add_forecasts_to_stats(users_stats[user_id], rows)
+
+    scores_by_user: dict[int, list[float]] = defaultdict(list)
+    for user_id, question_id, score, created_at in Score.objects.filter(
+        user_id__in=users_stats.keys(),
+        score_type=Score.ScoreTypes.BASELINE,
+    ).values_list("user_id", "question_id", "score", "created_at"):
+        users_stats[user_id].score_scatter_plot.append(
+            [score, created_at.timestamp()]
+        )
+        # Only the binary questions resolved yes or no have forecasts counted
+        if question_id in question_ids[user_id]:
+            scores_by_user[user_id].append(score)
+
+    for user_id, stats in users_stats.items():
+        stats.questions_predicted = len(question_ids[user_id])
+        add_scores_to_stats(stats, scores_by_user[user_id])
+    return list(users_stats.values())
+
+
+USER_STATS_FIELDS = [
+    "questions_predicted",
+    "questions_predicted_scored",
+    "score_sum",
+    "calibration_counts",
+    "calibration_weights",
+    "calibration_resolved_weights",
+    "score_histogram",
+    "score_scatter_plot",
+    "is_stale",
+    "edited_at",
+]
+
+
+def refresh_users_stats(user_ids: Iterable[int]) -> list[UserStats]:
+    """Recomputes and stores the stats of the given users"""
+    user_ids = list(user_ids)
+    with transaction.atomic():
+        # Scorings update the stored stats under these locks, see
+        # update_user_stats, so none of them lands during the build
+        list(
+            UserStats.objects.select_for_update()
+            .filter(user_id__in=user_ids)
+            .values_list("id", flat=True)
+        )
+        users_stats = build_users_stats(user_ids)
+        UserStats.objects.bulk_create(
+            users_stats,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=USER_STATS_FIELDS,
+        )
+    return users_stats
+
+
+def get_user_stats(user_id: int) -> UserStats:
+    """
+    Returns the stats of a user, computing them the first time.
+    Stats stored meanwhile by a concurrent scoring are kept over the computed ones
+    """
+    stats = UserStats.objects.filter(user_id=user_id).first()
+    if stats is None:
+        UserStats.objects.bulk_create(
+            build_users_stats([user_id]), ignore_conflicts=True
+        )
+        stats = UserStats.objects.get(user_id=user_id)
+    return stats
+
+
+def update_user_stats(
+    question: Question, old_scores: list[Score], new_scores: list[Score]
+):
+    """
+    Folds the BASELINE scoring of a question into the stats of its forecasters.
+    Must run in the transaction storing the new scores, so stats built
+    concurrently either see the question scored or not at all
+    """
+    from scoring.tasks import run_refresh_users_stats
+
+    is_counted = (
+        question.type == Question.QuestionType.BINARY
+        and question.resolution in RESOLUTIONS
+    )
+    forecasts = Forecast.objects.filter(question=question)
+    if old_scores:
+        # The contribution of the question is not known anymore, so the last
+        # stats are served until they get refreshed
+        user_ids = {score.user_id for score in [*old_scores, *new_scores]}
+        if question.type == Question.QuestionType.BINARY:
+            user_ids.update(forecasts.values_list("author_id", flat=True).distinct())
+        user_ids.discard(None)
+        UserStats.objects.filter(user_id__in=user_ids).update(
+            is_stale=True, edited_at=timezone.now()
+        )
+        transaction.on_commit(partial(run_refresh_users_stats.send, list(user_ids)))
+        return
+
+    forecasts_by_user: dict[int, list[tuple]] = defaultdict(list)
+    if is_counted and new_scores:
+        for row in _get_forecasts_rows(forecasts):
+            forecasts_by_user[row[0]].append(row)
+    scores = {score.user_id: score for score in new_scores if score.user_id}
+
+    with transaction.atomic():
+        users_stats = list(
+            UserStats.objects.select_for_update().filter(
+                user_id__in=forecasts_by_user.keys() | scores.keys()
+            )
+        )
+        now = timezone.now()
+        for stats in users_stats:
+            stats.edited_at = now
+            score = scores.get(stats.user_id)
+            if score:
+                stats.score_scatter_plot.append(
+                    [score.score, score.created_at.timestamp()]
+                )
+            if stats.user_id not in forecasts_by_user:
+                continue
+            stats.questions_predicted += 1
+            add_forecasts_to_stats(stats, forecasts_by_user.pop(stats.user_id))
+            if score:
+                add_scores_to_stats(stats, [score.score])
+        UserStats.objects.bulk_update(users_stats, USER_STATS_FIELDS, batch_size=500)
+    # Users seen for the first time are computed from scratch
+    refresh_users_stats(forecasts_by_user.keys())
+
+
+def serialize_user_stats(stats: ForecastingStats) -> dict:
+    scored = stats.questions_predicted_scored
+    return {
+        "avg_score": stats.score_sum / scored if scored else None,
+        "questions_predicted_scored": scored,
+        "questions_predicted": stats.questions_predicted,
+        "calibration_curve": get_calibration_bins(stats).get_curve(),
+        "score_histogram": get_score_histogram(stats).get_histogram(scored),
+    }
@@ -1,20 +1,28 @@
+import logging
 from collections import defaultdict
 from datetime import datetime
 from dataclasses import dataclass
 
+import numpy as np
+from django.db import transaction
 from django.utils import timezone
-from django.db.models import QuerySet, Q
+from django.db.models import Count, F, QuerySet, Q, Sum, Value, Window
+from django.db.models.functions import Coalesce, Greatest, Least, RowNumber
 
 from comments.models import Comment
 from users.models import User
 from posts.models import Post
 from projects.models import Project
-from questions.models import Question
-from questions.types import AggregationMethod
+from questions.models import Forecast, Question
 from scoring.models import Score, LeaderboardEntry, Leaderboard, MedalExclusionRecord
+from scoring.reputation import update_reputation_ledger
 from scoring.score_math import evaluate_question
+from scoring.track_record import update_track_record
+from scoring.user_stats import update_user_stats
 from utils.the_math.formulas import string_location_to_bucket_index
-from utils.the_math.measures import decimal_h_index
+from utils.the_math.measures import decimal_h_index, decimal_h_indexes
+
+logger = logging.getLogger(__name__)
 
 
 def score_question(
@@ -22,154 +30,225 @@ def score_question(
     resolution: str,
     spot_forecast_time: datetime | None = None,
     score_types: list[str] | None = None,
+    update_leaderboards: bool = False,
+    update_stats: bool = True,
 ):
+    """
+    update_stats: maintains the reputation ledger, user stats and track records.
+        Bulk rescorings skip it and rebuild them once at the end instead
+    """
     resolution_bucket = string_location_to_bucket_index(resolution, question)
     score_types = score_types or Score.ScoreTypes.choices
+    is_public = Question.objects.filter_public().filter(pk=question.pk).exists()
     for score_type in score_types:
-        seen = set()
-        previous_scores = list(
-            Score.objects.filter(question=question, score_type=score_type)
-        )
+        previous_scores = {
+            (score.user_id, score.aggregation_method): score
+            for score in Score.objects.filter(question=question, score_type=score_type)
+        }
+        old_scores = list(previous_scores.values())
         new_scores = evaluate_question(
             question, resolution_bucket, score_type, spot_forecast_time
         )
         for new_score in new_scores:
-            is_new = True
-            for previous_score in previous_scores:
-                if (previous_score.user == new_score.user) and (
-                    previous_score.aggregation_method == new_score.aggregation_method
-                ):
-                    is_new = False
-                    previous_score.score = new_score.score
-                    previous_score.coverage = new_score.coverage
-                    previous_score.edited_at = question.resolution_set_time
-                    previous_score.save()
-                    seen.add(previous_score)
-                    break
-            if is_new:
-                new_score.question = question
-                new_score.edited_at = question.resolution_set_time
-                new_score.save()
-        for previous_score in previous_scores:
-            if previous_score not in seen:
-                previous_score.delete()
+            previous_score = previous_scores.pop(
+                (new_score.user_id, new_score.aggregation_method), None
+            )
+            new_score.id = previous_score.id if previous_score else None
+            new_score.question = question
+            new_score.edited_at = question.resolution_set_time
+        with transaction.atomic():
+            # Matched scores carry the previous id, so upserting on the primary key
+            # updates them in place and inserts the others
+            Score.objects.bulk_create(
+                new_scores,
+                update_conflicts=True,
+                unique_fields=["id"],
+                update_fields=["score", "coverage", "edited_at"],
+            )
+            Score.objects.filter(
+                id__in=[score.id for score in previous_scores.values()]
+            ).delete()
+            if update_stats:
+                # Reputation only counts peer scores on public questions
+                if is_public and score_type == Score.ScoreTypes.PEER:
+                    update_reputation_ledger(old_scores, new_scores)
+                if score_type == Score.ScoreTypes.BASELINE:
+                    update_user_stats(question, old_scores, new_scores)
+                    update_track_record(question, old_scores, new_scores)
+        if update_leaderboards:
+            update_question_leaderboards(question, score_type, old_scores, new_scores)
 
 
 def generate_scoring_leaderboard_entries(
-    questions: list[Question],
+    questions: list[Question] | QuerySet[Question],
     leaderboard: Leaderboard,
 ) -> list[LeaderboardEntry]:
-    scores: QuerySet[Score] = Score.objects.filter(
-        question__in=questions,
-        score_type=Leaderboard.ScoreTypes.get_base_score(leaderboard.score_type),
-    )
-    entries: dict[int | AggregationMethod, LeaderboardEntry] = {}
-    now = timezone.now()
-    for score in scores:
-        identifier = score.user_id or score.aggregation_method
-        if identifier not in entries:
-            entries[identifier] = LeaderboardEntry(
-                user_id=score.user_id,
-                aggregation_method=score.aggregation_method,
-                score=0,
-                coverage=0,
-                contribution_count=0,
-                calculated_on=now,
-            )
-        entries[identifier].score += score.score
-        entries[identifier].coverage += score.coverage
-        entries[identifier].contribution_count += 1
+    """
+    Sums the scores per user (or aggregation method) in the database,
+    returning the entries ordered by score with a preliminary rank
+    """
+    total_score = Sum("score")
     if leaderboard.score_type == Leaderboard.ScoreTypes.PEER_GLOBAL:
-        for entry in entries.values():
-            entry.score /= max(30, entry.coverage)
+        total_score = Sum("score") / Greatest(Sum("coverage"), Value(30.0))
     elif leaderboard.score_type == Leaderboard.ScoreTypes.PEER_GLOBAL_LEGACY:
-        for entry in entries.values():
-            entry.score /= max(40, entry.contribution_count)
-    return sorted(entries.values(), key=lambda entry: entry.score, reverse=True)
-
+        total_score = Sum("score") / Greatest(Count("id"), Value(40))
 
-def generate_comment_insight_leaderboard_entries(
-    leaderboard: Leaderboard,
-) -> list[LeaderboardEntry]:
+    rows = (
+        Score.objects.filter(
+            question__in=questions,
+            score_type=Leaderboard.ScoreTypes.get_base_score(leaderboard.score_type),
+        )
+        .values("user_id", "aggregation_method")
+        .annotate(
+            total_score=total_score,
+            total_coverage=Sum("coverage"),
+            contribution_count=Count("id"),
+        )
+        .annotate(
+            rank=Window(
+                RowNumber(),
+                order_by=F("total_score").desc(),
+            )
+        )
+        .order_by("rank")
+    )
     now = timezone.now()
+    return [
+        LeaderboardEntry(
+            user_id=row["user_id"],
+            aggregation_method=row["aggregation_method"],
+            score=row["total_score"],
+            coverage=row["total_coverage"],
+            contribution_count=row["contribution_count"],
+            rank=row["rank"],
+            calculated_on=now,
+        )
+        for row in rows.iterator()
+    ]
 
+
+def get_comment_scores(
+    leaderboard: Leaderboard, comments: QuerySet[Comment] | None = None
+) -> QuerySet[Comment]:
+    """
+    Annotates the comments on the posts of the leaderboard with the sum of their
+    votes cast during the leaderboard window. Only comments with votes are kept
+    """
     posts = Post.objects.filter(
         Q(projects=leaderboard.project) | Q(default_project=leaderboard.project)
     )
-    comments = Comment.objects.filter(
+    comments = comments if comments is not None else Comment.objects.all()
+    return comments.filter(
         on_post__in=posts,
         comment_votes__isnull=False,
-    ).distinct()
-
-    scores_for_author: dict[User, list[int]] = defaultdict(list)
-    for comment in comments:
-        votes = comment.comment_votes.filter(
-            created_at__gte=leaderboard.start_time,
-            created_at__lte=leaderboard.end_time,
+    ).annotate(
+        score=Coalesce(
+            Sum(
+                "comment_votes__direction",
+                filter=Q(
+                    comment_votes__created_at__gte=leaderboard.start_time,
+                    comment_votes__created_at__lte=leaderboard.end_time,
+                ),
+            ),
+            0,
         )
-        score = sum([vote.direction for vote in votes])
-        if score > 0:
-            scores_for_author[comment.author].append(score)
-
-    user_entries: dict[User, LeaderboardEntry] = {}
-    for user, scores in scores_for_author.items():
-        if user not in user_entries:
-            user_entries[user] = LeaderboardEntry(
-                user_id=user.id,
-                score=0,
-                contribution_count=0,
-                calculated_on=now,
+    )
+
+
+def get_post_forecaster_counts(forecasts: QuerySet[Forecast]) -> dict[int, int]:
+    """Counts the distinct authors of `forecasts` per post of their question"""
+    # Forecast.post is not populated on older forecasts
+    return dict(
+        forecasts.annotate(
+            question_post_id=Coalesce(
+                "question__post__id",
+                "question__group__post__id",
+                "question__conditional_yes__post__id",
+                "question__conditional_no__post__id",
             )
-        score = decimal_h_index(scores)
-        user_entries[user].score = score
-        user_entries[user].contribution_count = len(scores)
-    results = [entry for entry in user_entries.values() if entry.score > 0]
+        )
+        .values("question_post_id")
+        .annotate(forecasters=Count("author_id", distinct=True))
+        .values_list("question_post_id", "forecasters")
+    )
+
+
+def build_h_index_leaderboard_entries(
+    user_ids: list[int], scores: list[float]
+) -> list[LeaderboardEntry]:
+    """
+    Builds an entry per user scored by the decimal h-index of their scores,
+    ordered by score
+    """
+    if not user_ids:
+        return []
+    now = timezone.now()
+    unique_user_ids, h_indexes = decimal_h_indexes(np.array(user_ids), np.array(scores))
+    _, contribution_counts = np.unique(user_ids, return_counts=True)
+    results = [
+        LeaderboardEntry(
+            user_id=int(user_id),
+            score=float(score),
+            contribution_count=int(contribution_count),
+            calculated_on=now,
+        )
+        for user_id, score, contribution_count in zip(
+            unique_user_ids, h_indexes, contribution_counts
+        )
+        if score > 0
+    ]
     return sorted(results, key=lambda entry: entry.score, reverse=True)
 
 
-def generate_question_writing_leaderboard_entries(
-    questions: list[Question],
+def generate_comment_insight_leaderboard_entries(
     leaderboard: Leaderboard,
 ) -> list[LeaderboardEntry]:
-    now = timezone.now()
+    comment_scores = (
+        get_comment_scores(leaderboard)
+        .filter(score__gt=0)
+        .values_list("author_id", "score")
+    )
+    author_ids, scores = [], []
+    for author_id, score in comment_scores:
+        author_ids.append(author_id)
+        scores.append(score)
+    return build_h_index_leaderboard_entries(author_ids, scores)
 
-    forecaster_ids_for_post: dict[Post, set[int]] = defaultdict(set)
-    for question in questions:
-        forecasts_during_period = question.user_forecasts.filter(
-            start_time__gte=leaderboard.start_time,
-            start_time__lte=min(
-                [
-                    leaderboard.end_time,
-                    question.actual_close_time or question.scheduled_close_time,
-                    question.actual_resolve_time or question.scheduled_resolve_time,
-                ]
+
+def generate_question_writing_leaderboard_entries(
+    questions: list[Question] | QuerySet[Question],
+    leaderboard: Leaderboard,
+) -> list[LeaderboardEntry]:
+    forecasts_during_period = Forecast.objects.filter(
+        question__in=questions,
+        start_time__gte=leaderboard.start_time,
+        start_time__lte=Least(
+            Value(leaderboard.end_time),
+            Coalesce("question__actual_close_time", "question__scheduled_close_time"),
+            Coalesce(
+                "question__actual_resolve_time", "question__scheduled_resolve_time"
             ),
+        ),
+    )
+    forecaster_counts = get_post_forecaster_counts(forecasts_during_period)
+    posts = (
+        Post.objects.filter(
+            Q(question__in=questions)
+            | Q(group_of_questions__questions__in=questions)
+            | Q(conditional__question_yes__in=questions)
+            | Q(conditional__question_no__in=questions)
         )
-        forecasters = set([forecast.author_id for forecast in forecasts_during_period])
-        post = question.get_post()
-        forecaster_ids_for_post[post].update(forecasters)
-
-    scores_for_author: dict[User, list[float]] = defaultdict(list)
-    for post, forecaster_ids in forecaster_ids_for_post.items():
-        # TODO: support coauthorship
-        author = post.author
+        .distinct()
+        .values_list("id", "author_id")
+    )
+
+    # TODO: support coauthorship
+    author_ids, scores = [], []
+    for post_id, author_id in posts:
+        author_ids.append(author_id)
         # we use the h-index by number of forecasters divided by 10
-        scores_for_author[author].append(len(forecaster_ids) / 10)
-
-    user_entries: dict[User, LeaderboardEntry] = {}
-    for user, scores in scores_for_author.items():
-        if user not in user_entries:
-            user_entries[user] = LeaderboardEntry(
-                user_id=user.id,
-                score=0,
-                contribution_count=0,
-                calculated_on=now,
-            )
-        score = decimal_h_index(scores)
-        user_entries[user].score = score
-        user_entries[user].contribution_count = len(scores)
-    results = [entry for entry in user_entries.values() if entry.score > 0]
-    return sorted(results, key=lambda entry: entry.score, reverse=True)
+        scores.append(forecaster_counts.get(post_id, 0) / 10)
+    return build_h_index_leaderboard_entries(author_ids, scores)
 
 
 def generate_project_leaderboard(
@@ -187,13 +266,27 @@ def generate_project_leaderboard(
 
     if leaderboard.score_type == Leaderboard.ScoreTypes.COMMENT_INSIGHT:
         return generate_comment_insight_leaderboard_entries(leaderboard)
-    questions = questions or leaderboard.get_questions()
+    if questions is None:
+        questions = leaderboard.get_questions()
     if leaderboard.score_type == Leaderboard.ScoreTypes.QUESTION_WRITING:
         return generate_question_writing_leaderboard_entries(questions, leaderboard)
     # We have a scoring based leaderboard
     return generate_scoring_leaderboard_entries(questions, leaderboard)
 
 
+def get_excluded_user_ids(leaderboard: Leaderboard) -> set[int]:
+    exclusion_records = MedalExclusionRecord.objects.all()
+    if leaderboard.start_time:
+        exclusion_records = exclusion_records.filter(
+            Q(end_time__isnull=True) | Q(end_time__gte=leaderboard.start_time)
+        )
+    if leaderboard.finalize_time:
+        exclusion_records = exclusion_records.filter(
+            start_time__lte=leaderboard.finalize_time
+        )
+    return set(exclusion_records.values_list("user_id", flat=True))
+
+
 def update_project_leaderboard(
     project: Project,
     leaderboard: Leaderboard | None = None,
@@ -204,71 +297,360 @@ def update_project_leaderboard(
 
     leaderboard.project = project
     leaderboard.save()
+    with transaction.atomic():
+        # Holds the lock apply_leaderboard_score_deltas takes, so incremental
+        # updates neither land twice nor get overwritten by a stale rebuild
+        Leaderboard.objects.select_for_update().get(pk=leaderboard.pk)
+        leaderboard.update_questions()
+
+        previous_entries = {
+            (entry.user_id, entry.aggregation_method): entry
+            for entry in leaderboard.entries.all()
+        }
+        new_entries = generate_project_leaderboard(project, leaderboard)
+
+        # assign ranks (and medals if finalized)
+        new_entries.sort(key=lambda entry: entry.score, reverse=True)
+        excluded_user_ids = get_excluded_user_ids(leaderboard)
+        # medals
+        golds = silvers = bronzes = 0
+        if (
+            (leaderboard.project.type != "question_series")
+            and leaderboard.finalize_time
+            and (timezone.now() > leaderboard.finalize_time)
+        ):
+            entry_count = len(
+                [
+                    e
+                    for e in new_entries
+                    if (e.user_id and (e.user_id not in excluded_user_ids))
+                ]
+            )
+            golds = max(0.01 * entry_count, 1)
+            silvers = max(0.01 * entry_count, 1)
+            bronzes = max(0.03 * entry_count, 1)
+        rank = 1
+        for entry in new_entries:
+            if (entry.user_id is None) or (entry.user_id in excluded_user_ids):
+                entry.excluded = True
+                entry.medal = None
+                entry.rank = rank
+                continue
+            if rank <= golds:
+                entry.medal = LeaderboardEntry.Medals.GOLD
+            elif rank <= golds + silvers:
+                entry.medal = LeaderboardEntry.Medals.SILVER
+            elif rank <= golds + silvers + bronzes:
+                entry.medal = LeaderboardEntry.Medals.BRONZE
+            entry.rank = rank
+            rank += 1
+
+        # Only write the entries that are new or changed
+        updated_fields = [
+            "score",
+            "coverage",
+            "contribution_count",
+            "rank",
+            "excluded",
+            "medal",
+            "prize",
+        ]
+        to_write: list[LeaderboardEntry] = []
+        for new_entry in new_entries:
+            new_entry.leaderboard = leaderboard
+            previous_entry = previous_entries.pop(
+                (new_entry.user_id, new_entry.aggregation_method), None
+            )
+            if previous_entry:
+                new_entry.id = previous_entry.id
+                if all(
+                    getattr(new_entry, field) == getattr(previous_entry, field)
+                    for field in updated_fields
+                ):
+                    continue
+            to_write.append(new_entry)
+        # Matched entries carry the previous id, so upserting on the primary key
+        # updates them in place and inserts the others
+        LeaderboardEntry.objects.bulk_create(
+            to_write,
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=updated_fields + ["calculated_on"],
+        )
+        LeaderboardEntry.objects.filter(
+            id__in=[entry.id for entry in previous_entries.values()]
+        ).delete()
+    logger.info(
+        "Updated leaderboard %s: %s entries written, %s unchanged, %s deleted",
+        leaderboard.id,
+        len(to_write),
+        len(new_entries) - len(to_write),
+        len(previous_entries),
+    )
+    return new_entries
 
-    seen = set()
-    previous_entries = list(leaderboard.entries.all())
-    new_entries = generate_project_leaderboard(project, leaderboard)
 
-    # assign ranks (and medals if finalized)
-    new_entries.sort(key=lambda entry: entry.score, reverse=True)
-    exclusion_records = MedalExclusionRecord.objects.all()
-    if leaderboard.start_time:
-        exclusion_records = exclusion_records.filter(
-            Q(end_time__isnull=True) | Q(end_time__gte=leaderboard.start_time)
-        )
-    if leaderboard.finalize_time:
-        exclusion_records = exclusion_records.filter(
-            start_time__lte=leaderboard.finalize_time
-        )
-    excluded_users = exclusion_records.values_list("user", flat=True)
-    excluded_user_ids = set([r.user.id for r in exclusion_records])
-    # medals
-    golds = silvers = bronzes = 0
-    if (
-        (leaderboard.project.type != "question_series")
-        and leaderboard.finalize_time
-        and (timezone.now() > leaderboard.finalize_time)
-    ):
-        entry_count = len(
-            [
-                e
-                for e in new_entries
-                if (e.user_id and (e.user_id not in excluded_user_ids))
-            ]
+def update_post_leaderboard_questions(post: Post):
+    """
+    Refreshes the leaderboard memberships of the questions of a post,
+    called whenever it is published, moved between projects or resolved
+    """
+    questions = Question.objects.filter(Q(post=post) | Q(group__post=post))
+    leaderboards = Leaderboard.objects.filter(
+        Q(project__isnull=True)
+        | Q(project__posts=post)
+        | Q(project__default_posts=post)
+        | Q(questions__in=questions)
+    ).distinct()
+    for leaderboard in leaderboards:
+        leaderboard.update_questions(questions)
+
+
+def rebuild_leaderboard_questions() -> int:
+    """
+    Recomputes the global leaderboard window of every resolved question
+    and the question membership of every leaderboard.
+    Returns the number of memberships
+    """
+    questions = Question.objects.filter(resolution_set_time__isnull=False).only(
+        "id",
+        "open_time",
+        "actual_close_time",
+        "resolution_set_time",
+        "global_leaderboard_start_time",
+        "global_leaderboard_end_time",
+    )
+    to_update: list[Question] = []
+    for question in questions.iterator(chunk_size=1000):
+        window = (
+            question.global_leaderboard_start_time,
+            question.global_leaderboard_end_time,
         )
-        golds = max(0.01 * entry_count, 1)
-        silvers = max(0.01 * entry_count, 1)
-        bronzes = max(0.03 * entry_count, 1)
+        question.set_global_leaderboard_dates()
+        if window != (
+            question.global_leaderboard_start_time,
+            question.global_leaderboard_end_time,
+        ):
+            to_update.append(question)
+    Question.objects.bulk_update(
+        to_update,
+        ["global_leaderboard_start_time", "global_leaderboard_end_time"],
+        batch_size=1000,
+    )
+
+    for leaderboard in Leaderboard.objects.select_related("project"):
+        leaderboard.update_questions()
+    return Leaderboard.questions.through.objects.count()
+
+
+def get_question_leaderboards(question: Question, score_type: str) -> list[Leaderboard]:
+    """
+    Returns the scoring leaderboards built on top of `score_type` scores
+    that the question counts for
+    """
+    leaderboard_score_types = []
+    for leaderboard_score_type in Leaderboard.ScoreTypes:
+        if leaderboard_score_type in (
+            Leaderboard.ScoreTypes.COMMENT_INSIGHT,
+            Leaderboard.ScoreTypes.QUESTION_WRITING,
+        ):
+            continue
+        if Leaderboard.ScoreTypes.get_base_score(leaderboard_score_type) == score_type:
+            leaderboard_score_types.append(leaderboard_score_type)
+
+    return list(
+        Leaderboard.objects.filter(
+            score_type__in=leaderboard_score_types, questions=question
+        ).select_related("project")
+    )
+
+
+def get_leaderboard_total_score(
+    leaderboard: Leaderboard, entry: LeaderboardEntry
+) -> float:
+    """Reverts the normalization of generate_scoring_leaderboard_entries"""
+    if leaderboard.score_type == Leaderboard.ScoreTypes.PEER_GLOBAL:
+        return entry.score * max(entry.coverage or 0, 30.0)
+    if leaderboard.score_type == Leaderboard.ScoreTypes.PEER_GLOBAL_LEGACY:
+        return entry.score * max(entry.contribution_count, 40)
+    return entry.score
+
+
+def get_leaderboard_entry_score(
+    leaderboard: Leaderboard, total_score: float, entry: LeaderboardEntry
+) -> float:
+    """Normalizes the total score like generate_scoring_leaderboard_entries"""
+    if leaderboard.score_type == Leaderboard.ScoreTypes.PEER_GLOBAL:
+        return total_score / max(entry.coverage or 0, 30.0)
+    if leaderboard.score_type == Leaderboard.ScoreTypes.PEER_GLOBAL_LEGACY:
+        return total_score / max(entry.contribution_count, 40)
+    return total_score
+
+
+def rank_leaderboard_entries(
+    leaderboard: Leaderboard,
+    min_score: float | None = None,
+    max_score: float | None = None,
+) -> int:
+    """
+    Reassigns the ranks of the entries scoring within [min_score, max_score],
+    the ranks outside of this window are left untouched.
+    Returns the number of updated entries
+    """
+    entries = leaderboard.entries.all()
     rank = 1
-    for entry in new_entries:
-        if (entry.user_id is None) or (entry.user_id in excluded_users):
-            entry.excluded = True
-            entry.medal = None
+    if max_score is not None:
+        rank += entries.filter(score__gt=max_score, excluded=False).count()
+        entries = entries.filter(score__lte=max_score)
+    if min_score is not None:
+        entries = entries.filter(score__gte=min_score)
+
+    to_update: list[LeaderboardEntry] = []
+    for entry in entries.order_by("-score", "id").only("id", "rank", "excluded"):
+        if entry.rank != rank:
             entry.rank = rank
+            to_update.append(entry)
+        # excluded entries share the rank of the next included one
+        if not entry.excluded:
+            rank += 1
+    LeaderboardEntry.objects.bulk_update(to_update, ["rank"], batch_size=500)
+    return len(to_update)
+
+
+def apply_leaderboard_score_deltas(
+    leaderboard: Leaderboard,
+    deltas: dict[tuple[int | None, str | None], tuple[float, float, int]],
+):
+    """
+    Applies the (score, coverage, contribution count) deltas keyed by
+    (user_id, aggregation_method) to the running totals of the leaderboard,
+    then re-ranks only the window of scores that moved
+    """
+    with transaction.atomic():
+        # Serializes the read-modify-write of the running totals with the
+        # concurrent rescorings and full rebuilds of the leaderboard
+        Leaderboard.objects.select_for_update().get(pk=leaderboard.pk)
+
+        user_ids = [user_id for user_id, _ in deltas if user_id]
+        aggregation_methods = [method for user_id, method in deltas if not user_id]
+        entries = {
+            (entry.user_id, entry.aggregation_method): entry
+            for entry in leaderboard.entries.filter(
+                Q(user_id__in=user_ids)
+                | Q(user__isnull=True, aggregation_method__in=aggregation_methods)
+            )
+        }
+        excluded_user_ids: set[int] | None = None
+        now = timezone.now()
+
+        to_write: list[LeaderboardEntry] = []
+        to_delete: list[LeaderboardEntry] = []
+        moved_scores: list[float] = []
+        # created or deleted entries shift the ranks of everyone below them
+        shifts_bottom = False
+        for (user_id, aggregation_method), (score, coverage, count) in deltas.items():
+            entry = entries.get((user_id, aggregation_method))
+            if entry:
+                moved_scores.append(entry.score)
+                total_score = get_leaderboard_total_score(leaderboard, entry)
+            else:
+                if excluded_user_ids is None:
+                    excluded_user_ids = get_excluded_user_ids(leaderboard)
+                entry = LeaderboardEntry(
+                    leaderboard=leaderboard,
+                    user_id=user_id,
+                    aggregation_method=aggregation_method,
+                    score=0,
+                    coverage=0,
+                    contribution_count=0,
+                    excluded=(user_id is None) or (user_id in excluded_user_ids),
+                )
+                total_score = 0.0
+            entry.coverage = (entry.coverage or 0) + coverage
+            entry.contribution_count += count
+            if entry.contribution_count <= 0:
+                if entry.id:
+                    to_delete.append(entry)
+                    shifts_bottom = shifts_bottom or not entry.excluded
+                continue
+            if not entry.id:
+                shifts_bottom = shifts_bottom or not entry.excluded
+            entry.score = get_leaderboard_entry_score(
+                leaderboard, total_score + score, entry
+            )
+            entry.calculated_on = now
+            moved_scores.append(entry.score)
+            to_write.append(entry)
+
+        if not moved_scores:
+            return
+        LeaderboardEntry.objects.bulk_create(
+            to_write,
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=["score", "coverage", "contribution_count", "calculated_on"],
+        )
+        LeaderboardEntry.objects.filter(
+            id__in=[entry.id for entry in to_delete]
+        ).delete()
+        reranked = rank_leaderboard_entries(
+            leaderboard,
+            min_score=None if shifts_bottom else min(moved_scores),
+            max_score=max(moved_scores),
+        )
+
+    logger.info(
+        "Updated leaderboard %s incrementally: %s entries written, "
+        "%s deleted, %s re-ranked",
+        leaderboard.id,
+        len(to_write),
+        len(to_delete),
+        reranked,
+    )
+
+
+def update_question_leaderboards(
+    question: Question,
+    score_type: str,
+    old_scores: list[Score],
+    new_scores: list[Score],
+):
+    """
+    Folds the rescoring of a question into the leaderboards it counts for.
+
+    Leaderboards handing out medals, and those never computed, are fully rebuilt
+    with update_project_leaderboard, which stays the source of truth. Never
+    computed leaderboards without a project are left to their own builds
+    """
+    deltas: dict[tuple[int | None, str | None], list] = defaultdict(
+        lambda: [0.0, 0.0, 0]
+    )
+    for sign, scores in ((-1, old_scores), (1, new_scores)):
+        for score in scores:
+            delta = deltas[(score.user_id, score.aggregation_method)]
+            delta[0] += sign * score.score
+            delta[1] += sign * (score.coverage or 0)
+            delta[2] += sign
+    deltas = {key: tuple(delta) for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+
+    for leaderboard in get_question_leaderboards(question, score_type):
+        project = leaderboard.project
+        if not leaderboard.entries.exists():
+            # Deltas of one question would make up a partial leaderboard
+            if project:
+                update_project_leaderboard(project, leaderboard)
             continue
-        if rank <= golds:
-            entry.medal = LeaderboardEntry.Medals.GOLD
-        elif rank <= golds + silvers:
-            entry.medal = LeaderboardEntry.Medals.SILVER
-        elif rank <= golds + silvers + bronzes:
-            entry.medal = LeaderboardEntry.Medals.BRONZE
-        entry.rank = rank
-        rank += 1
-
-    for new_entry in new_entries:
-        new_entry.leaderboard = leaderboard
-        for previous_entry in previous_entries:
-            if (previous_entry.user_id == new_entry.user_id) and (
-                previous_entry.aggregation_method == new_entry.aggregation_method
-            ):
-                new_entry.id = previous_entry.id
-                seen.add(previous_entry)
-                break
-        new_entry.save()
-    for previous_entry in previous_entries:
-        if previous_entry not in seen:
-            previous_entry.delete()
-    return new_entries
+        if (
+            project
+            and project.type != "question_series"
+            and leaderboard.finalize_time
+            and timezone.now() > leaderboard.finalize_time
+        ):
+            update_project_leaderboard(project, leaderboard)
+            continue
+        apply_leaderboard_score_deltas(leaderboard, deltas)
 
 
 @dataclass
@@ -285,62 +667,56 @@ def get_contributions(
     leaderboard: Leaderboard,
 ) -> list[Contribution]:
     if leaderboard.score_type == Leaderboard.ScoreTypes.COMMENT_INSIGHT:
-        public_posts = Post.objects.filter(
-            Q(projects=leaderboard.project) | Q(default_project=leaderboard.project)
+        comments = get_comment_scores(
+            leaderboard,
+            Comment.objects.filter(
+                author=user, created_at__lte=leaderboard.end_time
+            ).select_related("on_post"),
         )
-        comments = Comment.objects.filter(
-            on_post__in=public_posts,
-            author=user,
-            created_at__lte=leaderboard.end_time,
-            comment_votes__isnull=False,
-        ).distinct()
-        contributions: list[Contribution] = []
-        for comment in comments:
-            votes = comment.comment_votes.filter(
-                created_at__gte=leaderboard.start_time,
-                created_at__lte=leaderboard.end_time,
-            )
-            score = sum([vote.direction for vote in votes])
-            contribution = Contribution(
-                score=score,
+        contributions: list[Contribution] = [
+            Contribution(
+                score=comment.score,
                 post=comment.on_post,
                 comment=comment,
             )
-            contributions.append(contribution)
+            for comment in comments
+        ]
         h_index = decimal_h_index([c.score for c in contributions])
         contributions = sorted(contributions, key=lambda c: c.score, reverse=True)
         min_score = contributions[int(h_index)].score
         return [c for c in contributions if c.score >= min_score]
     questions = leaderboard.get_questions()
     if leaderboard.score_type == Leaderboard.ScoreTypes.QUESTION_WRITING:
-        forecaster_ids_for_post: dict[Post, set[int]] = {}
-        for question in questions:
-            post: Post = question.get_post()
-            if post.author != user:
-                continue
-            forecasts_during_period = question.user_forecasts.all()
-            if leaderboard.start_time:
-                forecasts_during_period = forecasts_during_period.filter(
-                    start_time__gte=leaderboard.start_time
-                )
-            if leaderboard.end_time:
-                forecasts_during_period = forecasts_during_period.filter(
-                    start_time__lte=leaderboard.end_time
-                )
-            forecasters = set(
-                [forecast.author_id for forecast in forecasts_during_period]
+        user_posts = Post.objects.filter(
+            Q(question__in=questions)
+            | Q(group_of_questions__questions__in=questions)
+            | Q(conditional__question_yes__in=questions)
+            | Q(conditional__question_no__in=questions),
+            author=user,
+        ).distinct()
+        forecasts_during_period = Forecast.objects.filter(
+            Q(question__post__in=user_posts)
+            | Q(question__group__post__in=user_posts)
+            | Q(question__conditional_yes__post__in=user_posts)
+            | Q(question__conditional_no__post__in=user_posts),
+            question__in=questions,
+        )
+        if leaderboard.start_time:
+            forecasts_during_period = forecasts_during_period.filter(
+                start_time__gte=leaderboard.start_time
             )
-            if post not in forecaster_ids_for_post:
-                forecaster_ids_for_post[post] = set()
-            forecaster_ids_for_post[post].update(forecasters)
-        contributions: list[Contribution] = []
-        for post, forecaster_ids in forecaster_ids_for_post.items():
-
-            contribution = Contribution(
-                score=len(forecaster_ids),
+        if leaderboard.end_time:
+            forecasts_during_period = forecasts_during_period.filter(
+                start_time__lte=leaderboard.end_time
+            )
+        forecaster_counts = get_post_forecaster_counts(forecasts_during_period)
+        contributions: list[Contribution] = [
+            Contribution(
+                score=forecaster_counts.get(post.id, 0),
                 post=post,
             )
-            contributions.append(contribution)
+            for post in user_posts
+        ]
         h_index = decimal_h_index([c.score / 10 for c in contributions])
         contributions = sorted(contributions, key=lambda c: c.score, reverse=True)
         return contributions[: int(h_index) + 1]
@@ -349,23 +725,23 @@ def get_contributions(
         # There are so many questions in global leaderboards that we don't
         # need to make unpopulated contributions for questions that have not
         # been resolved.
-        questions = [q for q in questions if q.resolution is not None]
+        questions = questions.filter(resolution__isnull=False)
     scores = Score.objects.filter(
         question__in=questions,
         user=user,
         score_type=Leaderboard.ScoreTypes.get_base_score(leaderboard.score_type),
-    )
+    ).select_related("question")
     # User has scores on some questions
     contributions = [
         Contribution(score=s.score, coverage=s.coverage, question=s.question)
         for s in scores
     ]
     # add unpopulated contributions for other questions
-    scored_question = {score.question for score in scores}
+    scored_question_ids = {score.question_id for score in scores}
     contributions += [
         Contribution(score=None, coverage=None, question=question)
         for question in questions
-        if question not in scored_question
+        if question.id not in scored_question_ids
     ]
 
     return contributions
@@ -0,0 +1,56 @@
+from notifications.jobs import claim_notifications, job_dispatch_notification_groups
+from notifications.models import Notification
+from tests.fixtures import *  # noqa
+from tests.test_notifications.factories import factory_notification
+
+
+class TestClaimNotifications:
+    def test_skips_claimed_notifications(self, user1, user2):
+        notification = factory_notification(recipient=user1, notification_type="a")
+        factory_notification(recipient=user2, notification_type="a")
+
+        recipient_ids, claimed_ids = claim_notifications(set(), batch_size=1)
+
+        assert recipient_ids == [user1.id]
+        assert claimed_ids == [notification.id]
+        # Claimed ones are left to the dispatcher sending them
+        recipient_ids, _ = claim_notifications(set())
+        assert recipient_ids == [user2.id]
+
+
+class TestJobDispatchNotificationGroups:
+    def test_sends_groups_and_marks_them_sent(self, user1, user2, mocker):
+        def send_email_group(notifications):
+            if notifications[0].recipient == user2:
+                raise ValueError("Failed to send")
+
+        handler_cls = mocker.Mock()
+        handler_cls.send_email_group.side_effect = send_email_group
+        mocker.patch(
+            "notifications.jobs.get_notification_handler_by_type",
+            return_value=handler_cls,
+        )
+        for notification_type in ["post_new_comments", "post_new_comments", "other"]:
+            factory_notification(recipient=user1, notification_type=notification_type)
+        factory_notification(recipient=user2, notification_type="other")
+
+        job_dispatch_notification_groups()
+
+        # One email per recipient and notification type
+        assert handler_cls.send_email_group.call_count == 3
+        assert not Notification.objects.filter(recipient=user1, email_sent=False)
+        # Failed ones are released for the next run
+        failed = Notification.objects.get(recipient=user2)
+        assert failed.email_sent is False
+        assert failed.email_claimed_at is None
+
+    def test_stops_claiming_past_time_budget(self, user1, mocker):
+        mocker.patch("notifications.jobs.NOTIFICATION_DISPATCH_TIME_BUDGET", 0)
+        notification = factory_notification(recipient=user1, notification_type="a")
+
+        job_dispatch_notification_groups()
+
+        # Left unclaimed for the next run
+        notification.refresh_from_db()
+        assert notification.email_sent is False
+        assert notification.email_claimed_at is None
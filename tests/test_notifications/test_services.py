@@ -1,9 +1,18 @@
+from dataclasses import asdict
+
+from notifications.constants import MailingTags
 from notifications.models import Notification
-from notifications.services import NotificationNewComments, NotificationPostParams
+from notifications.services import (
+    NotificationNewComments,
+    NotificationPostParams,
+    NotificationPostStatusChange,
+)
+from posts.models import PostSubscription
 from tests.fixtures import *  # noqa
 from tests.test_comments.factories import factory_comment
 from tests.test_notifications.factories import factory_notification
 from tests.test_posts.factories import factory_post
+from tests.test_users.factories import factory_user
 
 
 class TestNotificationNewComments:
@@ -95,3 +104,27 @@ class TestNotificationNewComments:
 
         assert context_notifs[1]["post"]["post_id"] == post_2.pk
         assert len(context_notifs[1]["comments"]) == 2
+
+
+class TestNotificationTypeBaseSendMany:
+    def test_skips_unsubscribed_recipients(self, user1, user2):
+        user2.unsubscribed_mailing_tags = [MailingTags.FORECASTED_CP_CHANGE]
+        user2.save()
+        user3 = factory_user()
+        post = factory_post(author=user1)
+        params = NotificationPostStatusChange.ParamsType(
+            post=NotificationPostParams.from_post(post),
+            event=PostSubscription.PostStatusChange.OPEN,
+        )
+
+        NotificationPostStatusChange.send_many(
+            [user1, user2, user3],
+            {user.id: params for user in [user1, user2, user3]},
+            mailing_tag=MailingTags.FORECASTED_CP_CHANGE,
+        )
+
+        notifications = Notification.objects.filter(
+            type=NotificationPostStatusChange.type
+        )
+        assert {n.recipient_id for n in notifications} == {user1.id, user3.id}
+        assert all(n.params == asdict(params) for n in notifications)
@@ -0,0 +1,248 @@
+import datetime
+
+import pytest
+from django.utils import timezone
+
+from notifications.models import Notification
+from notifications.services import NotificationPostCPChange
+from posts.models import PostSubscription, PostUserSnapshot
+from questions.models import AggregateForecast
+from posts.services.common import (
+    compute_post_sorting_divergence_and_update_snapshots,
+    compute_posts_movement,
+)
+from posts.services.subscriptions import notify_post_cp_change
+from questions.services import build_question_forecasts
+from tests.fixtures import *  # noqa
+from tests.test_posts.factories import factory_post
+from tests.test_questions.factories import factory_forecast
+from tests.test_questions.fixtures import *  # noqa
+from tests.test_users.factories import factory_user
+from utils.the_math.community_prediction import get_aggregation_at_time
+from utils.the_math.measures import prediction_difference_for_sorting
+
+
+class TestComputePostsMovement:
+    def test_matches_recomputed_aggregations(
+        self, question_binary, question_numeric, user1
+    ):
+        post = factory_post(author=user1, question=question_binary)
+        empty_post = factory_post(author=user1, question=question_numeric)
+        now = timezone.now()
+        for days, probability_yes in [(10, 0.2), (9, 0.6), (8, 0.3), (1, 0.9)]:
+            factory_forecast(
+                question=question_binary,
+                author=factory_user(),
+                start_time=now - datetime.timedelta(days=days),
+                end_time=None,
+                probability_yes=probability_yes,
+            )
+        build_question_forecasts(question_binary)
+
+        movements = compute_posts_movement([post, empty_post])
+
+        expected = prediction_difference_for_sorting(
+            get_aggregation_at_time(question_binary, now).get_prediction_values(),
+            get_aggregation_at_time(
+                question_binary, now - datetime.timedelta(days=7)
+            ).get_prediction_values(),
+            question_binary,
+        )
+        assert movements[post.id] == pytest.approx(expected)
+        assert movements[empty_post.id] is None
+
+    def test_uses_minimized_history(self, question_binary, user1, mocker):
+        post = factory_post(author=user1, question=question_binary)
+        now = timezone.now()
+        # More timesteps than the history minimization keeps
+        for hours in range(300, 0, -1):
+            factory_forecast(
+                question=question_binary,
+                author=factory_user(),
+                start_time=now - datetime.timedelta(hours=hours),
+                end_time=None,
+                probability_yes=0.1 + (hours % 8) / 10,
+            )
+        build_question_forecasts(question_binary)
+        week_ago = now - datetime.timedelta(days=7)
+        assert (
+            AggregateForecast.objects.filter(question=question_binary).count() < 300
+        )
+        cp_previous = (
+            AggregateForecast.objects.filter(
+                question=question_binary, start_time__lte=week_ago
+            )
+            .order_by("-start_time")
+            .first()
+        )
+        cp_now = (
+            AggregateForecast.objects.filter(question=question_binary)
+            .order_by("-start_time")
+            .first()
+        )
+        recompute = mocker.patch("posts.services.common.get_aggregation_at_time")
+
+        movements = compute_posts_movement([post])
+
+        recompute.assert_not_called()
+        expected = prediction_difference_for_sorting(
+            cp_now.get_prediction_values(),
+            cp_previous.get_prediction_values(),
+            question_binary,
+        )
+        assert movements[post.id] == pytest.approx(expected)
+
+    def test_skips_withdrawn_cp(self, question_binary, user1):
+        post = factory_post(author=user1, question=question_binary)
+        now = timezone.now()
+        factory_forecast(
+            question=question_binary,
+            author=factory_user(),
+            start_time=now - datetime.timedelta(days=10),
+            end_time=now - datetime.timedelta(days=8),
+            probability_yes=0.2,
+        )
+        factory_forecast(
+            question=question_binary,
+            author=factory_user(),
+            start_time=now - datetime.timedelta(days=1),
+            end_time=None,
+            probability_yes=0.9,
+        )
+        build_question_forecasts(question_binary)
+
+        movements = compute_posts_movement([post])
+
+        assert movements[post.id] is None
+
+    def test_leaves_out_failing_posts(
+        self, question_binary, question_numeric, user1, mocker
+    ):
+        post = factory_post(author=user1, question=question_binary)
+        empty_post = factory_post(author=user1, question=question_numeric)
+        for days in [10, 1]:
+            factory_forecast(
+                question=question_binary,
+                author=factory_user(),
+                start_time=timezone.now() - datetime.timedelta(days=days),
+                end_time=None,
+                probability_yes=0.5,
+            )
+        build_question_forecasts(question_binary)
+        mocker.patch(
+            "posts.services.common.prediction_difference_for_sorting",
+            side_effect=ValueError,
+        )
+
+        movements = compute_posts_movement([post, empty_post])
+
+        assert movements == {empty_post.id: None}
+
+
+class TestComputePostSortingDivergence:
+    def test_updates_snapshots(self, question_binary, user1):
+        post = factory_post(author=user1, question=question_binary)
+        now = timezone.now()
+        forecasts = [
+            factory_forecast(
+                question=question_binary,
+                author=factory_user(),
+                start_time=now - datetime.timedelta(days=1),
+                end_time=None,
+                probability_yes=probability_yes,
+            )
+            for probability_yes in [0.2, 0.5, 0.9]
+        ]
+        for forecast in forecasts:
+            PostUserSnapshot.update_last_forecast_date(post, forecast.author)
+
+        compute_post_sorting_divergence_and_update_snapshots(post)
+
+        cp = get_aggregation_at_time(question_binary, now)
+        for forecast in forecasts:
+            assert PostUserSnapshot.objects.get(
+                post=post, user=forecast.author
+            ).divergence == pytest.approx(
+                prediction_difference_for_sorting(
+                    forecast.get_prediction_values(),
+                    cp.get_prediction_values(),
+                    question_binary,
+                )
+            )
+
+
+class TestNotifyPostCPChange:
+    def test_notifies_subscriptions_past_threshold(self, question_binary, user1):
+        post = factory_post(author=user1, question=question_binary)
+        now = timezone.now()
+        for days, probability_yes in [(3, 0.1), (2, 0.1), (1, 0.9), (0.5, 0.9)]:
+            factory_forecast(
+                question=question_binary,
+                author=factory_user(),
+                start_time=now - datetime.timedelta(days=days),
+                end_time=None,
+                probability_yes=probability_yes,
+            )
+        build_question_forecasts(question_binary)
+
+        def subscribe(days):
+            return PostSubscription.objects.create(
+                user=factory_user(),
+                post=post,
+                type=PostSubscription.SubscriptionType.CP_CHANGE,
+                cp_change_threshold=0.1,
+                last_sent_at=now - datetime.timedelta(days=days),
+            )
+
+        # Both see the CP from before the 0.9 forecasts
+        early = [subscribe(2.5), subscribe(2.5)]
+        recent = subscribe(0.1)
+
+        notify_post_cp_change(post)
+
+        notified = Notification.objects.filter(type=NotificationPostCPChange.type)
+        assert {notification.recipient_id for notification in notified} == {
+            subscription.user_id for subscription in early
+        }
+        for subscription in early:
+            subscription.refresh_from_db()
+            assert subscription.last_sent_at > now
+        recent.refresh_from_db()
+        assert recent.last_sent_at < now
+
+    def test_notifies_global_and_post_subscriptions_separately(
+        self, question_binary, user1
+    ):
+        post = factory_post(author=user1, question=question_binary)
+        now = timezone.now()
+        for days, probability_yes in [(3, 0.1), (2, 0.5), (1, 0.9), (0.5, 0.9)]:
+            factory_forecast(
+                question=question_binary,
+                author=factory_user(),
+                start_time=now - datetime.timedelta(days=days),
+                end_time=None,
+                probability_yes=probability_yes,
+            )
+        build_question_forecasts(question_binary)
+        user = factory_user()
+        for days, is_global in [(2.5, False), (1.5, True)]:
+            PostSubscription.objects.create(
+                user=user,
+                post=post,
+                type=PostSubscription.SubscriptionType.CP_CHANGE,
+                cp_change_threshold=0.1,
+                last_sent_at=now - datetime.timedelta(days=days),
+                is_global=is_global,
+            )
+
+        notify_post_cp_change(post)
+
+        notifications = Notification.objects.filter(
+            type=NotificationPostCPChange.type, recipient=user
+        )
+        # Each subscription compares the CP with the one it last saw
+        assert len(notifications) == 2
+        assert (
+            notifications[0].params["question_data"][0]["cp_change_value"]
+            != notifications[1].params["question_data"][0]["cp_change_value"]
+        )
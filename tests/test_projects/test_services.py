@@ -1,10 +1,17 @@
+import pytest
+
 from notifications.models import Notification
 from posts.models import Post
 from projects.permissions import ObjectPermission
-from projects.services import notify_project_subscriptions_post_open
+from projects.services import notify_project_subscriptions_post_open, save_project
+from questions.models import Question
+from scoring.models import Score
+from scoring.reputation import get_reputation_at_time, update_reputation_ledger
 from tests.fixtures import *  # noqa
 from tests.test_posts.factories import factory_post
 from tests.test_projects.factories import factory_project
+from tests.test_questions.factories import at_time, create_question
+from tests.test_scoring.factories import factory_score
 from tests.test_users.factories import factory_user
 
 
@@ -72,3 +79,30 @@ def test_notify_project_subscriptions_post_open__private_question(user1, user2):
             "recipient_id", flat=True
         )
     ) == {user1.pk}
+
+
+def test_save_project_follows_reputation_visibility(user1):
+    project = factory_project(default_permission=ObjectPermission.FORECASTER)
+    question = create_question(question_type=Question.QuestionType.BINARY)
+    factory_post(author=user1, question=question, default_project=project)
+    score = factory_score(
+        question=question,
+        user=user1,
+        score=10,
+        coverage=1,
+        score_type=Score.ScoreTypes.PEER,
+        edited_at=at_time(hours=2),
+    )
+    update_reputation_ledger([], [score])
+
+    project.default_permission = None
+    save_project(project)
+    assert get_reputation_at_time(user1, at_time(hours=3)).value == pytest.approx(
+        1e-6
+    )
+
+    project.default_permission = ObjectPermission.VIEWER
+    save_project(project)
+    assert get_reputation_at_time(user1, at_time(hours=3)).value == pytest.approx(
+        10 / 31
+    )
@@ -1,9 +1,18 @@
+from datetime import datetime, timedelta, timezone
+
 from django_dynamic_fixture import G
 
 from questions.models import Question, Conditional, Forecast
 from users.models import User
 from utils.dtypes import setdefaults_not_null
 
+# Reference time of the question timelines built by the factories
+BASE_TIME = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def at_time(*, days: float = 0, hours: float = 0) -> datetime:
+    return BASE_TIME + timedelta(days=days, hours=hours)
+
 
 def create_question(*, question_type: Question.QuestionType, **kwargs) -> Question:
     """
@@ -13,6 +22,23 @@ def create_question(*, question_type: Question.QuestionType, **kwargs) -> Questi
     return G(Question, **setdefaults_not_null(kwargs, type=question_type))
 
 
+def factory_resolved_binary_question(*, resolution: str, **kwargs) -> Question:
+    """
+    Binary question open from BASE_TIME, closed and resolved 10 days later
+    """
+
+    return create_question(
+        question_type=Question.QuestionType.BINARY,
+        **setdefaults_not_null(
+            kwargs,
+            open_time=at_time(),
+            actual_close_time=at_time(days=10),
+            forecast_scoring_ends=at_time(days=10),
+            resolution=resolution,
+        )
+    )
+
+
 def create_conditional(
     *,
     condition: Question = None,
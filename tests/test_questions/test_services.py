@@ -0,0 +1,177 @@
+import datetime
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from questions.models import AggregateForecast
+from questions.serializers import (
+    get_question_aggregations,
+    get_question_aggregations_cache_key,
+    invalidate_question_aggregations,
+    prefetch_questions_aggregations,
+)
+from questions.services import build_question_forecasts
+from questions.types import AggregationMethod
+from tests.fixtures import *  # noqa
+from tests.test_posts.factories import factory_post
+from tests.test_questions.factories import factory_forecast
+from tests.test_questions.fixtures import *  # noqa
+from tests.test_users.factories import factory_user
+
+
+def _dump_history(question):
+    return [
+        (
+            entry.start_time,
+            entry.end_time,
+            entry.forecast_values,
+            entry.forecaster_count,
+            entry.centers,
+            entry.histogram,
+        )
+        for entry in AggregateForecast.objects.filter(question=question).order_by(
+            "start_time"
+        )
+    ]
+
+
+class TestBuildQuestionForecasts:
+    def test_incremental_matches_full_rebuild(self, question_binary, user1):
+        factory_post(author=user1, question=question_binary)
+        users = [factory_user() for _ in range(4)]
+        t0 = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+        def forecast(user, hours, probability_yes):
+            return factory_forecast(
+                question=question_binary,
+                author=user,
+                start_time=t0 + datetime.timedelta(hours=hours),
+                end_time=None,
+                probability_yes=probability_yes,
+            )
+
+        first = forecast(users[0], 0, 0.2)
+        forecast(users[1], 1, 0.6)
+        forecast(users[2], 2, 0.4)
+        build_question_forecasts(question_binary)
+        assert len(_dump_history(question_binary)) == 3
+
+        # New forecasts end the previous ones of the same user
+        first.end_time = t0 + datetime.timedelta(hours=3)
+        first.save()
+        forecast(users[0], 3, 0.9)
+        forecast(users[3], 4, 0.7)
+
+        build_question_forecasts(question_binary)
+        incremental = _dump_history(question_binary)
+
+        build_question_forecasts(question_binary, incremental=False)
+        full = _dump_history(question_binary)
+
+        assert len(incremental) == 5
+        assert incremental == full
+        # Only the latest entry carries the histogram
+        assert [entry[5] is not None for entry in full] == [False] * 4 + [True]
+
+    def test_incremental_covers_late_commits(self, question_binary, user1):
+        factory_post(author=user1, question=question_binary)
+        users = [factory_user() for _ in range(4)]
+        t0 = timezone.now() - datetime.timedelta(minutes=5)
+
+        def forecast(user, minutes, probability_yes):
+            return factory_forecast(
+                question=question_binary,
+                author=user,
+                start_time=t0 + datetime.timedelta(minutes=minutes),
+                end_time=None,
+                probability_yes=probability_yes,
+            )
+
+        forecast(users[0], 0, 0.2)
+        forecast(users[1], 2, 0.6)
+        forecast(users[2], 4, 0.4)
+        build_question_forecasts(question_binary)
+
+        # Created before the build, but committed after it
+        forecast(users[3], 1, 0.9)
+
+        build_question_forecasts(question_binary)
+        incremental = _dump_history(question_binary)
+
+        build_question_forecasts(question_binary, incremental=False)
+        full = _dump_history(question_binary)
+
+        assert len(incremental) == 4
+        assert incremental == full
+
+    def test_caches_serialized_aggregations(self, question_binary, user1):
+        cache.clear()
+        factory_post(author=user1, question=question_binary)
+        t0 = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        for hours, probability_yes in [(0, 0.2), (1, 0.6)]:
+            factory_forecast(
+                question=question_binary,
+                author=factory_user(),
+                start_time=t0 + datetime.timedelta(hours=hours),
+                end_time=None,
+                probability_yes=probability_yes,
+            )
+
+        build_question_forecasts(question_binary)
+
+        cached = cache.get(
+            get_question_aggregations_cache_key(
+                question_binary.id, AggregationMethod.RECENCY_WEIGHTED
+            )
+        )
+        latest = AggregateForecast.objects.filter(question=question_binary).latest(
+            "start_time"
+        )
+        assert len(cached["history"]) == 2
+        assert cached["history"][0]["forecast_values"] is None
+        assert cached["latest"]["forecast_values"] == latest.forecast_values
+        assert "computed_at" not in cached["latest"]
+        assert "forecast_values_packed" not in cached["latest"]
+
+        aggregations = get_question_aggregations(question_binary)
+        assert aggregations[AggregationMethod.RECENCY_WEIGHTED] == cached
+        assert aggregations[AggregationMethod.UNWEIGHTED] == {
+            "history": [],
+            "latest": None,
+        }
+
+        # Writes outside build_question_forecasts
+        AggregateForecast.objects.filter(question=question_binary).delete()
+        assert get_question_aggregations(question_binary) == aggregations
+        invalidate_question_aggregations()
+        assert not get_question_aggregations(question_binary)[
+            AggregationMethod.RECENCY_WEIGHTED
+        ]["history"]
+
+    def test_missed_aggregations_keep_fresher_payload(self, question_binary, mocker):
+        cache.clear()
+        key = get_question_aggregations_cache_key(
+            question_binary.id, AggregationMethod.RECENCY_WEIGHTED
+        )
+        fresh = {"history": ["rebuilt"], "latest": None}
+        cache.set(key, fresh)
+        # The payload was cached by a rebuild after the reader missed it
+        mocker.patch.object(cache, "get_many", return_value={})
+
+        aggregations = get_question_aggregations(question_binary)
+
+        assert aggregations[AggregationMethod.RECENCY_WEIGHTED]["history"] == []
+        assert cache.get(key) == fresh
+
+    def test_prefetches_aggregations(self, question_binary, question_numeric, mocker):
+        cache.clear()
+        get_many = mocker.spy(cache, "get_many")
+
+        prefetch_questions_aggregations([question_binary, question_numeric])
+
+        assert get_many.call_count == 1
+        for question in [question_binary, question_numeric]:
+            assert get_question_aggregations(question)[
+                AggregationMethod.RECENCY_WEIGHTED
+            ] == {"history": [], "latest": None}
+        assert get_many.call_count == 1
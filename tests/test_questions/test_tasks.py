@@ -0,0 +1,49 @@
+from django.core.cache import cache
+
+from questions.tasks import (
+    BUILD_FORECASTS_MAX_DEFERRALS,
+    get_build_forecasts_key,
+    get_build_forecasts_metrics,
+    run_coalesced_build_question_forecasts,
+    schedule_build_question_forecasts,
+)
+
+
+class TestScheduleBuildQuestionForecasts:
+    def test_requests_are_coalesced(self, broker):
+        cache.clear()
+
+        for _ in range(3):
+            schedule_build_question_forecasts(1)
+        schedule_build_question_forecasts(2)
+
+        assert broker.queues["default.DQ"].qsize() == 2
+        metrics = get_build_forecasts_metrics()
+        assert metrics["requested"] == 4
+        assert metrics["coalesced"] == 2
+
+    def test_rebuild_is_deferred_while_another_runs(self, broker):
+        cache.clear()
+        schedule_build_question_forecasts(1)
+        cache.set(get_build_forecasts_key("running", 1), 1)
+
+        run_coalesced_build_question_forecasts(1)
+
+        assert get_build_forecasts_metrics()["deferred"] == 1
+        assert get_build_forecasts_metrics()["executed"] == 0
+        # Still scheduled, so new requests keep coalescing
+        schedule_build_question_forecasts(1)
+        assert get_build_forecasts_metrics()["coalesced"] == 1
+
+    def test_deferrals_are_bounded(self, broker):
+        cache.clear()
+        schedule_build_question_forecasts(1)
+        broker.flush_all()
+        cache.set(get_build_forecasts_key("running", 1), 1)
+
+        run_coalesced_build_question_forecasts(1, BUILD_FORECASTS_MAX_DEFERRALS)
+
+        assert broker.queues["default.DQ"].qsize() == 0
+        # No longer scheduled, so the next request queues a new rebuild
+        schedule_build_question_forecasts(1)
+        assert broker.queues["default.DQ"].qsize() == 1
@@ -0,0 +1,20 @@
+from django_dynamic_fixture import G
+
+from questions.models import Question
+from scoring.models import Score
+from utils.dtypes import setdefaults_not_null
+
+
+def factory_score(
+    *,
+    question: Question = None,
+    score: float = None,
+    score_type: Score.ScoreTypes = Score.ScoreTypes.BASELINE,
+    **kwargs
+) -> Score:
+    return G(
+        Score,
+        **setdefaults_not_null(
+            kwargs, question=question, score=score, score_type=score_type
+        )
+    )
@@ -0,0 +1,88 @@
+import pytest
+
+from questions.models import Question
+from scoring.models import Score
+from scoring.reputation import (
+    get_reputation_at_time,
+    get_reputations_at_time,
+    get_reputations_during_interval,
+    reputation_value_from_totals,
+    update_reputation_ledger,
+    update_reputation_ledger_visibility,
+)
+from tests.fixtures import *  # noqa
+from tests.test_questions.factories import at_time, create_question
+from tests.test_scoring.factories import factory_score
+from tests.test_users.factories import factory_user
+
+
+def _score(user, hours: int, score: float, coverage: float = 1) -> Score:
+    return Score(
+        user=user, edited_at=at_time(hours=hours), score=score, coverage=coverage
+    )
+
+
+class TestReputationLedger:
+    def test_ledger_lookups(self, user1):
+        user2 = factory_user()
+        update_reputation_ledger([], [_score(user1, 2, 10), _score(user2, 2, 30)])
+        update_reputation_ledger([], [_score(user1, 4, 20, 2)])
+
+        assert get_reputation_at_time(user1, at_time(hours=1)).value == pytest.approx(
+            1e-6
+        )
+        assert get_reputation_at_time(user1, at_time(hours=3)).value == pytest.approx(
+            10 / 31
+        )
+        assert [
+            reputation.value for reputation in get_reputations_at_time([user1, user2])
+        ] == pytest.approx([30 / 33, 30 / 31])
+
+        reputations = get_reputations_during_interval(
+            [user1, user2], at_time(hours=1), at_time(hours=5)
+        )
+        assert [(r.time, r.value) for r in reputations[user1]] == [
+            (at_time(hours=1), pytest.approx(1e-6)),
+            (at_time(hours=2), pytest.approx(10 / 31)),
+            (at_time(hours=4), pytest.approx(30 / 33)),
+        ]
+        assert len(reputations[user2]) == 2
+
+    def test_rescoring_moves_totals(self, user1):
+        old_score = _score(user1, 2, 10)
+        update_reputation_ledger([], [old_score, _score(user1, 4, 20)])
+
+        # Rescoring the first question later changes all totals from then on
+        update_reputation_ledger([old_score], [_score(user1, 3, -5)])
+
+        assert get_reputation_at_time(user1, at_time(hours=2)).value == pytest.approx(
+            1e-6
+        )
+        assert get_reputation_at_time(user1, at_time(hours=3)).value == pytest.approx(
+            reputation_value_from_totals(-5, 1)
+        )
+        assert get_reputation_at_time(user1, at_time(hours=5)).value == pytest.approx(
+            15 / 32
+        )
+
+    def test_visibility_changes(self, user1):
+        question = create_question(question_type=Question.QuestionType.BINARY)
+        factory_score(
+            question=question,
+            user=user1,
+            score=10,
+            coverage=1,
+            score_type=Score.ScoreTypes.PEER,
+            edited_at=at_time(hours=2),
+        )
+
+        update_reputation_ledger_visibility(set(), {question.id})
+        assert get_reputation_at_time(user1, at_time(hours=3)).value == pytest.approx(
+            10 / 31
+        )
+
+        # Moved to a private project
+        update_reputation_ledger_visibility({question.id}, set())
+        assert get_reputation_at_time(user1, at_time(hours=3)).value == pytest.approx(
+            1e-6
+        )
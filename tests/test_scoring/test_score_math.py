@@ -0,0 +1,138 @@
+import numpy as np
+
+from questions.models import Forecast
+from scoring.score_math import (
+    evaluate_forecasts_baseline_accuracy,
+    evaluate_forecasts_peer_accuracy,
+    evaluate_forecasts_peer_spot_forecast,
+    get_geometric_means,
+)
+from tests.test_questions.factories import at_time
+
+
+class TestGetGeometricMeans:
+    def test_running_geometric_means(self):
+        forecasts = [
+            Forecast(
+                start_time=at_time(), end_time=at_time(hours=2), probability_yes=0.2
+            ),
+            Forecast(start_time=at_time(hours=1), end_time=None, probability_yes=0.8),
+            Forecast(start_time=at_time(hours=2), end_time=None, probability_yes=0.5),
+        ]
+
+        geometric_means = get_geometric_means(forecasts)
+
+        assert [gm.timestamp for gm in geometric_means] == [
+            at_time().timestamp(),
+            at_time(hours=1).timestamp(),
+            at_time(hours=2).timestamp(),
+        ]
+        assert [gm.num_forecasters for gm in geometric_means] == [0, 2, 2]
+        np.testing.assert_allclose(geometric_means[0].pmf, [0.8, 0.2])
+        np.testing.assert_allclose(
+            geometric_means[1].pmf, [np.sqrt(0.8 * 0.2), np.sqrt(0.2 * 0.8)]
+        )
+        np.testing.assert_allclose(
+            geometric_means[2].pmf, [np.sqrt(0.2 * 0.5), np.sqrt(0.8 * 0.5)]
+        )
+
+    def test_zero_probability(self):
+        forecasts = [
+            Forecast(
+                start_time=at_time(),
+                end_time=at_time(hours=1),
+                probability_yes_per_category=[0.0, 1.0],
+            ),
+            Forecast(
+                start_time=at_time(),
+                end_time=None,
+                probability_yes_per_category=[0.5, 0.5],
+            ),
+        ]
+
+        geometric_means = get_geometric_means(forecasts)
+
+        np.testing.assert_allclose(geometric_means[0].pmf, [0.0, np.sqrt(0.5)])
+        np.testing.assert_allclose(geometric_means[1].pmf, [0.5, 0.5])
+
+
+class TestEvaluateForecasts:
+    def test_baseline_accuracy(self):
+        forecasts = [
+            Forecast(
+                start_time=at_time(), end_time=at_time(hours=5), probability_yes=0.8
+            ),
+            Forecast(start_time=at_time(hours=5), end_time=None, probability_yes=0.4),
+            Forecast(start_time=at_time(hours=20), end_time=None, probability_yes=0.4),
+        ]
+
+        scores = evaluate_forecasts_baseline_accuracy(
+            forecasts,
+            resolution_bucket=1,
+            forecast_horizon_start=at_time().timestamp(),
+            actual_close_time=at_time(hours=10).timestamp(),
+            forecast_horizon_end=at_time(hours=10).timestamp(),
+            question_type="binary",
+            open_bounds_count=0,
+        )
+
+        assert [s.coverage for s in scores] == [0.5, 0.5, 0]
+        np.testing.assert_allclose(
+            [s.score for s in scores],
+            [50 * np.log2(1.6), 50 * np.log2(0.8), 0],
+        )
+
+    def test_peer_accuracy(self):
+        forecasts = [
+            Forecast(start_time=at_time(), end_time=None, probability_yes=0.8),
+            Forecast(start_time=at_time(hours=5), end_time=None, probability_yes=0.2),
+        ]
+
+        scores = evaluate_forecasts_peer_accuracy(
+            forecasts,
+            None,
+            resolution_bucket=1,
+            forecast_horizon_start=at_time().timestamp(),
+            actual_close_time=at_time(hours=10).timestamp(),
+            forecast_horizon_end=at_time(hours=10).timestamp(),
+            question_type="binary",
+        )
+
+        # A lone forecaster scores 0 but still gets coverage, afterwards the
+        # peer score is measured against the geometric mean of both forecasts
+        assert [s.coverage for s in scores] == [1, 0.5]
+        np.testing.assert_allclose(
+            [s.score for s in scores],
+            [0.5 * 2 * 100 * np.log(0.8 / 0.4), 0.5 * 2 * 100 * np.log(0.2 / 0.4)],
+        )
+
+    def test_peer_spot_forecast(self):
+        forecasts = [
+            Forecast(start_time=at_time(), end_time=None, probability_yes=0.8),
+            Forecast(start_time=at_time(hours=5), end_time=None, probability_yes=0.2),
+            Forecast(
+                start_time=at_time(hours=7),
+                end_time=at_time(hours=8),
+                probability_yes=0.5,
+            ),
+        ]
+
+        def spot_scores(hours):
+            return [
+                s.score
+                for s in evaluate_forecasts_peer_spot_forecast(
+                    forecasts,
+                    None,
+                    resolution_bucket=1,
+                    spot_forecast_timestamp=at_time(hours=hours).timestamp(),
+                    question_type="binary",
+                )
+            ]
+
+        # Measured against the geometric mean of the two forecasts active then
+        np.testing.assert_allclose(
+            spot_scores(6),
+            [2 * 100 * np.log(0.8 / 0.4), 2 * 100 * np.log(0.2 / 0.4), 0],
+        )
+        # No geometric mean before the first forecast
+        assert spot_scores(-1) == [0, 0, 0]
@@ -0,0 +1,104 @@
+import pytest
+
+from questions.models import AggregateForecast, Question
+from questions.types import AggregationMethod
+from scoring.models import Score, TrackRecord
+from scoring.track_record import (
+    build_track_record,
+    get_track_record,
+    serialize_track_record,
+    update_track_record,
+)
+from scoring.user_stats import iter_rows_chunks
+from tests.fixtures import *  # noqa
+from tests.test_questions.factories import at_time, factory_resolved_binary_question
+from tests.test_scoring.factories import factory_score
+
+
+def _question_with_cp(resolution: str, probability_yes: float) -> Question:
+    question = factory_resolved_binary_question(resolution=resolution)
+    AggregateForecast.objects.create(
+        question=question,
+        method=AggregationMethod.RECENCY_WEIGHTED,
+        start_time=at_time(days=5),
+        forecast_values=[1 - probability_yes, probability_yes],
+    )
+    return question
+
+
+def _cp_score(question: Question, score: float) -> Score:
+    return factory_score(
+        question=question,
+        score=score,
+        aggregation_method=AggregationMethod.RECENCY_WEIGHTED,
+    )
+
+
+class TestTrackRecord:
+    def test_incremental_matches_full_build(self):
+        _cp_score(_question_with_cp("yes", 0.72), 30)
+        # Resolved but not scored yet
+        question = _question_with_cp("no", 0.71)
+        track_record = build_track_record()
+        assert track_record.questions_predicted == 1
+        assert track_record.calibration_weights[14] == pytest.approx(0.5)
+
+        score = _cp_score(question, -10)
+        update_track_record(question, [], [score])
+
+        track_record = TrackRecord.objects.get()
+        serialized = serialize_track_record(track_record)
+        rebuilt = serialize_track_record(build_track_record())
+        assert serialized["calibration_curve"] == rebuilt["calibration_curve"]
+        assert serialized["score_histogram"] == rebuilt["score_histogram"]
+        assert track_record.questions_predicted == 2
+        assert serialized["calibration_curve"][14][
+            "user_middle_quartile"
+        ] == pytest.approx(0.5)
+        assert len(serialized["score_scatter_plot"]) == 2
+
+    def test_first_read_is_empty(self):
+        _cp_score(_question_with_cp("yes", 0.72), 30)
+
+        track_record = get_track_record()
+
+        assert track_record.is_stale
+        assert track_record.questions_predicted == 0
+        assert serialize_track_record(track_record)["score_scatter_plot"] == []
+
+    def test_rescoring_marks_track_record_stale(self):
+        score = _cp_score(_question_with_cp("yes", 0.72), 30)
+        build_track_record()
+
+        update_track_record(score.question, [score], [score])
+
+        # The last track record is served until it gets rebuilt
+        track_record = TrackRecord.objects.get()
+        assert track_record.is_stale
+        assert track_record.questions_predicted == 1
+
+        track_record = build_track_record()
+        assert not TrackRecord.objects.get().is_stale
+        assert track_record.questions_predicted == 1
+
+    def test_build_folds_in_questions_scored_meanwhile(self, mocker):
+        _cp_score(_question_with_cp("yes", 0.72), 30)
+        build_track_record()
+
+        def score_during_build(rows):
+            # Scored while the build scans the forecasts
+            score = _cp_score(_question_with_cp("no", 0.71), -10)
+            update_track_record(score.question, [], [score])
+            return iter_rows_chunks(rows)
+
+        mocker.patch(
+            "scoring.track_record.iter_rows_chunks", side_effect=score_during_build
+        )
+        track_record = build_track_record()
+        mocker.stopall()
+
+        assert track_record.questions_predicted == 2
+        assert len(track_record.score_scatter_plot) == 2
+        rebuilt = build_track_record()
+        assert track_record.calibration_counts == rebuilt.calibration_counts
+        assert track_record.score_histogram == rebuilt.score_histogram
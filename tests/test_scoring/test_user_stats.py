@@ -0,0 +1,120 @@
+import pytest
+
+from scoring.models import UserStats
+from scoring.user_stats import (
+    build_users_stats,
+    get_user_stats,
+    serialize_user_stats,
+    update_user_stats,
+)
+from tests.fixtures import *  # noqa
+from tests.test_posts.factories import factory_post
+from tests.test_questions.factories import (
+    at_time,
+    factory_forecast,
+    factory_resolved_binary_question,
+)
+from tests.test_scoring.factories import factory_score
+
+
+class TestUserStats:
+    def test_incremental_matches_full_build(self, user1):
+        first = factory_resolved_binary_question(resolution="yes")
+        factory_post(author=user1, question=first)
+        factory_forecast(
+            question=first,
+            author=user1,
+            start_time=at_time(),
+            end_time=at_time(days=5),
+            probability_yes=0.42,
+        )
+        factory_forecast(
+            question=first,
+            author=user1,
+            start_time=at_time(days=5),
+            probability_yes=0.8,
+        )
+        factory_score(user=user1, question=first, score=50)
+        stats = get_user_stats(user1.id)
+        assert stats.questions_predicted == 1
+        assert stats.calibration_counts[8] == 1
+        assert stats.calibration_weights[16] == pytest.approx(0.5)
+
+        second = factory_resolved_binary_question(resolution="no")
+
+        factory_post(author=user1, question=second)
+        factory_forecast(
+            question=second,
+            author=user1,
+            start_time=at_time(days=2),
+            probability_yes=0.81,
+        )
+        score = factory_score(user=user1, question=second, score=-20)
+        update_user_stats(second, [], [score])
+
+        stats = UserStats.objects.get(user=user1)
+        expected = build_users_stats([user1.id])[0]
+        assert stats.questions_predicted == expected.questions_predicted == 2
+        assert stats.questions_predicted_scored == 2
+        assert stats.calibration_counts == expected.calibration_counts
+        assert stats.calibration_weights == pytest.approx(expected.calibration_weights)
+        assert stats.calibration_resolved_weights == pytest.approx(
+            expected.calibration_resolved_weights
+        )
+        assert stats.score_histogram == expected.score_histogram
+        assert sorted(stats.score_scatter_plot) == sorted(expected.score_scatter_plot)
+        assert sorted(score for score, _ in stats.score_scatter_plot) == [-20, 50]
+
+        serialized = serialize_user_stats(stats)
+        assert serialized["avg_score"] == pytest.approx(15)
+        # Both 0.8 forecasts fall into the same bin, only the first one resolved yes
+        assert serialized["calibration_curve"][16][
+            "user_middle_quartile"
+        ] == pytest.approx(0.5 / 1.3)
+
+    def test_build_between_resolution_and_scoring(self, user1):
+        question = factory_resolved_binary_question(resolution="yes")
+        factory_post(author=user1, question=question)
+        factory_forecast(
+            question=question,
+            author=user1,
+            start_time=at_time(days=1),
+            probability_yes=0.3,
+        )
+
+        # Resolved but not scored yet
+        stats = get_user_stats(user1.id)
+        assert stats.questions_predicted == 0
+        assert sum(stats.calibration_counts) == 0
+
+        score = factory_score(user=user1, question=question, score=10)
+        update_user_stats(question, [], [score])
+
+        stats = UserStats.objects.get(user=user1)
+        expected = build_users_stats([user1.id])[0]
+        assert stats.questions_predicted == expected.questions_predicted == 1
+        assert stats.questions_predicted_scored == 1
+        assert stats.calibration_counts == expected.calibration_counts
+
+    def test_rescore_refreshes_after_commit(
+        self, user1, mocker, django_capture_on_commit_callbacks
+    ):
+        question = factory_resolved_binary_question(resolution="yes")
+        factory_post(author=user1, question=question)
+        factory_forecast(
+            question=question,
+            author=user1,
+            start_time=at_time(days=1),
+            probability_yes=0.3,
+        )
+        old_score = factory_score(user=user1, question=question, score=10)
+        get_user_stats(user1.id)
+        send = mocker.patch("scoring.tasks.run_refresh_users_stats.send")
+
+        with django_capture_on_commit_callbacks(execute=True):
+            update_user_stats(question, [old_score], [old_score])
+            # The last stats are served until the refresh
+            assert UserStats.objects.get(user=user1).is_stale
+            send.assert_not_called()
+
+        send.assert_called_once_with([user1.id])
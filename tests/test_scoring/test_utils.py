@@ -0,0 +1,292 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from projects.models import Project
+from questions.models import Question
+from questions.types import AggregationMethod
+from scoring.models import Leaderboard, LeaderboardEntry, Score
+from scoring.utils import (
+    generate_project_leaderboard,
+    generate_question_writing_leaderboard_entries,
+    generate_scoring_leaderboard_entries,
+    update_post_leaderboard_questions,
+    update_project_leaderboard,
+    update_question_leaderboards,
+)
+from tests.fixtures import *  # noqa
+from tests.test_posts.factories import factory_post
+from tests.test_projects.factories import factory_project
+from tests.test_questions.factories import create_question, factory_forecast
+from tests.test_questions.fixtures import *  # noqa
+from tests.test_users.factories import factory_user
+
+
+class TestGenerateScoringLeaderboardEntries:
+    @pytest.mark.parametrize(
+        "score_type,expected_scores",
+        [
+            (Leaderboard.ScoreTypes.PEER_TOURNAMENT, [30, 10, 5]),
+            (Leaderboard.ScoreTypes.PEER_GLOBAL, [30 / 40, 10 / 30, 5 / 30]),
+            (Leaderboard.ScoreTypes.PEER_GLOBAL_LEGACY, [30 / 40, 10 / 40, 5 / 40]),
+        ],
+    )
+    def test_sums_scores_per_user(self, user1, user2, score_type, expected_scores):
+        questions = [
+            create_question(question_type=Question.QuestionType.BINARY)
+            for _ in range(2)
+        ]
+        for question, score, coverage in [
+            (questions[0], 10, 20),
+            (questions[1], 20, 20),
+        ]:
+            Score.objects.create(
+                user=user1,
+                question=question,
+                score=score,
+                coverage=coverage,
+                score_type=Score.ScoreTypes.PEER,
+            )
+        Score.objects.create(
+            user=user2,
+            question=questions[0],
+            score=10,
+            coverage=1,
+            score_type=Score.ScoreTypes.PEER,
+        )
+        Score.objects.create(
+            aggregation_method=AggregationMethod.RECENCY_WEIGHTED,
+            question=questions[1],
+            score=5,
+            coverage=1,
+            score_type=Score.ScoreTypes.PEER,
+        )
+
+        entries = generate_scoring_leaderboard_entries(
+            questions, Leaderboard(score_type=score_type)
+        )
+
+        assert [entry.score for entry in entries] == pytest.approx(expected_scores)
+        assert [entry.rank for entry in entries] == [1, 2, 3]
+        assert [entry.user_id for entry in entries] == [user1.id, user2.id, None]
+        assert entries[0].coverage == 40
+        assert entries[0].contribution_count == 2
+        assert entries[2].aggregation_method == AggregationMethod.RECENCY_WEIGHTED
+
+
+class TestUpdateProjectLeaderboard:
+    def test_upserts_entries(self, user1, user2):
+        project = factory_project(type=Project.ProjectTypes.TOURNAMENT)
+        leaderboard = Leaderboard.objects.create(
+            project=project, score_type=Leaderboard.ScoreTypes.PEER_TOURNAMENT
+        )
+        question = create_question(question_type=Question.QuestionType.BINARY)
+        factory_post(author=user1, question=question, default_project=project)
+        user1_score = Score.objects.create(
+            user=user1,
+            question=question,
+            score=10,
+            score_type=Score.ScoreTypes.PEER,
+        )
+        Score.objects.create(
+            user=user2, question=question, score=5, score_type=Score.ScoreTypes.PEER
+        )
+        stale_entry = LeaderboardEntry.objects.create(
+            leaderboard=leaderboard, user=factory_user(), score=1
+        )
+
+        update_project_leaderboard(project, leaderboard)
+        entries = {entry.user_id: entry for entry in leaderboard.entries.all()}
+        assert not LeaderboardEntry.objects.filter(pk=stale_entry.pk).exists()
+        assert entries[user1.id].rank == 1
+        assert entries[user2.id].rank == 2
+
+        user1_score.score = 1
+        user1_score.save()
+        update_project_leaderboard(project, leaderboard)
+        new_entries = {entry.user_id: entry for entry in leaderboard.entries.all()}
+
+        # Entries are updated in place
+        assert new_entries[user1.id].pk == entries[user1.id].pk
+        assert new_entries[user2.id].pk == entries[user2.id].pk
+        assert new_entries[user1.id].rank == 2
+        assert new_entries[user2.id].rank == 1
+
+
+class TestUpdateQuestionLeaderboards:
+    @pytest.mark.parametrize(
+        "score_type",
+        [Leaderboard.ScoreTypes.PEER_TOURNAMENT, Leaderboard.ScoreTypes.PEER_GLOBAL],
+    )
+    def test_incremental_matches_full_rebuild(self, user1, user2, score_type):
+        project = factory_project(type=Project.ProjectTypes.TOURNAMENT)
+        leaderboard = Leaderboard.objects.create(project=project, score_type=score_type)
+        questions = [
+            create_question(question_type=Question.QuestionType.BINARY)
+            for _ in range(2)
+        ]
+        for question in questions:
+            factory_post(author=user1, question=question, default_project=project)
+        user3 = factory_user()
+
+        def create_score(user, question, score, coverage=1):
+            return Score.objects.create(
+                user=user,
+                question=question,
+                score=score,
+                coverage=coverage,
+                score_type=Score.ScoreTypes.PEER,
+            )
+
+        create_score(user1, questions[0], 10, 20)
+        create_score(user2, questions[0], 5, 35)
+        create_score(user3, questions[0], 1)
+        old_scores = [
+            create_score(user1, questions[1], 20, 20),
+            create_score(user2, questions[1], 4),
+        ]
+        update_project_leaderboard(project, leaderboard)
+
+        # Rescoring the second question drops user1 and adds user3
+        Score.objects.filter(question=questions[1]).delete()
+        new_scores = [
+            create_score(user2, questions[1], 50, 10),
+            create_score(user3, questions[1], 3),
+        ]
+        update_question_leaderboards(
+            questions[1], Score.ScoreTypes.PEER, old_scores, new_scores
+        )
+
+        entries = {entry.user_id: entry for entry in leaderboard.entries.all()}
+        expected = generate_project_leaderboard(project, leaderboard)
+        assert len(entries) == len(expected)
+        for expected_entry in expected:
+            entry = entries[expected_entry.user_id]
+            assert entry.score == pytest.approx(expected_entry.score)
+            assert entry.coverage == pytest.approx(expected_entry.coverage)
+            assert entry.contribution_count == expected_entry.contribution_count
+            assert entry.rank == expected_entry.rank
+
+
+    def test_skips_uncomputed_leaderboards_without_project(self, user1):
+        leaderboard = Leaderboard.objects.create(
+            score_type=Leaderboard.ScoreTypes.PEER_GLOBAL
+        )
+        question = create_question(question_type=Question.QuestionType.BINARY)
+        leaderboard.questions.add(question)
+        score = Score.objects.create(
+            user=user1,
+            question=question,
+            score=10,
+            coverage=1,
+            score_type=Score.ScoreTypes.PEER,
+        )
+
+        update_question_leaderboards(question, Score.ScoreTypes.PEER, [], [score])
+
+        assert not leaderboard.entries.exists()
+
+class TestUpdatePostLeaderboardQuestions:
+    def test_tracks_projects_and_global_window(self, user1):
+        project = factory_project(type=Project.ProjectTypes.TOURNAMENT)
+        leaderboard = Leaderboard.objects.create(
+            project=project, score_type=Leaderboard.ScoreTypes.PEER_TOURNAMENT
+        )
+        global_leaderboard = Leaderboard.objects.create(
+            project=project,
+            score_type=Leaderboard.ScoreTypes.PEER_GLOBAL,
+            start_time=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            end_time=datetime(2025, 1, 1, tzinfo=timezone.utc),
+        )
+        question = create_question(
+            question_type=Question.QuestionType.BINARY,
+            open_time=datetime(2024, 2, 1, tzinfo=timezone.utc),
+            actual_close_time=datetime(2024, 6, 1, tzinfo=timezone.utc),
+        )
+        post = factory_post(author=user1, question=question)
+
+        update_post_leaderboard_questions(post)
+        assert list(leaderboard.get_questions()) == []
+
+        post.projects.add(project)
+        update_post_leaderboard_questions(post)
+        assert list(leaderboard.get_questions()) == [question]
+        assert list(global_leaderboard.get_questions()) == []
+
+        # Resolution decides the global leaderboard window
+        question.resolution_set_time = datetime(2024, 7, 1, tzinfo=timezone.utc)
+        question.set_global_leaderboard_dates()
+        question.save()
+        update_post_leaderboard_questions(post)
+        assert list(global_leaderboard.get_questions()) == [question]
+
+        post.projects.remove(project)
+        update_post_leaderboard_questions(post)
+        assert list(leaderboard.get_questions()) == []
+        assert list(global_leaderboard.get_questions()) == []
+
+
+class TestGenerateQuestionWritingLeaderboardEntries:
+    def test_counts_forecasters_per_post(self, user1, user2):
+        leaderboard = Leaderboard(
+            score_type=Leaderboard.ScoreTypes.QUESTION_WRITING,
+            start_time=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            end_time=datetime(2025, 1, 1, tzinfo=timezone.utc),
+        )
+        questions = [
+            create_question(question_type=Question.QuestionType.BINARY)
+            for _ in range(3)
+        ]
+        factory_post(author=user1, question=questions[0])
+        factory_post(author=user1, question=questions[1])
+        factory_post(author=user2, question=questions[2])
+        forecasters = [factory_user() for _ in range(3)]
+
+        def forecast(question, author, month):
+            factory_forecast(
+                question=question,
+                author=author,
+                start_time=datetime(2024, month, 1, tzinfo=timezone.utc),
+            )
+
+        for author in forecasters:
+            forecast(questions[0], author, 2)
+        # Forecasters are counted once per post
+        forecast(questions[1], forecasters[0], 2)
+        forecast(questions[1], forecasters[0], 3)
+        # Forecasts made after the question closed don't count
+        forecast(questions[2], forecasters[0], 2)
+        questions[2].actual_close_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        questions[2].save()
+
+        entries = generate_question_writing_leaderboard_entries(questions, leaderboard)
+
+        assert [entry.user_id for entry in entries] == [user1.id]
+        assert entries[0].score == pytest.approx(0.3)
+        assert entries[0].contribution_count == 2
+
+    def test_counts_forecasters_of_conditional_posts(self, user1, conditional_1):
+        leaderboard = Leaderboard(
+            score_type=Leaderboard.ScoreTypes.QUESTION_WRITING,
+            start_time=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            end_time=datetime(2025, 1, 1, tzinfo=timezone.utc),
+        )
+        factory_post(author=user1, conditional=conditional_1)
+        questions = [conditional_1.question_yes, conditional_1.question_no]
+        forecasters = [factory_user() for _ in range(2)]
+        for question, author in [
+            (questions[0], forecasters[0]),
+            (questions[1], forecasters[0]),
+            (questions[1], forecasters[1]),
+        ]:
+            factory_forecast(
+                question=question,
+                author=author,
+                start_time=datetime(2024, 2, 1, tzinfo=timezone.utc),
+            )
+
+        entries = generate_question_writing_leaderboard_entries(questions, leaderboard)
+
+        assert [entry.user_id for entry in entries] == [user1.id]
+        assert entries[0].score == pytest.approx(0.2)
+        assert entries[0].contribution_count == 1
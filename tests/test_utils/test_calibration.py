@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from utils.the_math.calibration import CalibrationBins, ScoreHistogram
+
+
+def test_calibration_bins_chunks():
+    rng = np.random.default_rng(0)
+    # include the values landing exactly on the bin edges
+    values = np.concatenate([rng.random(500), np.arange(21) / 20])
+    weights = rng.random(len(values))
+    resolutions = rng.integers(0, 2, len(values))
+
+    calibration = CalibrationBins()
+    for chunk in np.array_split(np.arange(len(values)), 7):
+        calibration.add(values[chunk], weights[chunk], resolutions[chunk])
+
+    for i, p_min in enumerate(np.arange(20) / 20):
+        in_bin = (values >= p_min) & (values < p_min + 0.05)
+        assert calibration.counts[i] == in_bin.sum()
+        assert calibration.weights[i] == pytest.approx(weights[in_bin].sum())
+        assert calibration.resolved_weights[i] == pytest.approx(
+            (weights * resolutions)[in_bin].sum()
+        )
+
+    curve = calibration.get_curve()
+    assert len(curve) == 20
+    in_bin = (values >= 0.5) & (values < 0.55)
+    assert curve[10]["user_middle_quartile"] == pytest.approx(
+        np.average(resolutions[in_bin], weights=weights[in_bin])
+    )
+    assert curve[10]["perfect_calibration"] == pytest.approx(0.55)
+    assert (
+        curve[10]["user_lower_quartile"]
+        < curve[10]["perfect_calibration"]
+        < curve[10]["user_upper_quartile"]
+    )
+
+    restored = CalibrationBins(
+        counts=calibration.counts.tolist(),
+        weights=calibration.weights.tolist(),
+        resolved_weights=calibration.resolved_weights.tolist(),
+    )
+    assert restored.get_curve() == curve
+
+
+def test_calibration_bins_empty():
+    curve = CalibrationBins().get_curve()
+    assert all(point["user_middle_quartile"] is None for point in curve)
+
+
+def test_score_histogram():
+    scores = [-800, -700, -631, -630, 0, 1.5, 699.9, 700, 900]
+    histogram = ScoreHistogram()
+    histogram.add(scores[:4])
+    histogram.add(scores[4:])
+
+    for bin_start, count in zip(range(-700, 700, 70), histogram.counts):
+        assert count == len(
+            [s for s in scores if s >= bin_start and s < bin_start + 70]
+        )
+
+    result = histogram.get_histogram(total=len(scores))
+    assert result[0] == {"bin_start": -700, "bin_end": -630, "pct_scores": 2 / 9}
+    assert ScoreHistogram().get_histogram(total=0)[0]["pct_scores"] == 0
@@ -0,0 +1,60 @@
+import numpy as np
+
+from questions.models import Forecast
+from tests.test_questions.factories import at_time
+from utils.the_math.community_prediction import ForecastsSweep
+
+
+class TestForecastsSweep:
+    def test_active_rows(self):
+        forecasts = [
+            Forecast(
+                start_time=at_time(), end_time=at_time(hours=2), probability_yes=0.1
+            ),
+            Forecast(start_time=at_time(hours=1), end_time=None, probability_yes=0.2),
+            Forecast(
+                start_time=at_time(hours=2),
+                end_time=at_time(hours=3),
+                probability_yes=0.3,
+            ),
+            Forecast(start_time=at_time(hours=5), end_time=None, probability_yes=0.4),
+        ]
+        sweep = ForecastsSweep.from_forecasts(forecasts)
+
+        assert sweep.values.shape == (4, 2)
+        assert sweep.timesteps == [
+            at_time(),
+            at_time(hours=1),
+            at_time(hours=2),
+            at_time(hours=3),
+            at_time(hours=5),
+        ]
+        np.testing.assert_array_equal(sweep.active_counts(), [1, 2, 2, 1, 2])
+
+        active = [
+            (sweep.timesteps[i], rows.tolist()) for i, rows in sweep.iter_active_rows()
+        ]
+        assert active == [
+            (at_time(), [0]),
+            (at_time(hours=1), [0, 1]),
+            (at_time(hours=2), [1, 2]),
+            (at_time(hours=3), [1]),
+            (at_time(hours=5), [1, 3]),
+        ]
+        for i, rows in sweep.iter_active_rows():
+            np.testing.assert_array_equal(sweep.active_rows_at(i), rows)
+
+    def test_gap_without_active_forecasts(self):
+        forecasts = [
+            Forecast(
+                start_time=at_time(), end_time=at_time(hours=1), probability_yes=0.1
+            ),
+            Forecast(start_time=at_time(hours=2), end_time=None, probability_yes=0.2),
+        ]
+        sweep = ForecastsSweep.from_forecasts(forecasts)
+
+        assert [sweep.timesteps[i] for i in sweep.active_timestep_indexes()] == [
+            at_time(),
+            at_time(hours=2),
+        ]
+        assert [i for i, _ in sweep.iter_active_rows()] == [0, 2]
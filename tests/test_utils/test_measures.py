@@ -1,7 +1,17 @@
 import numpy as np
 import pytest
 
-from utils.the_math.measures import weighted_percentile_2d
+from questions.models import Question
+from utils.the_math.measures import (
+    SortedForecastsValues,
+    decimal_h_index,
+    decimal_h_indexes,
+    percent_point_function,
+    percent_point_functions,
+    prediction_difference_for_sorting,
+    prediction_differences_for_sorting,
+    weighted_percentile_2d,
+)
 
 
 @pytest.mark.parametrize(
@@ -66,3 +76,103 @@ def test_weighted_percentile_2d(values, weights, percentile, expected_result):
     if weights is None and percentile == 50.0:  # should behave like np.median
         numpy_medians = np.median(values, axis=0)
         np.testing.assert_allclose(result, numpy_medians)
+
+
+def test_weighted_percentile_2d_many_percentiles():
+    rng = np.random.default_rng(0)
+    values = rng.random((20, 3))
+    weights = rng.random(20)
+    percentiles = [10.0, 25.0, 50.0, 75.0, 90.0]
+
+    result = weighted_percentile_2d(values, weights=weights, percentiles=percentiles)
+
+    assert result.shape == (5, 3)
+    for percentile, row in zip(percentiles, result):
+        np.testing.assert_array_equal(
+            row,
+            weighted_percentile_2d(values, weights=weights, percentiles=[percentile])[
+                0
+            ],
+        )
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_sorted_forecasts_values(weighted):
+    rng = np.random.default_rng(1)
+    # rounded so that values have ties
+    values = np.round(rng.random((12, 3)), 1)
+    weights_by_row = rng.random(12) if weighted else None
+    percentiles = [25.0, 50.0, 75.0]
+
+    # grows past its initial capacity
+    sorted_values = SortedForecastsValues(3, capacity=4)
+    for row in range(12):
+        sorted_values.add(row, values[row])
+    for row in [0, 5, 11]:
+        sorted_values.remove(row)
+
+    active = [1, 2, 3, 4, 6, 7, 8, 9, 10]
+    np.testing.assert_array_equal(
+        sorted_values.sorted_values, np.sort(values[active], axis=0)
+    )
+    np.testing.assert_array_equal(
+        sorted_values.weighted_percentiles(percentiles, weights_by_row),
+        weighted_percentile_2d(
+            values[active],
+            weights=weights_by_row[active] if weighted else None,
+            percentiles=percentiles,
+        ),
+    )
+
+
+def test_decimal_h_indexes():
+    rng = np.random.default_rng(0)
+    groups = rng.integers(0, 10, 300)
+    scores = rng.integers(0, 300, 300) / 10
+
+    unique_groups, h_indexes = decimal_h_indexes(groups, scores)
+
+    assert unique_groups.tolist() == sorted(set(groups.tolist()))
+    for group, h_index in zip(unique_groups, h_indexes):
+        assert h_index == decimal_h_index(scores[groups == group].tolist())
+
+
+@pytest.mark.parametrize(
+    "question_type, size",
+    [("binary", 2), ("multiple_choice", 4), ("numeric", 201)],
+)
+def test_prediction_differences_for_sorting(question_type, size):
+    rng = np.random.default_rng(0)
+    question = Question(type=question_type)
+    if question_type == "numeric":
+        forecasts_values = np.sort(rng.random((20, size)), axis=1) * 0.9 + 0.05
+    else:
+        forecasts_values = rng.dirichlet(np.ones(size), 20)
+    cp = forecasts_values[0]
+
+    differences = prediction_differences_for_sorting(forecasts_values, cp, question)
+
+    assert differences[0] == 0
+    for values, difference in zip(forecasts_values, differences):
+        assert difference == pytest.approx(
+            prediction_difference_for_sorting(values, cp, question)
+        )
+
+
+def test_percent_point_functions():
+    cdfs = [
+        np.linspace(0.1, 0.9, 201),
+        # steeper second half, reaching 0.75 exactly at index 150
+        np.concatenate([np.linspace(0, 0.5, 101), np.linspace(0.5, 1, 101)[1:]]),
+    ]
+
+    ppf_values = percent_point_functions(cdfs, [5, 10, 30, 50, 75, 95])
+
+    np.testing.assert_allclose(
+        ppf_values,
+        [
+            [0.0, 0.0, 0.25, 0.5, 0.8125, 1.0],
+            [0.05, 0.1, 0.3, 0.5, 0.75, 0.95],
+        ],
+    )
+    assert percent_point_function(cdfs[0], 30) == pytest.approx(0.25)
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from django.test import override_settings
+
+from questions.models import AggregateForecast, Forecast
+from utils.models import PackedFloatArrayField
+
+
+@pytest.mark.parametrize(
+    "dtype,tolerance", [("float64", 0), ("float32", 1e-7), ("uint16", 1e-5)]
+)
+def test_packed_float_array_roundtrip(dtype, tolerance):
+    values = np.linspace(0.001, 0.999, 201)
+
+    unpacked = PackedFloatArrayField.unpack(
+        memoryview(PackedFloatArrayField.pack(values, dtype))
+    )
+
+    assert unpacked.dtype == np.float64
+    np.testing.assert_allclose(unpacked, values, rtol=0, atol=tolerance)
+
+
+def test_apply_values_storage():
+    cdf = np.linspace(0.001, 0.999, 201).tolist()
+    forecast = Forecast(continuous_cdf=cdf)
+    binary_aggregate = AggregateForecast(forecast_values=[0.4, 0.6])
+
+    with override_settings(FORECAST_VALUES_PACKING="float32"):
+        assert forecast.apply_values_storage()
+        assert not binary_aggregate.apply_values_storage()
+    assert forecast.continuous_cdf is None
+    assert forecast.get_cdf() == cdf
+    assert binary_aggregate.get_prediction_values() == [0.4, 0.6]
+
+    forecast.continuous_cdf_packed = np.array(cdf)
+    with override_settings(FORECAST_VALUES_PACKING=None):
+        assert forecast.apply_values_storage()
+    assert forecast.continuous_cdf_packed is None
+    assert forecast.continuous_cdf == cdf
@@ -1,6 +1,5 @@
 from datetime import timedelta
 
-import numpy as np
 from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.decorators import api_view, permission_classes
@@ -10,12 +9,11 @@ from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import AllowAny
 from rest_framework.request import Request
 from rest_framework.response import Response
-import scipy
 
 from comments.models import Comment
 from posts.models import Post
 from questions.models import Forecast
-from scoring.models import Score
+from scoring.user_stats import get_user_stats, serialize_user_stats
 from .models import User
 from .serializers import (
     UserPrivateSerializer,
@@ -30,125 +28,22 @@ from .services import get_users, user_unsubscribe_tags
 def get_serialized_user(request, user, Serializer):
     ser = Serializer(user).data
 
-    forecasts = (
-        Forecast.objects.filter(
-            author=user,
-            question__type="binary",
-            question__resolution__in=["no", "yes"],
-        )
-        .prefetch_related("question")
-        .all()
-    )
-
     ser["nr_forecasts"] = Forecast.objects.filter(author=user).count()
     ser["nr_comments"] = Comment.objects.filter(author=user).count()
-    values = []
-    weights = []
-    resolutions = []
-    scores = []
-    questions_predicted = []
-    questions_predicted_socred = []
-    all_score_objs = Score.objects.filter(
-        user=user, score_type=Score.ScoreTypes.BASELINE
-    ).all()
-
-    question_score_map = {score.question_id: score for score in all_score_objs}
-
-    for forecast in forecasts:
-        question = forecast.question
-        if question.id not in questions_predicted:
-            questions_predicted.append(question.id)
-            if score := question_score_map.get(question.id):
-                scores.append(score.score)
-                questions_predicted_socred.append(question.id)
-
-        forecast_horizon_start = question.open_time.timestamp()
-        actual_close_time = question.forecast_scoring_ends.timestamp()
-        forecast_horizon_end = question.actual_close_time.timestamp()
-        forecast_start = max(forecast_horizon_start, forecast.start_time.timestamp())
-        if forecast.end_time:
-            forecast_end = min(actual_close_time, forecast.end_time.timestamp())
-        else:
-            forecast_end = actual_close_time
-        forecast_duration = forecast_end - forecast_start
-        question_duration = forecast_horizon_end - forecast_horizon_start
-        weight = forecast_duration / question_duration
-        values.append(forecast.probability_yes)
-        weights.append(weight)
-        resolutions.append(int(question.resolution == "yes"))
-
-    avg_score = np.average(scores)
-    ser["avg_score"] = None if np.isnan(avg_score) else avg_score
-    ser["questions_predicted_scored"] = len(questions_predicted_socred)
-    ser["questions_predicted"] = len(questions_predicted)
+    stats = get_user_stats(user.id)
+    ser.update(serialize_user_stats(stats))
     ser["question_authored"] = Post.objects.filter(
         author=user, notebook__isnull=True
     ).count()
     ser["notebooks_authored"] = Post.objects.filter(
         author=user, notebook__isnull=False
     ).count()
-    ser["comments_authored"] = Comment.objects.filter(author=user).count()
-
-    calibration_curve = []
-    for p_min, p_max in [(x / 20, x / 20 + 0.05) for x in range(20)]:
-        res = []
-        ws = []
-        bin_center = p_min + 0.05
-        for value, weight, resolution in zip(values, weights, resolutions):
-            if p_min <= value < p_max:
-                res.append(resolution)
-                ws.append(weight)
-        if res:
-            user_middle_quartile = np.average(res, weights=ws)
-        else:
-            user_middle_quartile = None
-        user_lower_quartile = scipy.stats.binom.ppf(
-            0.05, max([len(res), 1]), bin_center
-        ) / max([len(res), 1])
-        user_upper_quartile = scipy.stats.binom.ppf(
-            0.95, max([len(res), 1]), bin_center
-        ) / max([len(res), 1])
-
-        print(user_upper_quartile, user_lower_quartile, bin_center)
-        calibration_curve.append(
-            {
-                "user_lower_quartile": user_lower_quartile,
-                "user_middle_quartile": user_middle_quartile,
-                "user_upper_quartile": user_upper_quartile,
-                "perfect_calibration": bin_center,
-            }
-        )
-
-    ser["calibration_curve"] = calibration_curve
-    ser["score_histogram"] = [
-        {"x_start": 0, "x_end": 0.2, "y": 0.7},
-        {"x_start": 0.2, "x_end": 0.4, "y": 0.1},
-        {"x_start": 0.4, "x_end": 0.6, "y": 0.05},
-        {"x_start": 0.6, "x_end": 0.8, "y": 0.03},
-        {"x_start": 0.8, "x_end": 1, "y": 0.02},
-    ]
+    ser["comments_authored"] = ser["nr_comments"]
 
-    ser["score_scatter_plot"] = []
-    for score in all_score_objs:
-        ser["score_scatter_plot"].append(
-            {
-                "score": score.score,
-                "score_timestamp": score.created_at.timestamp(),
-            }
-        )
-    ser["score_histogram"] = []
-    bin_incr = 70
-    for bin_start in range(-700, 700, bin_incr):
-        bin_end = bin_start + bin_incr
-        ser["score_histogram"].append(
-            {
-                "bin_start": bin_start,
-                "bin_end": bin_end,
-                "pct_scores": len([s for s in scores if s >= bin_start and s < bin_end])
-                / len(scores),
-            }
-        )
-    print(ser["score_histogram"])
+    ser["score_scatter_plot"] = [
+        {"score": score, "score_timestamp": timestamp}
+        for score, timestamp in stats.score_scatter_plot
+    ]
     return ser
 
 
@@ -1,7 +1,14 @@
+from base64 import b64decode, b64encode
+
+import numpy as np
+from django.conf import settings
+from django.contrib.postgres.indexes import OpClass
 from django.core.validators import RegexValidator
 from django.db import models
 from django.db.models import F
+from django.db.models.functions import Cast
 from django.utils import timezone
+from pgvector.django import CosineDistance, HalfVectorField, HnswIndex
 
 from django.utils.translation import gettext_lazy as _
 
@@ -19,6 +26,77 @@ class TimeStampedModel(models.Model):
         abstract = True
 
 
+class PackedFloatArrayField(models.BinaryField):
+    """
+    Stores a 1-d float array as a bytea blob and loads it back as a read-only
+    numpy array with np.frombuffer, skipping the float[] parsing.
+
+    Values are packed with settings.FORECAST_VALUES_PACKING:
+        - float64: lossless
+        - float32: ~7 significant digits, half the size
+        - uint16: quantized to steps of 1/65535, for values within [0, 1]
+    The dtype is stored in a header, so blobs of different modes can coexist.
+    float64 blobs are used without copying, the other modes are widened on load.
+    """
+
+    HEADER_SIZE = 8  # keeps the values 8-bytes aligned
+    DTYPES = {
+        "float64": (b"d", np.dtype("<f8")),
+        "float32": (b"f", np.dtype("<f4")),
+        "uint16": (b"H", np.dtype("<u2")),
+    }
+    QUANTIZATION_SCALE = 65535
+
+    @classmethod
+    def pack(cls, values, dtype: str) -> bytes:
+        code, np_dtype = cls.DTYPES[dtype]
+        values = np.asarray(values, dtype=float)
+        if dtype == "uint16":
+            values = np.rint(np.clip(values, 0, 1) * cls.QUANTIZATION_SCALE)
+        return code.ljust(cls.HEADER_SIZE, b"\0") + values.astype(np_dtype).tobytes()
+
+    @classmethod
+    def unpack(cls, blob: bytes | memoryview) -> np.ndarray:
+        code = bytes(blob[:1])
+        for dtype_code, np_dtype in cls.DTYPES.values():
+            if code == dtype_code:
+                break
+        else:
+            raise ValueError(f"Unknown packed array dtype {code!r}")
+
+        values = np.frombuffer(blob, dtype=np_dtype, offset=cls.HEADER_SIZE)
+        if code == b"H":
+            return values / cls.QUANTIZATION_SCALE
+        if np_dtype != np.float64:
+            return values.astype(np.float64)
+        return values
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return self.unpack(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, np.ndarray):
+            return value
+        if isinstance(value, str):
+            return self.unpack(b64decode(value.encode("ascii")))
+        if isinstance(value, (bytes, memoryview)):
+            return self.unpack(value)
+        return np.asarray(value, dtype=float)
+
+    def value_to_string(self, obj):
+        value = self.value_from_object(obj)
+        if value is None:
+            return value
+        return b64encode(self.pack(value, "float64")).decode("ascii")
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if value is not None and not isinstance(value, (bytes, memoryview)):
+            value = self.pack(value, settings.FORECAST_VALUES_PACKING or "float64")
+        return super().get_db_prep_value(value, connection, prepared)
+
+
 validate_alpha_slug = RegexValidator(
     r"^[-a-zA-Z0-9_]*[a-zA-Z][-a-zA-Z0-9_]*\Z",
     _(
@@ -41,3 +119,34 @@ def build_order_by(value: str, is_desc: bool):
 
 class ArrayLength(models.Func):
     function = "CARDINALITY"
+
+
+# Dimensions of the embedding vectors of utils.openai.EMBEDDING_MODEL
+EMBEDDING_DIMENSIONS = 3072
+
+
+def embedding_halfvec(field_name: str) -> Cast:
+    """
+    pgvector can't index vectors of more than 2000 dimensions,
+    so embeddings are indexed and searched as half precision vectors
+    """
+
+    return Cast(field_name, HalfVectorField(dimensions=EMBEDDING_DIMENSIONS))
+
+
+def embedding_distance(field_name: str, vector) -> CosineDistance:
+    """
+    Cosine distance to the vector, served by the HNSW index of the field
+    when ordered ascending and limited
+    """
+
+    return CosineDistance(embedding_halfvec(field_name), vector)
+
+
+def embedding_hnsw_index(field_name: str, name: str) -> HnswIndex:
+    return HnswIndex(
+        OpClass(embedding_halfvec(field_name), name="halfvec_cosine_ops"),
+        name=name,
+        m=16,
+        ef_construction=64,
+    )
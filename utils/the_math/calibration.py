@@ -0,0 +1,141 @@
+from functools import lru_cache
+
+import numpy as np
+import scipy
+
+
+def get_forecast_weights(
+    start_times: np.ndarray,
+    end_times: np.ndarray,
+    open_times: np.ndarray,
+    scoring_end_times: np.ndarray,
+    close_times: np.ndarray,
+) -> np.ndarray:
+    """
+    Share of the question lifetime covered by each forecast.
+    All arguments are timestamps, with nan end_times for forecasts still active.
+    Forecasts on questions missing their open or close time weigh 0
+    """
+    forecast_starts = np.maximum(open_times, start_times)
+    forecast_ends = np.where(
+        np.isnan(end_times), scoring_end_times, np.fmin(scoring_end_times, end_times)
+    )
+    weights = (forecast_ends - forecast_starts) / (close_times - open_times)
+    return np.nan_to_num(weights, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+# Counts are user dependent, so the cache is bounded for long-running workers
+@lru_cache(maxsize=4096)
+def binomial_band(count: int, p: float) -> tuple[float, float]:
+    """90% interval of the share of successes among `count` trials of probability p"""
+    count = max(count, 1)
+    return (
+        scipy.stats.binom.ppf(0.05, count, p) / count,
+        scipy.stats.binom.ppf(0.95, count, p) / count,
+    )
+
+
+class CalibrationBins:
+    """
+    Weighted calibration of binary forecasts, accumulated over chunks of them.
+    Bin i holds the probabilities in [i / n_bins, i / n_bins + 1 / n_bins)
+    """
+
+    def __init__(
+        self,
+        n_bins: int = 20,
+        counts: list[int] | None = None,
+        weights: list[float] | None = None,
+        resolved_weights: list[float] | None = None,
+    ):
+        self.n_bins = n_bins
+        self.p_mins = np.arange(n_bins) / n_bins
+        self.p_maxs = self.p_mins + 1 / n_bins
+        self.counts = np.zeros(n_bins, dtype=int)
+        self.weights = np.zeros(n_bins)
+        self.resolved_weights = np.zeros(n_bins)
+        if counts:
+            self.counts += counts
+            self.weights += weights
+            self.resolved_weights += resolved_weights
+
+    def add(self, values: np.ndarray, weights: np.ndarray, resolutions: np.ndarray):
+        """
+        values: (n,) forecasted probabilities
+        weights: (n,) weights of the forecasts
+        resolutions: (n,) 1 for the forecasts resolving yes, 0 otherwise
+        """
+        values = np.asarray(values, dtype=float)
+        weights = np.asarray(weights, dtype=float)
+        resolved_weights = weights * np.asarray(resolutions)
+        bins = np.digitize(values, self.p_mins) - 1
+        valid = bins >= 0
+        # p_mins + 1 / n_bins is not exactly the next p_min, so some values
+        # land in the previous bin too, and some in none at all
+        for offset in (0, 1):
+            in_bin = valid & (bins >= offset)
+            in_bin[in_bin] &= values[in_bin] < self.p_maxs[bins[in_bin] - offset]
+            bin_indexes = bins[in_bin] - offset
+            self.counts += np.bincount(bin_indexes, minlength=self.n_bins)
+            self.weights += np.bincount(
+                bin_indexes, weights=weights[in_bin], minlength=self.n_bins
+            )
+            self.resolved_weights += np.bincount(
+                bin_indexes, weights=resolved_weights[in_bin], minlength=self.n_bins
+            )
+
+    def get_curve(self) -> list[dict]:
+        curve = []
+        for p_min, count, weight, resolved_weight in zip(
+            self.p_mins, self.counts, self.weights, self.resolved_weights
+        ):
+            bin_center = float(p_min + 1 / self.n_bins)
+            lower, upper = binomial_band(int(count), bin_center)
+            curve.append(
+                {
+                    "user_lower_quartile": lower,
+                    "user_middle_quartile": (
+                        float(resolved_weight / weight) if count and weight else None
+                    ),
+                    "user_upper_quartile": upper,
+                    "perfect_calibration": bin_center,
+                }
+            )
+        return curve
+
+
+class ScoreHistogram:
+    """
+    Score counts of n_bins bins of bin_width from start, accumulated over
+    chunks of scores. Scores out of range are ignored
+    """
+
+    def __init__(
+        self,
+        start: float = -700,
+        bin_width: float = 70,
+        n_bins: int = 20,
+        counts: list[int] | None = None,
+    ):
+        self.edges = start + np.arange(n_bins + 1) * bin_width
+        self.counts = np.zeros(n_bins, dtype=int)
+        if counts:
+            self.counts += counts
+
+    def add(self, scores: np.ndarray):
+        bins = np.digitize(np.asarray(scores, dtype=float), self.edges) - 1
+        bins = bins[(bins >= 0) & (bins < len(self.counts))]
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+
+    def get_histogram(self, total: int) -> list[dict]:
+        """Share of `total` scores falling in each bin"""
+        return [
+            {
+                "bin_start": bin_start,
+                "bin_end": bin_end,
+                "pct_scores": count / total if total else 0,
+            }
+            for bin_start, bin_end, count in zip(
+                self.edges[:-1].tolist(), self.edges[1:].tolist(), self.counts.tolist()
+            )
+        ]
@@ -1,7 +1,7 @@
 """
 Ftr, the general shape of the aggregation is:
 Everytime a new prediction is made, take the latest prediction of each user.
-For each of those users, compute a reputation weight and a recency weight, 
+For each of those users, compute a reputation weight and a recency weight,
 then combine them to get a weight for the user's prediction.
 Transform the predictions to logodds.
 For each possible outcome, take the weighted average of all user-prediction logodds.
@@ -9,17 +9,20 @@ Transform back to probabilities.
 Normalise to 1 over all outcomes.
 """
 
-from bisect import bisect_left, bisect_right
-from collections import defaultdict
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Iterator, Sequence
 
 import numpy as np
-from django.db.models import Q
+from django.db.models import Q, QuerySet
 
-from questions.models import Question, AggregateForecast
+from questions.models import Question, Forecast, AggregateForecast
 from questions.types import AggregationMethod
-from utils.the_math.measures import weighted_percentile_2d, percent_point_function
+from utils.the_math.measures import (
+    SortedForecastsValues,
+    percent_point_function,
+    weighted_percentile_2d,
+)
 from utils.typing import (
     ForecastValues,
     ForecastsValues,
@@ -27,6 +30,10 @@ from utils.typing import (
     Percentiles,
 )
 
+# Upper bound of the time between the creation of a forecast and the commit of
+# its transaction, bounded by the request timeouts
+FORECAST_COMMIT_MAX_DELAY = timedelta(minutes=10)
+
 
 def get_histogram(values: ForecastValues, weights: Weights | None) -> np.ndarray:
     histogram = np.zeros(100)
@@ -76,13 +83,17 @@ def calculate_aggregation_entry(
     weights: Weights,
     include_stats: bool = False,
     histogram: bool = False,
+    quartiles: ForecastsValues | None = None,
 ) -> AggregateForecast:
+    """quartiles: the [25, 50, 75] weighted percentiles of a discrete forecast_set,
+    when already computed"""
     if question_type in ["binary", "multiple_choice"]:
-        aggregation = AggregateForecast(
-            forecast_values=compute_discrete_forecast_values(
-                forecast_set.forecasts_values, weights, 50.0
-            )[0]
-        )
+        # the median is the center of the quartiles, compute all of them at once
+        if quartiles is None:
+            quartiles = compute_discrete_forecast_values(
+                forecast_set.forecasts_values, weights, [25.0, 50.0, 75.0]
+            )
+        aggregation = AggregateForecast(forecast_values=quartiles[1])
     else:
         aggregation = AggregateForecast(
             forecast_values=compute_cp_continuous(
@@ -93,9 +104,7 @@ def calculate_aggregation_entry(
         aggregation.start_time = forecast_set.timestep
         aggregation.forecaster_count = len(forecast_set.forecasts_values)
         if question_type in ["binary", "multiple_choice"]:
-            lowers, centers, uppers = compute_discrete_forecast_values(
-                forecast_set.forecasts_values, weights, [25.0, 50.0, 75.0]
-            )
+            lowers, centers, uppers = quartiles
         else:
             lowers, centers, uppers = percent_point_function(
                 aggregation.forecast_values, [25.0, 50.0, 75.0]
@@ -117,19 +126,27 @@ def calculate_aggregation_entry(
     return aggregation
 
 
+def get_active_forecasts(question: Question, time: datetime) -> QuerySet[Forecast]:
+    return question.user_forecasts.filter(
+        Q(end_time__isnull=True) | Q(end_time__gt=time), start_time__lte=time
+    ).order_by("start_time")
+
+
 def get_aggregation_at_time(
     question: Question,
     time: datetime,
     include_stats: bool = False,
     histogram: bool = False,
     aggregation_method: AggregationMethod = AggregationMethod.RECENCY_WEIGHTED,
+    forecasts: list[Forecast] | None = None,
 ) -> AggregateForecast | None:
     """set include_stats to True if you want to include num_forecasters, q1s, medians,
-    and q3s"""
-    forecasts = question.user_forecasts.filter(
-        Q(end_time__isnull=True) | Q(end_time__gt=time), start_time__lte=time
-    ).order_by("start_time")
-    if forecasts.count() == 0:
+    and q3s
+    forecasts: the forecasts active at time ordered by start_time, when already
+    fetched"""
+    if forecasts is None:
+        forecasts = list(get_active_forecasts(question, time))
+    if not forecasts:
         return None
     forecast_set = ForecastSet(
         [forecast.get_prediction_values() for forecast in forecasts],
@@ -146,35 +163,125 @@ def get_aggregation_at_time(
     return aggregation_entry
 
 
-def filter_between_dates(timestamps, start_time, end_time=None):
-    # Use bisect to find the start & end indexes
-    start_index = bisect_left(timestamps, start_time)
-    end_index = bisect_right(timestamps, end_time) - 1 if end_time else len(timestamps)
-
-    return timestamps[start_index:end_index]
-
+@dataclass
+class ForecastsSweep:
+    """
+    Sweep-line view over all the forecasts of a question.
+
+    The forecasts' values are stacked in a single (n_forecasts, n_values) array.
+    Row i is active for the timesteps
+    timesteps[start_indexes[i]] <= t < timesteps[end_indexes[i]]
+    (end_indexes[i] == len(timesteps) when the forecast never ended).
+    """
+
+    values: np.ndarray
+    timesteps: list[datetime]
+    start_indexes: np.ndarray
+    end_indexes: np.ndarray
+
+    @classmethod
+    def from_forecasts(
+        cls, forecasts: Sequence[Forecast], values: np.ndarray | None = None
+    ) -> "ForecastsSweep":
+        """values defaults to the stacked prediction values of the forecasts.
+        Rows keep the order of forecasts: order them by start_time for the
+        active rows to be in start_time order"""
+        if values is None:
+            values = np.array(
+                [forecast.get_prediction_values() for forecast in forecasts],
+                dtype=float,
+            )
+        timesteps = set()
+        for forecast in forecasts:
+            timesteps.add(forecast.start_time)
+            if forecast.end_time:
+                timesteps.add(forecast.end_time)
+        timesteps = sorted(timesteps)
+        timestep_indexes = {timestep: i for i, timestep in enumerate(timesteps)}
+        start_indexes = np.array(
+            [timestep_indexes[forecast.start_time] for forecast in forecasts],
+            dtype=int,
+        )
+        end_indexes = np.array(
+            [
+                (
+                    timestep_indexes[forecast.end_time]
+                    if forecast.end_time
+                    else len(timesteps)
+                )
+                for forecast in forecasts
+            ],
+            dtype=int,
+        )
+        return cls(values, timesteps, start_indexes, end_indexes)
 
-def get_user_forecast_history(question: Question) -> list[ForecastSet]:
-    forecasts = question.user_forecasts.order_by("start_time").all()
-    timestamps = set()
-    for forecast in forecasts:
-        timestamps.add(forecast.start_time)
-        if forecast.end_time:
-            timestamps.add(forecast.end_time)
+    def active_counts(self) -> np.ndarray:
+        """number of active forecasts at each timestep"""
+        size = len(self.timesteps) + 1
+        changes = np.bincount(self.start_indexes, minlength=size) - np.bincount(
+            self.end_indexes, minlength=size
+        )
+        return np.cumsum(changes)[:-1]
 
-    timestamps = sorted(timestamps)
-    output = defaultdict(list)
+    def active_timestep_indexes(self) -> np.ndarray:
+        """indexes of the timesteps with at least one active forecast"""
+        return np.flatnonzero(self.active_counts() > 0)
 
-    for forecast in forecasts:
-        # Find active timestamps
-        forecast_timestamps = filter_between_dates(
-            timestamps, forecast.start_time, forecast.end_time
+    def active_rows_at(self, timestep_index: int) -> np.ndarray:
+        """row indexes (in start_time order) of the forecasts active at a timestep"""
+        return np.flatnonzero(
+            (self.start_indexes <= timestep_index) & (self.end_indexes > timestep_index)
         )
 
-        for timestamp in forecast_timestamps:
-            output[timestamp].append(forecast.get_prediction_values())
+    def iter_events(self) -> Iterator[tuple[int, np.ndarray, np.ndarray]]:
+        """yields (timestep_index, started_rows, ended_rows) for every timestep"""
+        bounds = np.arange(len(self.timesteps) + 1)
+        start_order = np.argsort(self.start_indexes, kind="stable")
+        start_bounds = np.searchsorted(self.start_indexes[start_order], bounds)
+        end_order = np.argsort(self.end_indexes, kind="stable")
+        end_bounds = np.searchsorted(self.end_indexes[end_order], bounds)
+        for i in range(len(self.timesteps)):
+            yield (
+                i,
+                start_order[start_bounds[i] : start_bounds[i + 1]],
+                end_order[end_bounds[i] : end_bounds[i + 1]],
+            )
 
-    return [ForecastSet(output[key], key) for key in sorted(output.keys())]
+    def iter_active_rows(self) -> Iterator[tuple[int, np.ndarray]]:
+        """yields (timestep_index, active_rows) for every timestep with at least
+        one active forecast, active_rows being ordered by start_time"""
+        for i, rows, _, _ in self.iter_active_changes():
+            yield i, rows
+
+    def iter_active_changes(
+        self,
+    ) -> Iterator[tuple[int, np.ndarray, np.ndarray, np.ndarray]]:
+        """same as iter_active_rows, also yielding the rows started and ended
+        since the previous yielded timestep:
+        (timestep_index, active_rows, started_rows, ended_rows)"""
+        active = np.zeros(len(self.values), dtype=bool)
+        started_rows, ended_rows = [], []
+        for i, started, ended in self.iter_events():
+            active[started] = True
+            active[ended] = False
+            started_rows.append(started)
+            ended_rows.append(ended)
+            rows = np.flatnonzero(active)
+            if rows.size:
+                yield i, rows, np.concatenate(started_rows), np.concatenate(ended_rows)
+                started_rows, ended_rows = [], []
+
+
+def get_forecasts_sweep(question: Question) -> ForecastsSweep:
+    forecasts = question.user_forecasts.order_by("start_time").only(
+        "start_time",
+        "end_time",
+        "probability_yes",
+        "probability_yes_per_category",
+        "continuous_cdf",
+        "continuous_cdf_packed",
+    )
+    return ForecastsSweep.from_forecasts(list(forecasts))
 
 
 def minimize_forecast_history(
@@ -241,19 +348,43 @@ def get_cp_history(
 ) -> list[AggregateForecast]:
     full_summary: list[AggregateForecast] = []
 
-    user_forecast_history = get_user_forecast_history(question)
-    for i, forecast_set in enumerate(user_forecast_history):
+    sweep = get_forecasts_sweep(question)
+    timestep_indexes = sweep.active_timestep_indexes()
+    last_index = timestep_indexes[-1] if timestep_indexes.size else None
+    # Discrete quartiles are kept sorted across timesteps instead of re-sorting
+    # all the active forecasts at each of them
+    sorted_values = (
+        SortedForecastsValues(sweep.values.shape[1])
+        if question.type in ["binary", "multiple_choice"] and len(sweep.values)
+        else None
+    )
+    weights_by_row = np.zeros(len(sweep.values))
+    for i, rows, started, ended in sweep.iter_active_changes():
+        forecast_set = ForecastSet(sweep.values[rows], sweep.timesteps[i])
         if aggregation_method == AggregationMethod.RECENCY_WEIGHTED:
             weights = generate_recency_weights(len(forecast_set.forecasts_values))
         else:
             weights = None
-        histogram = question.type == "binary" and i == (len(user_forecast_history) - 1)
+        quartiles = None
+        if sorted_values is not None:
+            # rows may start and end between two yielded timesteps
+            for row in started:
+                sorted_values.add(row, sweep.values[row])
+            for row in ended:
+                sorted_values.remove(row)
+            if weights is not None:
+                weights_by_row[rows] = weights
+            quartiles = sorted_values.weighted_percentiles(
+                [25.0, 50.0, 75.0], weights_by_row if weights is not None else None
+            ).tolist()
+        histogram = question.type == "binary" and i == last_index
         new_entry = calculate_aggregation_entry(
             forecast_set,
             question.type,
             weights,
             include_stats=include_stats,
             histogram=histogram,
+            quartiles=quartiles,
         )
         new_entry.question = question
         new_entry.method = aggregation_method
@@ -265,3 +396,87 @@ def get_cp_history(
     if minimize:
         return minimize_forecast_history(full_summary)
     return full_summary
+
+
+@dataclass
+class HistoryTimestep:
+    # lightweight stand-in for an AggregateForecast when only start_time matters
+    start_time: datetime
+
+
+def get_cp_history_incremental(
+    question: Question,
+    previous_history: list[AggregateForecast],
+    aggregation_method: AggregationMethod = AggregationMethod.RECENCY_WEIGHTED,
+    minimize: bool = True,
+    include_stats: bool = True,
+) -> list[AggregateForecast]:
+    """
+    Same output as get_cp_history, but reuses the entries of previous_history
+    instead of recomputing them.
+
+    An aggregation entry only depends on the forecasts active at its start_time.
+    Forecasts are created or ended at the current time, but only become visible
+    once their transaction commits, so a forecast committed after a build can
+    still start before the entries that build stored. An entry is therefore
+    only reused when its start_time precedes its computed_at by more than
+    FORECAST_COMMIT_MAX_DELAY; entries without computed_at were stored before
+    it was recorded and are reused as is. The timesteps missing from
+    previous_history, the entries that can't be reused and the latest timestep
+    (which carries the histogram) are aggregated. Reused and recomputed entries
+    keep their id.
+
+    Only entries whose start_time survives minimization can be reused. Past
+    the 128 timesteps kept by minimize_forecast_history, a new forecast shifts
+    the middle timesteps it picks, so most of the minimized entries are
+    aggregated again and only the first, last and unmoved ones are reused.
+    """
+    sweep = get_forecasts_sweep(question)
+    timestep_indexes = {sweep.timesteps[i]: i for i in sweep.active_timestep_indexes()}
+    timesteps = list(timestep_indexes)
+    if not timesteps:
+        return []
+
+    next_timesteps = dict(zip(timesteps, timesteps[1:]))
+    if minimize:
+        timesteps = [
+            step.start_time
+            for step in minimize_forecast_history(
+                [HistoryTimestep(timestep) for timestep in timesteps]
+            )
+        ]
+    previous_entries = {entry.start_time: entry for entry in previous_history}
+
+    history: list[AggregateForecast] = []
+    for i, timestep in enumerate(timesteps):
+        is_latest = i == len(timesteps) - 1
+        entry = previous_entries.get(timestep)
+        is_final = entry is not None and (
+            entry.computed_at is None
+            or entry.start_time < entry.computed_at - FORECAST_COMMIT_MAX_DELAY
+        )
+        if not is_final or is_latest:
+            rows = sweep.active_rows_at(timestep_indexes[timestep])
+            forecast_set = ForecastSet(sweep.values[rows], timestep)
+            if aggregation_method == AggregationMethod.RECENCY_WEIGHTED:
+                weights = generate_recency_weights(len(forecast_set.forecasts_values))
+            else:
+                weights = None
+            new_entry = calculate_aggregation_entry(
+                forecast_set,
+                question.type,
+                weights,
+                include_stats=include_stats,
+                histogram=question.type == "binary" and is_latest,
+            )
+            new_entry.id = entry.id if entry else None
+            new_entry.question = question
+            new_entry.method = aggregation_method
+            new_entry.start_time = timestep
+            entry = new_entry
+        else:
+            entry.histogram = None
+        entry.end_time = next_timesteps.get(timestep)
+        history.append(entry)
+
+    return history
@@ -153,9 +153,7 @@ def string_location_to_bucket_index(string_location: str, question: Question) ->
 def get_scaled_quartiles_from_cdf(cdf: ForecastValues, question: Question):
     from utils.the_math.measures import percent_point_function
 
-    q1 = unscaled_location_to_scaled_location(percent_point_function(cdf, 25), question)
-    median = unscaled_location_to_scaled_location(
-        percent_point_function(cdf, 50), question
-    )
-    q3 = unscaled_location_to_scaled_location(percent_point_function(cdf, 75), question)
-    return [q1, median, q3]
+    return [
+        unscaled_location_to_scaled_location(quartile, question)
+        for quartile in percent_point_function(cdf, [25, 50, 75])
+    ]